@@ -0,0 +1,24 @@
+-- ============================================
+-- MIGRATION V8: Binary Embedding Storage
+-- Stores memory embeddings as little-endian float32/float16 BLOBs
+-- instead of JSON text (~4x smaller, decoded with np.frombuffer)
+-- ============================================
+
+USE career_agent_db;
+
+-- Binary embedding columns; JSON becomes optional during the dual-read period
+ALTER TABLE memory_vectors
+MODIFY COLUMN embedding JSON DEFAULT NULL COMMENT 'Legacy JSON embedding (read only when embedding_blob is NULL)',
+ADD COLUMN embedding_blob MEDIUMBLOB DEFAULT NULL COMMENT 'Little-endian packed embedding vector' AFTER embedding,
+ADD COLUMN embedding_dtype ENUM('float32', 'float16') DEFAULT NULL COMMENT 'Element type of embedding_blob' AFTER embedding_blob,
+ADD COLUMN embedding_dim SMALLINT UNSIGNED DEFAULT NULL COMMENT 'Number of elements in embedding_blob' AFTER embedding_dtype;
+
+-- Backfill existing rows with:
+--   python python-agents/scripts/backfill_embedding_blobs.py
+--
+-- Once every row has embedding_blob and EMBEDDING_JSON_DUAL_WRITE is off,
+-- the legacy column can be dropped:
+--   ALTER TABLE memory_vectors DROP COLUMN embedding;
+
+-- Verify changes
+DESCRIBE memory_vectors;
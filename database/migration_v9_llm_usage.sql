@@ -0,0 +1,31 @@
+-- ============================================
+-- MIGRATION V9: LLM Usage Telemetry
+-- One row per LLM call (tokens, latency, model, calling agent method),
+-- written in batches when LLM_USAGE_SINK=db
+-- ============================================
+
+USE career_agent_db;
+
+CREATE TABLE IF NOT EXISTS llm_usage (
+    id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    agent VARCHAR(100) NOT NULL COMMENT 'Calling class or module, e.g. SkillGapAgent',
+    method VARCHAR(100) NOT NULL COMMENT 'Calling method, e.g. analyze_gaps',
+    model VARCHAR(100) DEFAULT NULL COMMENT 'Model that answered (NULL if none did)',
+    prompt_tokens INT NOT NULL DEFAULT 0,
+    completion_tokens INT NOT NULL DEFAULT 0,
+    total_tokens INT NOT NULL DEFAULT 0,
+    latency_ms FLOAT NOT NULL DEFAULT 0 COMMENT 'Excludes time queued for rate-limit capacity',
+    queued_ms FLOAT NOT NULL DEFAULT 0,
+    requests SMALLINT NOT NULL DEFAULT 1 COMMENT 'Upstream requests incl. fallbacks and hedges',
+    success BOOLEAN NOT NULL DEFAULT TRUE,
+    estimated BOOLEAN NOT NULL DEFAULT FALSE COMMENT 'Token counts estimated from text length',
+    stream BOOLEAN NOT NULL DEFAULT FALSE,
+    priority VARCHAR(20) DEFAULT NULL,
+    created_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3)
+);
+
+CREATE INDEX IF NOT EXISTS idx_llm_usage_created ON llm_usage(created_at);
+CREATE INDEX IF NOT EXISTS idx_llm_usage_method ON llm_usage(agent, method, created_at);
+
+-- Verify changes
+DESCRIBE llm_usage;
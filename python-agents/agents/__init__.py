@@ -21,12 +21,16 @@ def get_embedding_generator():
         EmbeddingGenerator = _EG
     return embedding_generator
 
+def embedding_model_ready():
+    """True if a real embedding model is loaded, without importing or loading it"""
+    return embedding_generator is not None and embedding_generator.model_ready
+
 __all__ = [
     'reasoning_agent', 'ReasoningAgent',
     'skill_gap_agent', 'SkillGapAgent',
     'planner_agent', 'PlannerAgent',
     'feedback_agent', 'FeedbackAgent',
-    'get_embedding_generator',
+    'get_embedding_generator', 'embedding_model_ready',
     'resume_agent', 'ResumeAgent',
     'projects_agent', 'ProjectsAgent'
 ]
@@ -2,9 +2,13 @@
 Embedding Generator Agent
 Generates text embeddings for semantic memory and similarity search
 """
+import threading
 import numpy as np
 from typing import List, Union
 from config import Config
+from services.vector_search import normalize_rows, top_k_indices
+from services.embedding_batcher import EmbeddingBatcher
+from services.embedding_cache import embedding_cache
 
 # Try to import sentence transformers, fallback to simple embeddings
 try:
@@ -14,13 +18,65 @@ except ImportError:
     EMBEDDINGS_AVAILABLE = False
     print("Warning: sentence-transformers not installed. Using fallback embeddings.")
 
+FNV_OFFSET = np.uint32(0x811c9dc5)
+FNV_PRIME = np.uint32(0x01000193)
+
+
+def hashed_ngram_embeddings(texts: List[str], dimension: int, max_ngram: int = 3) -> np.ndarray:
+    """
+    Embed a batch of strings as L2-normalized counts of hashed character n-grams
+    
+    All strings are hashed in one pass over their concatenated code points
+    (FNV-1a, so vectors are stable across processes) and counted with a
+    single bincount.
+    
+    Args:
+        texts: Strings to embed
+        dimension: Number of hash buckets
+        max_ngram: Count character n-grams of length 1..max_ngram
+    
+    Returns:
+        float32 matrix of shape (len(texts), dimension)
+    """
+    if not texts:
+        return np.zeros((0, dimension), dtype=np.float32)
+    lowered = [t.lower() for t in texts]
+    codes = np.frombuffer(''.join(lowered).encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+    lengths = np.fromiter((len(t) for t in lowered), dtype=np.int64, count=len(lowered))
+    owner = np.repeat(np.arange(len(texts)), lengths)
+    base = owner * dimension
+    overflow = len(texts) * dimension  # bin for n-grams that span two strings, dropped below
+    
+    sizes = [len(codes) - n + 1 for n in range(1, max_ngram + 1) if len(codes) - n + 1 > 0]
+    flat = np.empty(sum(sizes), dtype=np.int64)
+    h = np.full(len(codes), FNV_OFFSET, dtype=np.uint32)
+    pos = 0
+    for n, m in enumerate(sizes, start=1):
+        # FNV-1a of an n-gram extends the hash of its (n-1)-gram prefix
+        h = (h[:m] ^ codes[n - 1:]) * FNV_PRIME
+        out = flat[pos:pos + m]
+        np.add(base[:m], (h.astype(np.uint64) * np.uint64(dimension)) >> np.uint64(32), out=out, casting='unsafe')
+        out[owner[:m] != owner[n - 1:]] = overflow
+        pos += m
+    
+    counts = np.bincount(flat, minlength=overflow + 1)[:overflow]
+    return normalize_rows(counts.reshape(len(texts), dimension))
+
 
 class EmbeddingGenerator:
     def __init__(self, lazy_load: bool = True):
         self._model = None
         self._model_loaded = False
         self._lazy_load = lazy_load
+        self._load_lock = threading.Lock()
         self.dimension = 384  # Default dimension for all-MiniLM-L6-v2
+        # Concurrent single-text requests share one encode call
+        self.batcher = EmbeddingBatcher(
+            self._encode_batch,
+            max_batch_size=Config.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=Config.EMBEDDING_BATCH_MAX_WAIT_MS,
+            timeout=Config.EMBEDDING_BATCH_TIMEOUT
+        )
         
         if not lazy_load and EMBEDDINGS_AVAILABLE:
             self._load_model()
@@ -29,15 +85,20 @@ class EmbeddingGenerator:
         """Load the embedding model (called lazily on first use)"""
         if self._model_loaded:
             return
-            
-        if EMBEDDINGS_AVAILABLE:
-            try:
-                self._model = SentenceTransformer(Config.EMBEDDING_MODEL)
-                print(f"Loaded embedding model: {Config.EMBEDDING_MODEL}")
-            except Exception as e:
-                print(f"Error loading embedding model: {e}")
         
-        self._model_loaded = True
+        # Startup warm-up and early requests may race to load the model
+        with self._load_lock:
+            if self._model_loaded:
+                return
+            if EMBEDDINGS_AVAILABLE:
+                try:
+                    self._model = SentenceTransformer(Config.EMBEDDING_MODEL)
+                    self.dimension = self._model.get_sentence_embedding_dimension() or self.dimension
+                    print(f"Loaded embedding model: {Config.EMBEDDING_MODEL}")
+                except Exception as e:
+                    print(f"Error loading embedding model: {e}")
+            
+            self._model_loaded = True
     
     @property
     def model(self):
@@ -46,6 +107,18 @@ class EmbeddingGenerator:
             self._load_model()
         return self._model
     
+    @property
+    def model_ready(self) -> bool:
+        """True once a real embedding model is loaded (never triggers loading)"""
+        return self._model_loaded and self._model is not None
+    
+    @property
+    def model_name(self) -> str:
+        """Name that cached embeddings are keyed by"""
+        if self.model:
+            return Config.EMBEDDING_MODEL
+        return 'fallback-legacy' if Config.EMBEDDING_FALLBACK_LEGACY else 'fallback-ngram'
+    
     def generate(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
         """
         Generate embeddings for text
@@ -56,17 +129,49 @@ class EmbeddingGenerator:
         Returns:
             Embedding vector(s) as list of floats
         """
-        if self.model:
-            embeddings = self.model.encode(text)
-            if isinstance(text, str):
-                return embeddings.tolist()
-            return [e.tolist() for e in embeddings]
-        else:
+        texts = [text] if isinstance(text, str) else list(text)
+        model_name = self.model_name
+        embeddings = [None] * len(texts)
+        missing = []
+        for i, t in enumerate(texts):
+            cached = embedding_cache.get(model_name, t, self.dimension)
+            if cached is not None:
+                embeddings[i] = cached.tolist()
+            else:
+                missing.append(i)
+        
+        if missing:
+            computed = self._encode([texts[i] for i in missing])
+            for i, embedding in zip(missing, computed):
+                # float32 like cached vectors, so hits and misses are identical
+                embeddings[i] = np.asarray(embedding, dtype=np.float32).tolist()
+                embedding_cache.put(model_name, texts[i], embedding)
+        
+        return embeddings[0] if isinstance(text, str) else embeddings
+    
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        """Encode uncached texts; a single text goes through the micro-batcher"""
+        if not self.model:
             # Fallback: simple hash-based embedding (for demo purposes)
-            return self._fallback_embed(text)
+            return self._fallback_embed(texts)
+        if len(texts) == 1 and Config.EMBEDDING_BATCHING_ENABLED:
+            return [self.batcher.encode(texts[0])]
+        return self._encode_batch(texts)
+    
+    def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """Encode many texts in one model call"""
+        return [e.tolist() for e in self.model.encode(texts)]
     
     def _fallback_embed(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
-        """Simple fallback embedding using character frequencies"""
+        """Fallback embedding from hashed character n-grams (whole batch in one pass)"""
+        if Config.EMBEDDING_FALLBACK_LEGACY:
+            return self._fallback_embed_legacy(text)
+        texts = [text] if isinstance(text, str) else list(text)
+        vectors = hashed_ngram_embeddings(texts, self.dimension)
+        return vectors[0].tolist() if isinstance(text, str) else vectors.tolist()
+    
+    def _fallback_embed_legacy(self, text: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
+        """Original position-weighted character frequency embedding (EMBEDDING_FALLBACK_LEGACY)"""
         def embed_single(s: str) -> List[float]:
             # Create a simple embedding based on character frequencies
             s = s.lower()
@@ -121,13 +226,52 @@ class EmbeddingGenerator:
         Returns:
             List of (index, similarity_score) tuples
         """
-        similarities = []
-        for i, emb in enumerate(embeddings):
-            sim = self.similarity(query_embedding, emb)
-            similarities.append((i, sim))
+        if len(embeddings) == 0:
+            return []
+        
+        # One matmul over pre-normalized vectors, then partial sort for top-k
+        scores = normalize_rows(embeddings) @ normalize_rows(query_embedding)[0]
+        order = top_k_indices(scores, top_k)
+        return [(int(i), float(scores[i])) for i in order]
+    
+    def find_similar_batch(self, query_embeddings: List[List[float]],
+                           embeddings: List[List[float]],
+                           top_k: int = 5) -> List[List[tuple]]:
+        """
+        Find most similar embeddings for many queries against one corpus
+        
+        Args:
+            query_embeddings: The query vectors
+            embeddings: List of embeddings to search
+            top_k: Number of results to return per query
+        
+        Returns:
+            One list of (index, similarity_score) tuples per query
+        """
+        if len(query_embeddings) == 0:
+            return []
+        if len(embeddings) == 0:
+            return [[] for _ in query_embeddings]
+        
+        scores = normalize_rows(query_embeddings) @ normalize_rows(embeddings).T
+        n = scores.shape[1]
+        k = min(top_k, n)
+        if k <= 0:
+            return [[] for _ in query_embeddings]
+        
+        if k < n:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(n), (scores.shape[0], 1))
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        top = np.take_along_axis(candidates, order, axis=1)
+        top_scores = np.take_along_axis(candidate_scores, order, axis=1)
         
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return similarities[:top_k]
+        return [
+            [(int(i), float(score)) for i, score in zip(row_ids, row_scores)]
+            for row_ids, row_scores in zip(top, top_scores)
+        ]
 
 
 # Global embedding generator instance with lazy loading
@@ -9,6 +9,7 @@ import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from llm_client import llm
+from services.prompt_budget import Section, prompt_budget
 from typing import Dict, List, Any, Optional
 
 
@@ -409,10 +410,8 @@ Generate a comprehensive weekly report in JSON:
         source = feedback_data.get('source', 'unknown')
         source_display = source.replace('_', ' ').title()
         
-        skills_str = "Not provided"
-        if user_skills:
-            skills_str = ", ".join([f"{s.get('skill_name', s.get('name', 'Unknown'))} ({s.get('level', 'unknown')})" 
-                                   for s in user_skills[:15]])
+        skills = [f"{s.get('skill_name', s.get('name', 'Unknown'))} ({s.get('level', 'unknown')})"
+                  for s in (user_skills or [])[:15]]
         
         profile_str = "Not provided"
         if user_profile:
@@ -431,12 +430,16 @@ Generate a comprehensive weekly report in JSON:
                 profile_parts.append(f"Experience: {user_profile['experience_years']} years")
             profile_str = " | ".join(profile_parts) if profile_parts else "Not provided"
         
-        history_str = "No previous applications"
-        if application_history:
-            history_parts = []
-            for app in application_history[:5]:
-                history_parts.append(f"- {app.get('company', 'Unknown')} ({app.get('role', 'Unknown')}): {app.get('status', 'unknown')}")
-            history_str = "\n".join(history_parts)
+        history = [f"- {app.get('company', 'Unknown')} ({app.get('role', 'Unknown')}): {app.get('status', 'unknown')}"
+                   for app in (application_history or [])[:5]]
+        
+        # Trimmed in order: oldest applications, trailing skills, then the feedback text itself
+        context = prompt_budget.fit('FeedbackAgent.comprehensive_feedback_analysis', {
+            'message': Section(feedback_data.get('message') or 'No feedback text provided', priority=3, min_tokens=300),
+            'profile': Section(profile_str, priority=2),
+            'skills': Section(skills, priority=1, joiner=", "),
+            'history': Section(history, priority=0, joiner="\n")
+        })
         
         prompt = f"""Perform a COMPREHENSIVE career feedback analysis.
 
@@ -450,16 +453,16 @@ Type: {source_display}
 - Stage: {feedback_data.get('stage', 'Not specified')}
 
 ## Feedback Message/Text
-{feedback_data.get('message', 'No feedback text provided')}
+{context['message']}
 
 ## User Profile
-{profile_str}
+{context['profile']}
 
 ## User's Current Skills
-{skills_str}
+{context['skills'] or 'Not provided'}
 
 ## Application History
-{history_str}
+{context['history'] or 'No previous applications'}
 
 Analyze this feedback comprehensively and return a JSON response with this EXACT structure:
 
@@ -7,7 +7,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from llm_client import llm
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any
 from datetime import datetime, timedelta
 
 
@@ -33,7 +33,7 @@ Plans should be specific, measurable, and achievable."""
         self.name = "PlannerAgent"
     
     def create_roadmap(self, skill_gaps: List[Dict], target_role: str, 
-                       timeline: str = "3 months") -> Dict[str, Any]:
+                       timeline: str = "3 months", on_week: Callable[[Dict], None] = None) -> Dict[str, Any]:
         """
         Create a complete learning roadmap
         
@@ -41,6 +41,8 @@ Plans should be specific, measurable, and achievable."""
             skill_gaps: List of identified skill gaps with priorities
             target_role: Target career role
             timeline: Desired timeline to achieve goal
+            on_week: Called with each weekly plan as soon as the model has
+                finished writing it (streamed; not called for fallback plans)
         
         Returns:
             Complete roadmap with weekly plans
@@ -97,7 +99,8 @@ Create a detailed roadmap in JSON:
 
 Create at least {max(4, int(timeline.split()[0]) if timeline.split()[0].isdigit() else 12)} weekly plans."""
         
-        result = llm.call_json(prompt, self.SYSTEM_PROMPT, temperature=0.5)
+        subscriptions = {'weekly_plans[]': lambda path, plan: on_week(plan)} if on_week else None
+        result = llm.call_json_stream(prompt, self.SYSTEM_PROMPT, temperature=0.5, subscriptions=subscriptions)
         
         if not result:
             return self._fallback_roadmap(skill_gaps, target_role, timeline)
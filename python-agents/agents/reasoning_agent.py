@@ -183,7 +183,7 @@ Analyze the readiness and provide a detailed breakdown in JSON:
     "key_recommendation": "<most important next step>"
 }}"""
         
-        result = llm.call_json(prompt, self.SYSTEM_PROMPT, temperature=0.3)
+        result = llm.call_json(prompt, self.SYSTEM_PROMPT, temperature=0.3, cache=True)
         
         return {
             "agent": self.name,
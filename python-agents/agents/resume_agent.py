@@ -7,6 +7,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from llm_client import llm
+from services.prompt_budget import Section, prompt_budget
 from typing import Dict, List, Any, Optional
 import json
 
@@ -311,19 +312,26 @@ Generate the resume JSON now:"""
         Returns:
             Tailored resume following strict schema
         """
+        # The job description's tail (benefits, boilerplate) goes before any resume content;
+        # every job and project is kept, since the tailored resume is rewritten from this one
+        context = prompt_budget.fit('ResumeAgent.tailor_to_job_description', {
+            'resume': Section(existing_resume, priority=2, min_tokens=800, keep=('experience', 'projects')),
+            'job_description': Section(job_description, priority=1, min_tokens=400)
+        })
+        
         prompt = f"""Tailor this existing resume to the job description below.
 
 ======================
 CURRENT RESUME
 ======================
-{json.dumps(existing_resume, indent=2)}
+{context['resume']}
 
 ======================
 TARGET JOB
 ======================
 Role: {target_role}
 Company: {target_company if target_company else 'Not specified'}
-Description: {job_description}
+Description: {context['job_description']}
 
 ======================
 INSTRUCTIONS - FULL PAGE RESUME
@@ -376,13 +384,18 @@ Generate the tailored resume JSON:"""
         Returns:
             Match analysis with score and recommendations
         """
+        context = prompt_budget.fit('ResumeAgent.analyze_resume_match', {
+            'resume': Section(resume_data, priority=2, min_tokens=800),
+            'job_description': Section(job_description, priority=1, min_tokens=400)
+        })
+        
         prompt = f"""Analyze how well this resume matches the job description.
 
 ## Resume
-{json.dumps(resume_data, indent=2)}
+{context['resume']}
 
 ## Job Description
-{job_description}
+{context['job_description']}
 
 Provide analysis in this JSON format:
 {{
@@ -432,19 +445,22 @@ Provide analysis in this JSON format:
         Returns:
             List of improvement suggestions
         """
-        feedback_text = ""
-        if feedback_history:
-            feedback_text = "\n".join([
-                f"- {fb.get('company', 'Unknown')}: {fb.get('message', fb.get('feedback', ''))}"
-                for fb in feedback_history[:5]
-            ])
+        feedback_lines = [
+            f"- {fb.get('company', 'Unknown')}: {fb.get('message', fb.get('feedback', ''))}"
+            for fb in (feedback_history or [])[:5]
+        ]
+        
+        context = prompt_budget.fit('ResumeAgent.suggest_resume_improvements', {
+            'resume': Section(resume_data, priority=2, min_tokens=800),
+            'feedback': Section(feedback_lines, priority=1, joiner="\n")
+        })
         
-        feedback_section = f"## Past Rejection Feedback\n{feedback_text}" if feedback_text else ""
+        feedback_section = f"## Past Rejection Feedback\n{context['feedback']}" if context['feedback'] else ""
         
         prompt = f"""Review this resume for a {target_role if target_role else 'professional'} position and suggest improvements.
 
 ## Resume
-{json.dumps(resume_data, indent=2)}
+{context['resume']}
 
 {feedback_section}
 
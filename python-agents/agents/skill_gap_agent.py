@@ -29,6 +29,8 @@ class SkillGapAgent:
 Be precise and realistic in your assessments. Consider both technical and soft skills.
 When providing learning resources, use REAL, working URLs to popular educational content."""
     
+    ROLE_REQUIREMENTS_TTL = 7 * 86400  # role requirements change slowly; cache LLM answers for a week
+    
     def __init__(self):
         self.name = "SkillGapAgent"
         
@@ -138,7 +140,7 @@ Use popular educational channels like Traversy Media, The Net Ninja, freeCodeCam
     "overall_assessment": "<summary of the gap analysis>"
 }}"""
         
-        result = llm.call_json(prompt, self.SYSTEM_PROMPT, temperature=0.3)
+        result = llm.call_json(prompt, self.SYSTEM_PROMPT, temperature=0.3, cache=True)
         
         if not result:
             return self._fallback_analysis(user_skills, target_role)
@@ -290,7 +292,8 @@ Provide requirements in JSON:
     "experience": "<typical experience requirement>"
 }}"""
         
-        result = llm.call_json(prompt, self.SYSTEM_PROMPT, temperature=0.3)
+        result = llm.call_json(prompt, self.SYSTEM_PROMPT, temperature=0.3, cache=True,
+                               cache_ttl=self.ROLE_REQUIREMENTS_TTL)
         
         return {
             "agent": self.name,
@@ -3,12 +3,25 @@ Flask API Server for Agent Service
 Exposes agent functionality via REST API
 """
 import os
-from flask import Flask, request, jsonify, send_file, redirect
+import threading
+from flask import Flask, Response, request, jsonify, send_file, redirect
 from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from config import Config
 from orchestrator import orchestrator
 from database import db
+from llm_client import StreamInterrupted, llm
+from services.state_cache import user_state_cache
+from services.vector_search import memory_search
+from services.hybrid_search import memory_retriever
+from services.embedding_cache import embedding_cache
+from services.warmup import service_warmup
+from services.memory_compaction import memory_compactor
+from services.llm_cache import llm_response_cache
+from services.model_health import model_health
+from services.llm_scheduler import INTERACTIVE, llm_priority, llm_scheduler
+from services.llm_usage import llm_usage
+from services.prompt_budget import prompt_budget
 from decimal import Decimal
 from datetime import datetime, date
 import json
@@ -28,6 +41,7 @@ from agents import (
     planner_agent,
     feedback_agent,
     get_embedding_generator,
+    embedding_model_ready,
     resume_agent,
     projects_agent
 )
@@ -37,6 +51,10 @@ app = Flask(__name__)
 app.json = CustomJSONProvider(app)
 CORS(app)
 
+# Map saved vector indexes (and preload the embedding model if enabled) in the background
+service_warmup.start(preload_model=Config.EMBEDDING_PRELOAD)
+memory_compactor.start(Config.MEMORY_COMPACTION_INTERVAL)
+
 # ==========================================
 # HEALTH CHECK
 # ==========================================
@@ -44,11 +62,148 @@ CORS(app)
 @app.route('/health', methods=['GET'])
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    return jsonify({
-        "status": "healthy",
+    """Health check endpoint (503 until warm-up finishes, so load balancers hold traffic)"""
+    response = {
+        "status": "healthy" if service_warmup.ready else "warming",
+        "warmup": service_warmup.state,
         "service": "Career Agent Service",
         "version": "1.0.0"
+    }
+    return jsonify(response), 200 if service_warmup.ready else 503
+
+
+# ==========================================
+# METRICS ENDPOINTS
+# ==========================================
+
+@app.route('/api/metrics/db-pool', methods=['GET'])
+def db_pool_metrics():
+    """Database connection pool metrics for capacity sizing"""
+    return jsonify({
+        "status": "success",
+        "pool": db.get_pool_stats()
+    })
+
+
+@app.route('/api/metrics/vector-search', methods=['GET'])
+def vector_search_metrics():
+    """Memory vector index metrics"""
+    return jsonify({
+        "status": "success",
+        "vector_search": memory_search.stats(),
+        "hybrid": memory_retriever.stats()
+    })
+
+
+@app.route('/api/metrics/state-cache', methods=['GET'])
+def state_cache_metrics():
+    """User state cache hit/miss metrics"""
+    return jsonify({
+        "status": "success",
+        "cache": user_state_cache.stats()
+    })
+
+
+@app.route('/api/metrics/warmup', methods=['GET'])
+def warmup_metrics():
+    """Startup warm-up state and load times"""
+    return jsonify({
+        "status": "success",
+        "warmup": service_warmup.stats()
+    })
+
+
+@app.route('/api/metrics/memory-compaction', methods=['GET'])
+def memory_compaction_metrics():
+    """Memory compaction totals and the last run's report"""
+    return jsonify({
+        "status": "success",
+        "compaction": memory_compactor.stats()
+    })
+
+
+@app.route('/api/metrics/llm', methods=['GET'])
+def llm_metrics():
+    """LLM client concurrency (in flight, queued, peak) and coalesced duplicate calls"""
+    return jsonify({
+        "status": "success",
+        "async_enabled": llm.async_client is not None,
+        "client": llm.async_client.stats() if llm.async_client is not None else None,
+        "single_flight": llm.single_flight.stats() if llm.single_flight is not None else None
+    })
+
+
+@app.route('/api/metrics/llm-models', methods=['GET'])
+def llm_model_metrics():
+    """Per-model circuit breaker state, latency and error EWMAs"""
+    return jsonify({
+        "status": "success",
+        "health": model_health.stats()
+    })
+
+
+@app.route('/api/metrics/llm-scheduler', methods=['GET'])
+def llm_scheduler_metrics():
+    """LLM rate-limit buckets and queue wait per priority class"""
+    return jsonify({
+        "status": "success",
+        "scheduler": llm_scheduler.stats()
+    })
+
+
+@app.route('/api/metrics/prompt-budget', methods=['GET'])
+def prompt_budget_metrics():
+    """Per-method prompt budgets and how much the agent prompts were compressed"""
+    return jsonify({
+        "status": "success",
+        "prompt_budget": prompt_budget.stats()
+    })
+
+
+@app.route('/api/metrics/llm-usage', methods=['GET'])
+def llm_usage_metrics():
+    """
+    LLM token usage broken down by agent method
+    
+    Query params: group_by ('method', 'agent', 'model' or 'priority') and
+    since (seconds) aggregate the recent in-memory records; source=db
+    aggregates the llm_usage table over `days` instead.
+    """
+    if request.args.get('source') == 'db':
+        days = request.args.get('days', 7, type=int)
+        return jsonify({
+            "status": "success",
+            "source": "db",
+            "days": days,
+            "methods": db.get_llm_usage_summary(days)
+        })
+    group_by = request.args.get('group_by', 'method')
+    if group_by not in ('method', 'agent', 'model', 'priority'):
+        return jsonify({"error": "group_by must be one of method, agent, model, priority"}), 400
+    return jsonify({
+        "status": "success",
+        "source": "memory",
+        "recorder": llm_usage.stats(),
+        "usage": llm_usage.summary(group_by, request.args.get('since', type=float))
+    })
+
+
+@app.route('/api/metrics/llm-cache', methods=['GET'])
+def llm_cache_metrics():
+    """LLM response cache hit rates and time saved"""
+    return jsonify({
+        "status": "success",
+        "cache": llm_response_cache.stats()
+    })
+
+
+@app.route('/api/metrics/embeddings', methods=['GET'])
+def embedding_metrics():
+    """Embedding cache hit rates and micro-batcher histograms"""
+    return jsonify({
+        "status": "success",
+        "cache": embedding_cache.stats(),
+        "batcher": get_embedding_generator().batcher.stats()
     })
 
 
@@ -81,6 +236,13 @@ def get_agent_state(user_id):
     return jsonify(result)
 
 
+@app.route('/api/agent/state/<int:user_id>/invalidate', methods=['POST'])
+def invalidate_agent_state(user_id):
+    """Drop cached state after user data was changed outside this service"""
+    db.invalidate_user_state(user_id)
+    return jsonify({"status": "success", "message": "User state cache invalidated"})
+
+
 # ==========================================
 # ORCHESTRATOR ENDPOINTS
 # ==========================================
@@ -309,9 +471,10 @@ def comprehensive_feedback_analysis():
     
     if user_id and not user_profile:
         try:
-            user_profile = db.get_user_profile(user_id)
-            user_skills = db.get_user_skills(user_id)
-            application_history = db.get_applications(user_id, limit=10)
+            snapshot = db.get_user_snapshot(user_id)
+            user_profile = snapshot.profile
+            user_skills = snapshot.skills
+            application_history = snapshot.applications[:10]
         except Exception as e:
             print(f"Error fetching user data: {e}")
     
@@ -478,38 +641,69 @@ def get_memories(user_id):
     })
 
 
+@app.route('/api/agent/memory/compact', methods=['POST'])
+def compact_memories():
+    """Run memory compaction now (one user, or all when user_id is omitted), optionally as a dry run"""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    user_id = data.get('user_id')
+    if user_id is not None:
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return jsonify({"error": "user_id must be an integer"}), 400
+    report = memory_compactor.run(
+        user_ids=[user_id] if user_id is not None else None,
+        dry_run=bool(data.get('dry_run', False))
+    )
+    return jsonify({
+        "status": "success",
+        "report": report
+    })
+
+
 @app.route('/api/agent/memory/search', methods=['POST'])
 def search_memories():
-    """Search memories by similarity"""
+    """
+    Search memories by keywords and similarity
+    
+    Optional: mode ('hybrid' | 'lexical' | 'vector'), types (list or
+    comma-separated), max_age_days. Hybrid falls back to lexical results
+    until the embedding model is loaded.
+    """
     data = request.json
     user_id = data.get('user_id')
     query = data.get('query', '')
-    top_k = data.get('top_k', 5)
+    mode = data.get('mode', 'hybrid')
+    types = data.get('types')
+    if isinstance(types, str):
+        types = [t.strip() for t in types.split(',') if t.strip()]
     
     if not user_id or not query:
         return jsonify({"error": "user_id and query are required"}), 400
-    
-    # Get user memories
-    memories = db.get_memories(user_id)
-    if not memories:
-        return jsonify({"status": "success", "results": []})
-    
-    # Generate query embedding
-    query_emb = get_embedding_generator().generate(query)
-    
-    # Find similar
-    embeddings = [m['embedding'] for m in memories]
-    similar = get_embedding_generator().find_similar(query_emb, embeddings, top_k)
-    
-    results = []
-    for idx, score in similar:
-        results.append({
-            **memories[idx],
-            'similarity_score': score
-        })
+    try:
+        top_k = int(data.get('top_k', 5))
+        max_age_days = float(data['max_age_days']) if data.get('max_age_days') else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k and max_age_days must be numbers"}), 400
+    
+    if mode == 'vector':
+        query_emb = get_embedding_generator().generate(query)
+        results = db.search_memories(user_id, query_emb, limit=top_k, types=types, max_age_days=max_age_days)
+    else:
+        query_emb = None
+        if mode == 'hybrid' and embedding_model_ready():
+            query_emb = get_embedding_generator().generate(query)
+        else:
+            mode = 'lexical'
+        results = db.hybrid_search_memories(
+            user_id, query, query_emb, limit=top_k, types=types, max_age_days=max_age_days
+        )
     
     return jsonify({
         "status": "success",
+        "mode": mode,
         "results": results
     })
 
@@ -518,27 +712,16 @@ def search_memories():
 # CHAT ENDPOINTS
 # ==========================================
 
-from llm_client import llm
-
-@app.route('/api/agent/chat', methods=['POST'])
-def chat():
-    """Chat with the AI career assistant"""
-    data = request.json
-    user_id = data.get('user_id')
-    message = data.get('message', '')
-    
-    if not user_id or not message:
-        return jsonify({"error": "user_id and message are required"}), 400
-    
-    # Get user context
-    user = db.get_user_profile(user_id)
-    skills = db.get_user_skills(user_id)
-    goals = db.get_user_goals(user_id)
-    primary_goal = db.get_primary_goal(user_id)
-    skill_gaps = db.get_skill_gaps(user_id, primary_goal['id'] if primary_goal else None)
-    plans = db.get_user_plans(user_id, primary_goal['id'] if primary_goal else None)
-    applications = db.get_applications(user_id)
-    feedback_list = db.get_user_feedback(user_id, limit=5)
+def _prepare_chat(user_id, message: str):
+    """Build the system prompt and LLM context for a chat turn and save the user message"""
+    # Get user context in one round trip
+    snapshot = db.get_user_snapshot(user_id)
+    user = snapshot.profile
+    skills = snapshot.skills
+    primary_goal = snapshot.primary_goal
+    skill_gaps = snapshot.skill_gaps
+    plans = snapshot.plans
+    applications = snapshot.applications
     
     # Build user context string
     user_name = user.get('name', 'User') if user else 'User'
@@ -600,11 +783,18 @@ def chat():
     # Keep only last 10 messages for context to LLM
     context_messages = chat_history[-10:] if len(chat_history) > 10 else chat_history
     
-    # Get AI response
-    response = llm.chat(context_messages, system_prompt, temperature=0.7, max_tokens=1500)
-    
+    user_context = {
+        "name": user_name,
+        "target_role": target_role,
+        "readiness_score": readiness_score
+    }
+    return system_prompt, context_messages, user_context
+
+
+def _save_chat_reply(user_id, message: str, response: str, partial: bool = False):
+    """Persist the assistant reply (flagged partial if it was cut off) and remember the exchange"""
     # Save assistant response to database
-    db.save_chat_message(user_id, 'assistant', response)
+    db.save_chat_message(user_id, 'assistant', response, {'partial': True} if partial else None)
     
     # Save to memory for future reference
     try:
@@ -613,15 +803,84 @@ def chat():
         db.save_memory(user_id, content, embedding, 'interaction', {'type': 'chat'})
     except Exception as e:
         print(f"Error saving chat memory: {e}")
+
+
+@app.route('/api/agent/chat', methods=['POST'])
+def chat():
+    """Chat with the AI career assistant"""
+    data = request.json
+    user_id = data.get('user_id')
+    message = data.get('message', '')
+    
+    if not user_id or not message:
+        return jsonify({"error": "user_id and message are required"}), 400
+    
+    system_prompt, context_messages, user_context = _prepare_chat(user_id, message)
+    
+    # Get AI response (ahead of queued dashboard and background LLM work)
+    with llm_priority(INTERACTIVE):
+        response = llm.chat(context_messages, system_prompt, temperature=0.7, max_tokens=1500)
+    
+    _save_chat_reply(user_id, message, response)
     
     return jsonify({
         "status": "success",
         "response": response,
-        "user_context": {
-            "name": user_name,
-            "target_role": target_role,
-            "readiness_score": readiness_score
-        }
+        "user_context": user_context
+    })
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
+
+
+@app.route('/api/agent/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Chat with the AI career assistant, streaming the reply as Server-Sent Events
+    
+    Events: 'context' (user_context), 'token' ({"text": ...}) per fragment,
+    then 'done' ({"response": full text}), or 'error' ({"error", "response":
+    text so far}) if the model failed mid-reply. The reply is saved and
+    embedded in the background once the stream has closed; a reply cut off
+    by a failure or a client disconnect is saved flagged as partial.
+    """
+    data = request.json
+    user_id = data.get('user_id')
+    message = data.get('message', '')
+    
+    if not user_id or not message:
+        return jsonify({"error": "user_id and message are required"}), 400
+    
+    system_prompt, context_messages, user_context = _prepare_chat(user_id, message)
+    
+    def events():
+        parts = []
+        complete = False
+        try:
+            yield _sse('context', user_context)
+            try:
+                with llm_priority(INTERACTIVE):
+                    for delta in llm.chat_stream(context_messages, system_prompt, temperature=0.7, max_tokens=1500):
+                        parts.append(delta)
+                        yield _sse('token', {"text": delta})
+            except StreamInterrupted as e:
+                print(f"Chat stream interrupted for user {user_id}: {e}")
+                yield _sse('error', {"error": "The reply was interrupted. Please try again.",
+                                     "response": ''.join(parts)})
+                return
+            complete = True
+            yield _sse('done', {"response": ''.join(parts)})
+        finally:
+            # Runs on completion, failure and client disconnect; keep the partial reply either way
+            response = ''.join(parts)
+            if response:
+                threading.Thread(target=_save_chat_reply, args=(user_id, message, response, not complete),
+                                 name='chat-persist', daemon=True).start()
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
 
@@ -1116,11 +1375,12 @@ def analyze_user_for_project_ideas():
     
     try:
         # Get user context
-        user_profile = db.get_user_profile(user_id)
-        skills = db.get_user_skills(user_id)
-        primary_goal = db.get_primary_goal(user_id)
+        snapshot = db.get_user_snapshot(user_id)
+        user_profile = snapshot.profile
+        skills = snapshot.skills
+        primary_goal = snapshot.primary_goal
         career_goal = primary_goal.get('target_role', '') if primary_goal else user_profile.get('career_goal', '')
-        skill_gaps = db.get_skill_gaps(user_id, primary_goal['id'] if primary_goal else None)
+        skill_gaps = snapshot.skill_gaps
         
         # Get completed projects
         completed_projects = db.execute_query(
@@ -1154,11 +1414,12 @@ def suggest_project_ideas():
     
     try:
         # Get user context
-        user_profile = db.get_user_profile(user_id)
-        skills = db.get_user_skills(user_id)
-        primary_goal = db.get_primary_goal(user_id)
+        snapshot = db.get_user_snapshot(user_id)
+        user_profile = snapshot.profile
+        skills = snapshot.skills
+        primary_goal = snapshot.primary_goal
         career_goal = primary_goal.get('target_role', '') if primary_goal else user_profile.get('career_goal', '')
-        skill_gaps = db.get_skill_gaps(user_id, primary_goal['id'] if primary_goal else None)
+        skill_gaps = snapshot.skill_gaps
         
         # Get completed projects to avoid duplicates
         completed_projects = db.execute_query(
@@ -1193,9 +1454,10 @@ def improve_project_idea_endpoint():
     
     try:
         # Get user context
-        user_profile = db.get_user_profile(user_id)
-        skills = db.get_user_skills(user_id)
-        primary_goal = db.get_primary_goal(user_id)
+        snapshot = db.get_user_snapshot(user_id)
+        user_profile = snapshot.profile
+        skills = snapshot.skills
+        primary_goal = snapshot.primary_goal
         career_goal = primary_goal.get('target_role', '') if primary_goal else user_profile.get('career_goal', '')
         
         result = projects_agent.improve_user_idea(
@@ -1225,9 +1487,10 @@ def projects_chat_endpoint():
     
     try:
         # Get user context
-        user_profile = db.get_user_profile(user_id)
-        skills = db.get_user_skills(user_id)
-        primary_goal = db.get_primary_goal(user_id)
+        snapshot = db.get_user_snapshot(user_id)
+        user_profile = snapshot.profile
+        skills = snapshot.skills
+        primary_goal = snapshot.primary_goal
         career_goal = primary_goal.get('target_role', '') if primary_goal else user_profile.get('career_goal', '')
         
         result = projects_agent.chat_response(
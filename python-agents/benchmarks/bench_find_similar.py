@@ -0,0 +1,72 @@
+"""
+Benchmark: EmbeddingGenerator.find_similar vs the previous per-item loop
+
+Usage:
+    python benchmarks/bench_find_similar.py [--corpus 5000] [--queries 20] [--top-k 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.embedding_agent import EmbeddingGenerator
+
+
+def legacy_find_similar(query_embedding, embeddings, top_k=5):
+    """The original implementation: per-candidate norms + full sort"""
+    def similarity(a, b):
+        vec1 = np.array(a)
+        vec2 = np.array(b)
+        norm1 = np.linalg.norm(vec1)
+        norm2 = np.linalg.norm(vec2)
+        if norm1 == 0 or norm2 == 0:
+            return 0.0
+        return float(np.dot(vec1, vec2) / (norm1 * norm2))
+
+    similarities = [(i, similarity(query_embedding, emb)) for i, emb in enumerate(embeddings)]
+    similarities.sort(key=lambda x: x[1], reverse=True)
+    return similarities[:top_k]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--corpus', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--dim', type=int, default=384)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    corpus = rng.normal(size=(args.corpus, args.dim)).tolist()
+    queries = rng.normal(size=(args.queries, args.dim)).tolist()
+    generator = EmbeddingGenerator(lazy_load=True)
+
+    legacy_time, legacy = timed(lambda: [legacy_find_similar(q, corpus, args.top_k) for q in queries], 1)
+    single_time, single = timed(lambda: [generator.find_similar(q, corpus, args.top_k) for q in queries], 3)
+    batch_time, batch = timed(lambda: generator.find_similar_batch(queries, corpus, args.top_k), 3)
+
+    same = all(
+        [i for i, _ in a] == [i for i, _ in b] == [i for i, _ in c]
+        for a, b, c in zip(legacy, single, batch)
+    )
+
+    print(f"corpus={args.corpus} queries={args.queries} dim={args.dim} top_k={args.top_k}")
+    print(f"  legacy loop        : {legacy_time * 1000:9.1f} ms")
+    print(f"  find_similar       : {single_time * 1000:9.1f} ms  ({legacy_time / single_time:6.1f}x)")
+    print(f"  find_similar_batch : {batch_time * 1000:9.1f} ms  ({legacy_time / batch_time:6.1f}x)")
+    print(f"  identical rankings : {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: int8 quantized memory index vs float32 / Python lists
+
+Reports resident memory per representation, recall@k of int8 scoring with
+and without a float re-rank of the top candidates, and query latency.
+
+Usage:
+    python benchmarks/bench_quantization.py [--corpus 50000] [--queries 200] [--top-k 10] [--rerank 4]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.quantization import Int8Backend
+from services.vector_search import BruteForceBackend, normalize_rows, top_k_indices
+
+
+def python_list_bytes(n, dim):
+    """Size of n embeddings held as lists of Python floats (as get_memories returns them)"""
+    sample = [float(i) + 0.5 for i in range(dim)]
+    return n * (sys.getsizeof(sample) + dim * sys.getsizeof(1.5))
+
+
+def recall(found, truth):
+    return float(np.mean([len(np.intersect1d(a, b)) / len(b) for a, b in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--corpus', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--rerank', type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(1000, args.dim))
+    data = (centers[rng.integers(0, 1000, args.corpus + args.queries)]
+            + 1.5 * rng.normal(size=(args.corpus + args.queries, args.dim))).astype(np.float32)
+    corpus, queries = data[:args.corpus], data[args.corpus:]
+    ids = np.arange(args.corpus)
+    k = args.top_k
+
+    exact = BruteForceBackend()
+    exact.build(ids, corpus)
+    quantized = Int8Backend()
+    quantized.build(ids, corpus)
+    # Float vectors for re-ranking live in MySQL; an array stands in for them here
+    float_store = normalize_rows(corpus)
+
+    start = time.perf_counter()
+    truth = [exact.search(q, k)[0] for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    int8_only = [quantized.search(q, k)[0] for q in queries]
+    int8_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    reranked = []
+    for q in queries:
+        candidates, _ = quantized.search(q, k * args.rerank)
+        scores = float_store[candidates] @ normalize_rows(q)[0]
+        reranked.append(candidates[top_k_indices(scores, k)])
+    rerank_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    mb = 1024 * 1024
+    lists = python_list_bytes(args.corpus, args.dim)
+    print(f"corpus={args.corpus} queries={args.queries} dim={args.dim} top_k={k}")
+    print(f"  python float lists : {lists / mb:9.1f} MB")
+    print(f"  float32 matrix     : {exact.memory_bytes() / mb:9.1f} MB")
+    print(f"  int8 codes + scale : {quantized.memory_bytes() / mb:9.1f} MB  "
+          f"({exact.memory_bytes() / quantized.memory_bytes():.1f}x vs float32, "
+          f"{lists / quantized.memory_bytes():.0f}x vs lists)")
+    print(f"  exact float32      : {exact_ms:7.3f} ms/query  recall@{k}=1.000")
+    print(f"  int8               : {int8_ms:7.3f} ms/query  recall@{k}={recall(int8_only, truth):.3f}")
+    print(f"  int8 + rerank x{args.rerank:<3}: {rerank_ms:7.3f} ms/query  recall@{k}={recall(reranked, truth):.3f}")
+
+
+if __name__ == '__main__':
+    main()
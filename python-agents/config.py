@@ -13,6 +13,19 @@ class Config:
     DB_PASSWORD = os.getenv('DB_PASSWORD', '')
     DB_NAME = os.getenv('DB_NAME', 'career_agent_db')
     
+    # Connection Pool
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))  # seconds to wait for a free connection
+    DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))  # recycle connections older than this
+    DB_POOL_PING_INTERVAL = float(os.getenv('DB_POOL_PING_INTERVAL', 30))  # ping connections idle longer than this
+    
+    # User State Cache
+    STATE_CACHE_ENABLED = os.getenv('STATE_CACHE_ENABLED', 'True').lower() == 'true'
+    STATE_CACHE_BACKEND = os.getenv('STATE_CACHE_BACKEND', 'memory')  # 'memory' or 'redis'
+    STATE_CACHE_TTL = float(os.getenv('STATE_CACHE_TTL', 30))  # bounds staleness from writes made outside this service
+    STATE_CACHE_MAX_USERS = int(os.getenv('STATE_CACHE_MAX_USERS', 1000))
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    
     # LLM Configuration
     LLM_API_KEY = os.getenv('LLM_API_KEY', '')
     LLM_BASE_URL = os.getenv('LLM_BASE_URL', 'https://openrouter.ai/api/v1')
@@ -23,9 +36,99 @@ class Config:
     FALLBACK_MODELS = [
         'nvidia/nemotron-3-nano-30b-a3b:free',
     ]
+    # Per-model circuit breakers; healthy models are tried fastest-first
+    LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', 3))  # consecutive failures that open a circuit
+    LLM_BREAKER_COOLDOWN = float(os.getenv('LLM_BREAKER_COOLDOWN', 30))  # seconds before a probe request is let through
+    LLM_HEALTH_EWMA_ALPHA = float(os.getenv('LLM_HEALTH_EWMA_ALPHA', 0.3))  # weight of the newest latency/error sample
+    # Hedging: if a model has not answered within its recent latency percentile, send the same
+    # request to the next healthy model and keep the first valid answer (async client only)
+    LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'False').lower() == 'true'
+    LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', 95))
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 20))  # latencies needed before the percentile is used
+    LLM_HEDGE_DEFAULT_DELAY_MS = float(os.getenv('LLM_HEDGE_DEFAULT_DELAY_MS', 20000))  # delay until then
+    LLM_HEDGE_MIN_DELAY_MS = float(os.getenv('LLM_HEDGE_MIN_DELAY_MS', 2000))  # never hedge sooner than this
+    
+    # LLM Connections (async client with a shared keep-alive pool behind the blocking API)
+    LLM_ASYNC_ENABLED = os.getenv('LLM_ASYNC_ENABLED', 'True').lower() == 'true'
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 16))  # LLM requests in flight across all threads
+    LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 32))  # pooled HTTP connections to the LLM API
+    LLM_REQUEST_TIMEOUT = float(os.getenv('LLM_REQUEST_TIMEOUT', 120))  # seconds per request
+    LLM_SINGLE_FLIGHT_ENABLED = os.getenv('LLM_SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true'  # coalesce identical in-flight prompts
+    
+    # LLM Rate Limits (client-side token buckets; 0 = unlimited, the default). To opt in, set e.g.
+    # LLM_RATE_LIMIT_RPM=20 for the OpenRouter free tier. Queued calls are admitted interactive
+    # chat first, then dashboard requests, then background regeneration; a call that waits longer
+    # than LLM_QUEUE_TIMEOUT is not sent. Buckets are per process: with N server workers set
+    # these to the provider quota / N
+    LLM_RATE_LIMIT_RPM = float(os.getenv('LLM_RATE_LIMIT_RPM', 0))  # requests per minute
+    LLM_RATE_LIMIT_TPM = float(os.getenv('LLM_RATE_LIMIT_TPM', 0))  # estimated prompt + completion tokens per minute
+    LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', 60))  # max seconds a call waits for capacity
+    
+    # LLM Usage Telemetry (tokens, latency and model per call, attributed to the calling agent method)
+    LLM_USAGE_ENABLED = os.getenv('LLM_USAGE_ENABLED', 'True').lower() == 'true'
+    LLM_USAGE_SINK = os.getenv('LLM_USAGE_SINK', 'jsonl')  # 'jsonl', 'db' (llm_usage table, see migration_v9) or 'none'
+    LLM_USAGE_PATH = os.getenv('LLM_USAGE_PATH', 'llm_usage.jsonl')  # 'jsonl' sink file, relative to the working dir (git-ignored)
+    LLM_USAGE_BUFFER_SIZE = int(os.getenv('LLM_USAGE_BUFFER_SIZE', 5000))  # recent records kept for /api/metrics/llm-usage
+    LLM_USAGE_FLUSH_SIZE = int(os.getenv('LLM_USAGE_FLUSH_SIZE', 100))  # records per batch write
+    LLM_USAGE_FLUSH_INTERVAL = float(os.getenv('LLM_USAGE_FLUSH_INTERVAL', 30))  # max seconds between writes
+    
+    # LLM Response Cache (per-call opt-in for prompts fully determined by their inputs)
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'True').lower() == 'true'
+    LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', 86400))  # default seconds a cached response stays valid
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 2000))  # in-memory LRU tier
+    LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', '')  # SQLite file for the persistent tier when set
+    
+    # Prompt Budgets (token limits for the variable context of agent prompts; method:tokens pairs)
+    PROMPT_BUDGET_ENABLED = os.getenv('PROMPT_BUDGET_ENABLED', 'True').lower() == 'true'  # trim sections over budget
+    PROMPT_BUDGET_DEFAULT_TOKENS = int(os.getenv('PROMPT_BUDGET_DEFAULT_TOKENS', 6000))
+    PROMPT_BUDGETS = os.getenv('PROMPT_BUDGETS', 'ResumeAgent.tailor_to_job_description:3000,'
+                                                 'ResumeAgent.analyze_resume_match:3000,'
+                                                 'ResumeAgent.suggest_resume_improvements:2500,'
+                                                 'FeedbackAgent.comprehensive_feedback_analysis:2000')
     
     # Embedding Model
     EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+    EMBEDDING_PRELOAD = os.getenv('EMBEDDING_PRELOAD', 'False').lower() == 'true'  # load + warm the model at startup
+    EMBEDDING_BATCHING_ENABLED = os.getenv('EMBEDDING_BATCHING_ENABLED', 'True').lower() == 'true'
+    EMBEDDING_BATCH_MAX_SIZE = int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', 32))
+    EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_MAX_WAIT_MS', 5))  # added latency bound per request
+    EMBEDDING_BATCH_TIMEOUT = float(os.getenv('EMBEDDING_BATCH_TIMEOUT', 30))  # max seconds a caller waits for its vector
+    # Without sentence-transformers, embeddings come from hashed character n-grams. Set to true to
+    # keep producing the pre-n-gram character-frequency vectors, e.g. to stay comparable with
+    # memories already stored by a fallback deployment.
+    EMBEDDING_FALLBACK_LEGACY = os.getenv('EMBEDDING_FALLBACK_LEGACY', 'False').lower() == 'true'
+    EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'True').lower() == 'true'
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', 10000))  # in-memory LRU tier
+    EMBEDDING_CACHE_DIR = os.getenv('EMBEDDING_CACHE_DIR', '')  # enables the memory-mapped disk tier when set
+    EMBEDDING_CACHE_DISK_ENTRIES = int(os.getenv('EMBEDDING_CACHE_DISK_ENTRIES', 200000))
+    
+    # Embedding Storage (memory_vectors.embedding_blob, see migration_v8)
+    EMBEDDING_STORAGE_DTYPE = os.getenv('EMBEDDING_STORAGE_DTYPE', 'float32')  # 'float32' or 'float16'
+    EMBEDDING_JSON_DUAL_WRITE = os.getenv('EMBEDDING_JSON_DUAL_WRITE', 'False').lower() == 'true'  # also write legacy JSON
+    
+    # Memory Vector Search
+    VECTOR_SEARCH_BACKEND = os.getenv('VECTOR_SEARCH_BACKEND', 'bruteforce')  # 'bruteforce', 'ivf' or 'int8'
+    # Approximate backends ('ivf', 'int8') fetch k * factor candidates and re-score them with the
+    # stored float embeddings; 0 or 1 disables re-ranking (a factor of 1 has nothing to re-rank)
+    VECTOR_SEARCH_RERANK_FACTOR = int(os.getenv('VECTOR_SEARCH_RERANK_FACTOR', 4))
+    HYBRID_RRF_K = int(os.getenv('HYBRID_RRF_K', 60))  # reciprocal-rank fusion constant for BM25 + vector results
+    VECTOR_SEARCH_MAX_USERS = int(os.getenv('VECTOR_SEARCH_MAX_USERS', 256))  # per-user indexes kept in memory
+    # Seconds between checks of a loaded vector or BM25 index against the database, to pick up other workers' writes
+    VECTOR_SEARCH_REFRESH_INTERVAL = float(os.getenv('VECTOR_SEARCH_REFRESH_INTERVAL', 5))
+    VECTOR_INDEX_DIR = os.getenv('VECTOR_INDEX_DIR', 'vector_index')  # on-disk indexes for the 'ivf' backend
+    VECTOR_INDEX_NPROBE = int(os.getenv('VECTOR_INDEX_NPROBE', 16))  # lists scanned per query (recall vs latency)
+    VECTOR_INDEX_MIN_TRAIN = int(os.getenv('VECTOR_INDEX_MIN_TRAIN', 1024))  # smaller indexes use a single list
+    VECTOR_INDEX_DELTA_MAX = int(os.getenv('VECTOR_INDEX_DELTA_MAX', 256))  # unmerged adds before re-listing
+    # Seconds between background writes of unmerged adds/removes; 0 writes them on every change
+    VECTOR_INDEX_FLUSH_INTERVAL = float(os.getenv('VECTOR_INDEX_FLUSH_INTERVAL', 5))
+    
+    # Memory Compaction (dedupe, roll-up of old interactions, per-type retention)
+    MEMORY_COMPACTION_INTERVAL = float(os.getenv('MEMORY_COMPACTION_INTERVAL', 0))  # seconds between runs; 0 = off
+    MEMORY_COMPACTION_MIN_ROWS = int(os.getenv('MEMORY_COMPACTION_MIN_ROWS', 50))  # skip users with fewer memories
+    MEMORY_DEDUPE_THRESHOLD = float(os.getenv('MEMORY_DEDUPE_THRESHOLD', 0.97))  # cosine similarity of duplicates
+    MEMORY_ROLLUP_AFTER_DAYS = float(os.getenv('MEMORY_ROLLUP_AFTER_DAYS', 30))
+    MEMORY_ROLLUP_TYPES = os.getenv('MEMORY_ROLLUP_TYPES', 'interaction,agent_result')
+    MEMORY_RETENTION = os.getenv('MEMORY_RETENTION', 'interaction:500,agent_result:200,reasoning:200')  # type:max per user
     
     # Service Configuration
     SERVICE_PORT = int(os.getenv('SERVICE_PORT', 5000))
@@ -33,5 +136,7 @@ class Config:
     
     # Agent Settings
     MAX_RETRIES = 3
+    AGENT_FANOUT_WORKERS = int(os.getenv('AGENT_FANOUT_WORKERS', 8))  # threads shared by concurrent agent steps
+    AGENT_DEADLINE_SECONDS = float(os.getenv('AGENT_DEADLINE_SECONDS', 90))  # per-request budget; late steps use fallbacks
     REASONING_TEMPERATURE = 0.3
     PLANNING_TEMPERATURE = 0.5
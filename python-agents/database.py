@@ -4,8 +4,15 @@ Database connection and helper functions
 import mysql.connector
 from mysql.connector import Error
 from config import Config
+from db_pool import ConnectionPool
+from services.state_cache import user_state_cache
+from services.vector_search import memory_search
+from services.hybrid_search import memory_lexical, memory_retriever
+from services.embedding_codec import encode_embedding, row_embedding, rows_to_matrix, strip_embedding_columns
 from decimal import Decimal
 from datetime import datetime, date
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any
 import json
 
 
@@ -22,46 +29,91 @@ def convert_decimals(obj):
     return obj
 
 
+def decode_json_fields(row: dict, fields: list) -> dict:
+    """Decode JSON text columns of a row in place"""
+    for name in fields:
+        if row.get(name):
+            row[name] = json.loads(row[name]) if isinstance(row[name], str) else row[name]
+    return row
+
+
+PRIORITY_ORDER = {'high': 0, 'medium': 1, 'low': 2}
+
+
+@dataclass
+class UserSnapshot:
+    """Everything the agents read about a user, fetched in one round trip"""
+    user_id: int
+    profile: Optional[Dict[str, Any]] = None
+    skills: List[Dict[str, Any]] = field(default_factory=list)
+    goals: List[Dict[str, Any]] = field(default_factory=list)
+    primary_goal: Optional[Dict[str, Any]] = None
+    skill_gaps: List[Dict[str, Any]] = field(default_factory=list)
+    plans: List[Dict[str, Any]] = field(default_factory=list)
+    feedback: List[Dict[str, Any]] = field(default_factory=list)
+    applications: List[Dict[str, Any]] = field(default_factory=list)
+
+
 class Database:
     def __init__(self):
-        self.connection = None
+        self.pool = ConnectionPool(
+            self.connect,
+            size=Config.DB_POOL_SIZE,
+            timeout=Config.DB_POOL_TIMEOUT,
+            max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+            ping_interval=Config.DB_POOL_PING_INTERVAL
+        )
+        memory_search.set_loader(self._load_memory_index)
+        memory_search.set_version_loader(self._memory_index_version)
+        memory_lexical.set_loader(self._load_memory_index)
+        memory_lexical.set_version_loader(self._memory_index_version)
         
     def connect(self):
-        """Establish database connection"""
+        """Open a new database connection (used by the pool)"""
         try:
-            self.connection = mysql.connector.connect(
+            connection = mysql.connector.connect(
                 host=Config.DB_HOST,
                 user=Config.DB_USER,
                 password=Config.DB_PASSWORD,
                 database=Config.DB_NAME
             )
-            return self.connection
+            # Pooled connections are long-lived; autocommit keeps reads from
+            # seeing a stale REPEATABLE READ snapshot between queries
+            connection.autocommit = True
+            return connection
         except Error as e:
             print(f"Database connection error: {e}")
             return None
     
     def disconnect(self):
-        """Close database connection"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
+        """Close all idle pooled connections"""
+        self.pool.close_all()
+    
+    def invalidate_user_state(self, user_id: int):
+        """Drop cached state for a user after a write that changes it"""
+        user_state_cache.invalidate(user_id)
+    
+    def get_pool_stats(self):
+        """Connection pool metrics (checkouts, wait times, recycling)"""
+        return self.pool.stats()
     
     def execute_query(self, query, params=None, fetch=True):
         """Execute a query and return results"""
         try:
-            conn = self.connect()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(query, params or ())
-            
-            if fetch:
-                result = cursor.fetchall()
-                # Convert Decimal and datetime to JSON-serializable types
-                result = convert_decimals(result)
-            else:
-                conn.commit()
-                result = cursor.lastrowid
-            
-            cursor.close()
-            self.disconnect()
+            with self.pool.connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                try:
+                    cursor.execute(query, params or ())
+                    
+                    if fetch:
+                        result = cursor.fetchall()
+                        # Convert Decimal and datetime to JSON-serializable types
+                        result = convert_decimals(result)
+                    else:
+                        conn.commit()
+                        result = cursor.lastrowid
+                finally:
+                    cursor.close()
             return result
         except Error as e:
             print(f"Query execution error: {e}")
@@ -88,18 +140,113 @@ class Database:
         """
         result = self.execute_query(query, (user_id,))
         if result:
-            user = result[0]
             # Parse JSON fields
-            for field in ['education', 'experience', 'interests']:
-                if user.get(field):
-                    user[field] = json.loads(user[field]) if isinstance(user[field], str) else user[field]
-            return user
+            return decode_json_fields(result[0], ['education', 'experience', 'interests'])
         return None
     
     def update_readiness_score(self, user_id: int, score: int):
         """Update user's career readiness score"""
         query = "UPDATE users SET readiness_score = %s WHERE id = %s"
         self.execute_query(query, (score, user_id), fetch=False)
+        self.invalidate_user_state(user_id)
+    
+    # ==========================================
+    # USER SNAPSHOT
+    # ==========================================
+    
+    SNAPSHOT_QUERY = """
+        SELECT u.*, up.education, up.experience, up.interests,
+               up.resume_url, up.resume_text
+        FROM users u
+        LEFT JOIN user_profiles up ON u.id = up.user_id
+        WHERE u.id = %(user_id)s;
+        SELECT * FROM skills WHERE user_id = %(user_id)s ORDER BY level DESC;
+        SELECT * FROM goals WHERE user_id = %(user_id)s AND status = 'active';
+        SET @snapshot_goal_id := (
+            SELECT id FROM goals
+            WHERE user_id = %(user_id)s AND status = 'active'
+            ORDER BY FIELD(priority, 'high', 'medium', 'low'), id
+            LIMIT 1
+        );
+        SELECT id, skill_name, current_level, required_level, priority, status,
+               learning_resources, estimated_learning_time, learning_approach
+        FROM skill_gaps
+        WHERE user_id = %(user_id)s AND (@snapshot_goal_id IS NULL OR goal_id = @snapshot_goal_id)
+        ORDER BY FIELD(priority, 'high', 'medium', 'low');
+        SELECT * FROM plans
+        WHERE user_id = %(user_id)s AND (@snapshot_goal_id IS NULL OR goal_id = @snapshot_goal_id)
+        ORDER BY week_number;
+        SELECT * FROM feedback WHERE user_id = %(user_id)s ORDER BY created_at DESC LIMIT %(feedback_limit)s;
+        SELECT * FROM applications WHERE user_id = %(user_id)s ORDER BY created_at DESC
+    """
+    
+    def get_user_snapshot(self, user_id: int, feedback_limit: int = 5) -> UserSnapshot:
+        """
+        Fetch profile, skills, goals, primary goal, skill gaps, plans, recent
+        feedback and applications in a single multi-statement round trip.
+        Falls back to the individual getters if the batched query fails.
+        """
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                try:
+                    result_sets = []
+                    params = {'user_id': user_id, 'feedback_limit': feedback_limit}
+                    for result in cursor.execute(self.SNAPSHOT_QUERY, params, multi=True):
+                        if result.with_rows:
+                            result_sets.append(convert_decimals(result.fetchall()))
+                finally:
+                    cursor.close()
+        except Error as e:
+            print(f"Snapshot query error, falling back to individual queries: {e}")
+            return self._get_user_snapshot_sequential(user_id, feedback_limit)
+        
+        profile_rows, skills, goals, gaps, plans, feedback, applications = result_sets
+        
+        profile = profile_rows[0] if profile_rows else None
+        if profile:
+            decode_json_fields(profile, ['education', 'experience', 'interests'])
+        for gap in gaps:
+            decode_json_fields(gap, ['learning_resources'])
+        for plan in plans:
+            decode_json_fields(plan, ['tasks', 'milestones'])
+        for fb in feedback:
+            decode_json_fields(fb, ['action_items'])
+        
+        # Same ordering as @snapshot_goal_id so gaps/plans match the primary goal
+        primary_goal = min(
+            goals,
+            key=lambda g: (PRIORITY_ORDER.get(g.get('priority'), len(PRIORITY_ORDER)), g.get('id', 0)),
+            default=None
+        )
+        
+        return UserSnapshot(
+            user_id=user_id,
+            profile=profile,
+            skills=skills,
+            goals=goals,
+            primary_goal=primary_goal,
+            skill_gaps=gaps,
+            plans=plans,
+            feedback=feedback,
+            applications=applications
+        )
+    
+    def _get_user_snapshot_sequential(self, user_id: int, feedback_limit: int = 5) -> UserSnapshot:
+        """Build a snapshot with one query per table"""
+        primary_goal = self.get_primary_goal(user_id)
+        goal_id = primary_goal['id'] if primary_goal else None
+        return UserSnapshot(
+            user_id=user_id,
+            profile=self.get_user_profile(user_id),
+            skills=self.get_user_skills(user_id),
+            goals=self.get_user_goals(user_id),
+            primary_goal=primary_goal,
+            skill_gaps=self.get_skill_gaps(user_id, goal_id),
+            plans=self.get_user_plans(user_id, goal_id),
+            feedback=self.get_user_feedback(user_id, limit=feedback_limit),
+            applications=self.get_applications(user_id)
+        )
     
     # ==========================================
     # SKILLS METHODS
@@ -117,7 +264,9 @@ class Database:
             VALUES (%s, %s, %s, %s)
             ON DUPLICATE KEY UPDATE level = %s, category = %s
         """
-        return self.execute_query(query, (user_id, skill_name, level, category, level, category), fetch=False)
+        result = self.execute_query(query, (user_id, skill_name, level, category, level, category), fetch=False)
+        self.invalidate_user_state(user_id)
+        return result
     
     # ==========================================
     # GOALS METHODS
@@ -133,7 +282,7 @@ class Database:
         query = """
             SELECT * FROM goals 
             WHERE user_id = %s AND status = 'active'
-            ORDER BY FIELD(priority, 'high', 'medium', 'low')
+            ORDER BY FIELD(priority, 'high', 'medium', 'low'), id
             LIMIT 1
         """
         result = self.execute_query(query, (user_id,))
@@ -162,8 +311,7 @@ class Database:
         
         # Parse learning_resources JSON
         for gap in gaps:
-            if gap.get('learning_resources'):
-                gap['learning_resources'] = json.loads(gap['learning_resources']) if isinstance(gap['learning_resources'], str) else gap['learning_resources']
+            decode_json_fields(gap, ['learning_resources'])
         
         return gaps
     
@@ -190,6 +338,8 @@ class Database:
                 gap.get('estimated_learning_time', None),
                 gap.get('learning_approach', None)
             ), fetch=False)
+        
+        self.invalidate_user_state(user_id)
     
     # ==========================================
     # PLANS METHODS
@@ -206,10 +356,7 @@ class Database:
         
         plans = self.execute_query(query, params) or []
         for plan in plans:
-            if plan.get('tasks'):
-                plan['tasks'] = json.loads(plan['tasks']) if isinstance(plan['tasks'], str) else plan['tasks']
-            if plan.get('milestones'):
-                plan['milestones'] = json.loads(plan['milestones']) if isinstance(plan['milestones'], str) else plan['milestones']
+            decode_json_fields(plan, ['tasks', 'milestones'])
         return plans
     
     def save_plan(self, user_id: int, goal_id: int, plan: dict):
@@ -222,7 +369,7 @@ class Database:
                 tasks = VALUES(tasks), milestones = VALUES(milestones),
                 ai_notes = VALUES(ai_notes), status = VALUES(status)
         """
-        return self.execute_query(query, (
+        result = self.execute_query(query, (
             user_id, goal_id, plan['week_number'], plan['title'],
             plan.get('description', ''),
             json.dumps(plan.get('tasks', [])),
@@ -230,6 +377,8 @@ class Database:
             plan.get('ai_notes', ''),
             plan.get('status', 'pending')
         ), fetch=False)
+        self.invalidate_user_state(user_id)
+        return result
     
     # ==========================================
     # FEEDBACK METHODS
@@ -240,8 +389,7 @@ class Database:
         query = "SELECT * FROM feedback WHERE user_id = %s ORDER BY created_at DESC LIMIT %s"
         feedback_list = self.execute_query(query, (user_id, limit)) or []
         for fb in feedback_list:
-            if fb.get('action_items'):
-                fb['action_items'] = json.loads(fb['action_items']) if isinstance(fb['action_items'], str) else fb['action_items']
+            decode_json_fields(fb, ['action_items'])
         return feedback_list
     
     def save_feedback(self, user_id: int, feedback: dict):
@@ -267,15 +415,17 @@ class Database:
             INSERT INTO feedback (user_id, source, company, role, message, analysis, sentiment, action_items)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """
-        return self.execute_query(query, (
+        result = self.execute_query(query, (
             user_id, feedback['source'], feedback.get('company'),
             feedback.get('role'), feedback['message'],
             analysis_text if isinstance(analysis_text, str) else json.dumps(analysis_text),
             feedback.get('sentiment', 'neutral'),
             json.dumps(action_items)
         ), fetch=False)
+        self.invalidate_user_state(user_id)
+        return result
     
-    def update_feedback_analysis(self, feedback_id: int, analysis: dict):
+    def update_feedback_analysis(self, feedback_id: int, analysis: dict, user_id: int = None):
         """Update feedback with AI analysis - properly serialized"""
         # Serialize the analysis properly
         analysis_text = ''
@@ -317,12 +467,18 @@ class Database:
             SET analysis = %s, sentiment = %s, action_items = %s
             WHERE id = %s
         """
-        return self.execute_query(query, (
+        result = self.execute_query(query, (
             analysis_text,
             sentiment,
             json.dumps(action_items),
             feedback_id
         ), fetch=False)
+        
+        if user_id is None:
+            owner = self.execute_query("SELECT user_id FROM feedback WHERE id = %s", (feedback_id,))
+            user_id = owner[0]['user_id'] if owner else None
+        self.invalidate_user_state(user_id)
+        return result
     
     def save_ai_feedback_log(self, user_id: int, feedback_id: int, prompt: str, response: dict, token_usage: int = 0):
         """Save AI feedback analysis log for debugging and auditing"""
@@ -341,6 +497,43 @@ class Database:
             user_id, feedback_id, prompt, response_text, parsed_insights, token_usage
         ), fetch=False)
     
+    # ==========================================
+    # LLM USAGE METHODS
+    # ==========================================
+    
+    def save_llm_usage(self, records: list):
+        """Batch insert LLM usage records (see services/llm_usage.py)"""
+        query = """
+            INSERT INTO llm_usage (agent, method, model, prompt_tokens, completion_tokens, total_tokens,
+                                   latency_ms, queued_ms, requests, success, estimated, stream, priority, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        rows = [(
+            r['agent'][:100], r['method'][:100], r['model'], r['prompt_tokens'], r['completion_tokens'],
+            r['total_tokens'], r['latency_ms'], r['queued_ms'], r['requests'], r['success'], r['estimated'],
+            r['stream'], r['priority'], r['created_at'].replace('T', ' ')
+        ) for r in records]
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(query, rows)
+                conn.commit()
+            finally:
+                cursor.close()
+    
+    def get_llm_usage_summary(self, days: int = 7) -> list:
+        """Token usage per agent method over the last `days` days, most tokens first"""
+        query = """
+            SELECT agent, method, COUNT(*) AS calls, SUM(success = 0) AS failures,
+                   SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens,
+                   SUM(total_tokens) AS total_tokens, AVG(latency_ms) AS avg_latency_ms
+            FROM llm_usage
+            WHERE created_at >= NOW() - INTERVAL %s DAY
+            GROUP BY agent, method
+            ORDER BY total_tokens DESC
+        """
+        return self.execute_query(query, (days,)) or []
+    
     # ==========================================
     # MEMORY VECTORS METHODS
     # ==========================================
@@ -348,13 +541,152 @@ class Database:
     def save_memory(self, user_id: int, content: str, embedding: list, memory_type: str, metadata: dict = None):
         """Save a memory vector"""
         query = """
-            INSERT INTO memory_vectors (user_id, content, embedding, type, metadata)
-            VALUES (%s, %s, %s, %s, %s)
+            INSERT INTO memory_vectors (user_id, content, embedding, embedding_blob, embedding_dtype,
+                                        embedding_dim, type, metadata)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """
-        return self.execute_query(query, (
-            user_id, content, json.dumps(embedding), memory_type,
+        dtype = Config.EMBEDDING_STORAGE_DTYPE
+        memory_id = self.execute_query(query, (
+            user_id, content,
+            json.dumps(embedding) if Config.EMBEDDING_JSON_DUAL_WRITE else None,
+            encode_embedding(embedding, dtype), dtype, len(embedding),
+            memory_type,
             json.dumps(metadata) if metadata else None
         ), fetch=False)
+        
+        if memory_id:
+            row = {
+                'id': memory_id,
+                'user_id': user_id,
+                'content': content,
+                'type': memory_type,
+                'metadata': metadata,
+                'created_at': datetime.now().isoformat()
+            }
+            memory_search.add(user_id, row, embedding)
+            memory_lexical.add(user_id, row)
+        return memory_id
+    
+    def _load_memory_index(self, user_id: int, include_embeddings: bool = True, memory_ids: list = None):
+        """
+        Load a user's memories for the vector index as (rows, embedding matrix)
+        
+        Args:
+            include_embeddings: False returns (rows, None) for reconciling a saved index
+            memory_ids: Restrict to these memory ids
+        """
+        # Legacy JSON is only transferred for rows that have not been backfilled
+        columns = "id, user_id, content, type, metadata, created_at"
+        if include_embeddings:
+            columns += """,
+                   embedding_blob, embedding_dtype, embedding_dim,
+                   IF(embedding_blob IS NULL, embedding, NULL) AS embedding"""
+        query = f"SELECT {columns} FROM memory_vectors WHERE user_id = %s"
+        params = [user_id]
+        if memory_ids:
+            query += f" AND id IN ({', '.join(['%s'] * len(memory_ids))})"
+            params.extend(memory_ids)
+        query += " ORDER BY id"
+        rows = self.execute_query(query, tuple(params))
+        if rows is None:
+            return None
+        if not include_embeddings:
+            return [decode_json_fields(row, ['metadata']) for row in rows], None
+        
+        matrix, keep = rows_to_matrix(rows)
+        rows = [decode_json_fields(strip_embedding_columns(rows[i]), ['metadata']) for i in keep]
+        return rows, matrix
+    
+    def _memory_index_version(self, user_id: int):
+        """(row count, max id) of a user's memories; changes whenever any worker adds or deletes one"""
+        query = "SELECT COUNT(*) AS memories, MAX(id) AS max_id FROM memory_vectors WHERE user_id = %s"
+        rows = self.execute_query(query, (user_id,))
+        if not rows:
+            return None
+        return rows[0]['memories'], rows[0]['max_id']
+    
+    def delete_memories(self, user_id: int, memory_ids: list, chunk_size: int = 500) -> int:
+        """Delete a user's memories by id and drop them from the search indexes; returns rows deleted"""
+        deleted = 0
+        for start in range(0, len(memory_ids), chunk_size):
+            chunk = memory_ids[start:start + chunk_size]
+            query = f"DELETE FROM memory_vectors WHERE user_id = %s AND id IN ({', '.join(['%s'] * len(chunk))})"
+            try:
+                with self.pool.connection() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        cursor.execute(query, (user_id, *chunk))
+                        conn.commit()
+                        deleted += cursor.rowcount
+                    finally:
+                        cursor.close()
+            except Error as e:
+                print(f"Memory delete error: {e}")
+                break
+            memory_search.remove(user_id, chunk)
+            memory_lexical.remove(user_id, chunk)
+        return deleted
+    
+    def get_memory_heavy_users(self, min_memories: int = 50) -> list:
+        """User ids with at least `min_memories` memories, largest first"""
+        query = """
+            SELECT user_id, COUNT(*) AS memories FROM memory_vectors
+            GROUP BY user_id HAVING COUNT(*) >= %s ORDER BY memories DESC
+        """
+        return [row['user_id'] for row in self.execute_query(query, (min_memories,)) or []]
+    
+    def _decode_memory_row(self, mem: dict) -> dict:
+        """Decode a memory_vectors row for API output (embedding as a float list)"""
+        embedding = row_embedding(mem)
+        strip_embedding_columns(mem)
+        if embedding is not None:
+            mem['embedding'] = embedding.tolist()
+        return decode_json_fields(mem, ['metadata'])
+    
+    def migrate_memory_embeddings(self, batch_size: int = 500, dtype: str = None) -> int:
+        """
+        Backfill embedding_blob for rows that only have legacy JSON embeddings
+        
+        Returns:
+            Number of rows converted
+        """
+        dtype = dtype or Config.EMBEDDING_STORAGE_DTYPE
+        select_query = """
+            SELECT id, embedding FROM memory_vectors
+            WHERE embedding_blob IS NULL AND embedding IS NOT NULL AND id > %s
+            ORDER BY id LIMIT %s
+        """
+        update_query = """
+            UPDATE memory_vectors
+            SET embedding_blob = %s, embedding_dtype = %s, embedding_dim = %s
+            WHERE id = %s
+        """
+        converted = 0
+        last_id = 0
+        while True:
+            rows = self.execute_query(select_query, (last_id, batch_size))
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                embedding = row_embedding(row)
+                if embedding is not None and len(embedding):
+                    updates.append((encode_embedding(embedding, dtype), dtype, len(embedding), row['id']))
+            if updates:
+                with self.pool.connection() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        cursor.executemany(update_query, updates)
+                        conn.commit()
+                    finally:
+                        cursor.close()
+            converted += len(updates)
+            last_id = rows[-1]['id']
+        
+        # Indexes were built from the old representation; rebuild lazily
+        memory_search.clear()
+        memory_lexical.clear()
+        return converted
     
     def get_memories(self, user_id: int, memory_type: str = None, limit: int = 20):
         """Get memory vectors for a user"""
@@ -366,12 +698,7 @@ class Database:
             params = (user_id, limit)
         
         memories = self.execute_query(query, params) or []
-        for mem in memories:
-            if mem.get('embedding'):
-                mem['embedding'] = json.loads(mem['embedding']) if isinstance(mem['embedding'], str) else mem['embedding']
-            if mem.get('metadata'):
-                mem['metadata'] = json.loads(mem['metadata']) if isinstance(mem['metadata'], str) else mem['metadata']
-        return memories
+        return [self._decode_memory_row(mem) for mem in memories]
     
     # ==========================================
     # APPLICATIONS METHODS
@@ -420,24 +747,33 @@ class Database:
         else:
             query = "DELETE FROM plans WHERE user_id = %s"
             self.execute_query(query, (user_id,), fetch=False)
+        self.invalidate_user_state(user_id)
     
-    def search_memories(self, user_id: int, query_embedding: list, limit: int = 5):
-        """Search memories by embedding similarity (simplified - uses recent memories)"""
-        # For full vector search, you'd use a vector database
-        # This is a simplified version that returns recent relevant memories
-        query = """
-            SELECT * FROM memory_vectors 
-            WHERE user_id = %s 
-            ORDER BY created_at DESC 
-            LIMIT %s
+    def search_memories(self, user_id: int, query_embedding: list, limit: int = 5,
+                        types: list = None, max_age_days: float = None):
+        """
+        Search memories by embedding similarity
+        
+        Returns the `limit` most similar memories, best first, each with a
+        `similarity_score`. Embeddings are not included in the results.
+        types / max_age_days restrict results to those memory types / ages.
+        """
+        if not query_embedding:
+            return self.get_memories(user_id, limit=limit)
+        if types or max_age_days:
+            return memory_retriever.search_vector(user_id, query_embedding, limit, types, max_age_days)
+        return memory_search.search(user_id, query_embedding, limit)
+    
+    def hybrid_search_memories(self, user_id: int, query: str, query_embedding: list = None, limit: int = 5,
+                               types: list = None, max_age_days: float = None):
+        """
+        Search memories by keywords (BM25) fused with embedding similarity
+        
+        Without a query embedding only the lexical index is used, which needs
+        no embedding model. Results carry an `rrf_score` plus `bm25_score` /
+        `similarity_score` from the path(s) that found them.
         """
-        memories = self.execute_query(query, (user_id, limit)) or []
-        for mem in memories:
-            if mem.get('embedding'):
-                mem['embedding'] = json.loads(mem['embedding']) if isinstance(mem['embedding'], str) else mem['embedding']
-            if mem.get('metadata'):
-                mem['metadata'] = json.loads(mem['metadata']) if isinstance(mem['metadata'], str) else mem['metadata']
-        return memories
+        return memory_retriever.search(user_id, query, query_embedding, limit, types, max_age_days)
     
     def update_skill_priorities(self, user_id: int, skill_updates: list):
         """Update skill priorities based on feedback"""
@@ -448,6 +784,7 @@ class Database:
                 WHERE user_id = %s AND skill_name = %s
             """
             self.execute_query(query, (update['priority'], user_id, update['skill_name']), fetch=False)
+        self.invalidate_user_state(user_id)
     
     # ==========================================
     # CHAT MESSAGES METHODS
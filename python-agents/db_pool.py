@@ -0,0 +1,241 @@
+"""
+MySQL Connection Pool
+Keeps authenticated connections open between queries so each request
+does not pay for a fresh TCP + auth handshake
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, List, Optional
+
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+
+class _PooledConnection:
+    """Bookkeeping wrapper around a raw connection"""
+    __slots__ = ('conn', 'created_at', 'last_used', 'owner')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.owner = None
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of reusable MySQL connections.
+
+    - Bounded size; callers wait (up to a timeout) when every connection is busy
+    - Connections idle longer than `ping_interval` are pinged on checkout
+    - Connections older than `max_lifetime` are closed and replaced
+    - Per-thread affinity: nested checkouts on the same thread share one
+      connection, and a thread prefers the idle connection it used last
+    """
+
+    def __init__(self, factory: Callable, size: int = 10, timeout: float = 10.0,
+                 max_lifetime: float = 1800.0, ping_interval: float = 30.0):
+        self._factory = factory
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+
+        self._idle: List[_PooledConnection] = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+        self._checkouts = 0
+        self._reentrant_checkouts = 0
+        self._affinity_hits = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._created = 0
+        self._recycled = 0
+        self._health_failures = 0
+
+    # ==========================================
+    # CHECKOUT / RETURN
+    # ==========================================
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of the `with` block"""
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except Error:
+            # A failed multi-statement query can leave unread results behind
+            broken = not self._is_alive(conn) or getattr(conn, 'unread_result', False)
+            raise
+        finally:
+            self.release(discard=broken)
+
+    def acquire(self):
+        """Check out a connection, reusing this thread's connection if it already holds one"""
+        held = getattr(self._local, 'held', None)
+        if held is not None:
+            self._local.depth += 1
+            with self._cond:
+                self._reentrant_checkouts += 1
+            return held.conn
+
+        ident = threading.get_ident()
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        pooled = None
+
+        with self._cond:
+            while True:
+                pooled = self._take_idle(ident)
+                if pooled is not None:
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolError(f"No database connection available within {self.timeout}s "
+                                    f"(pool size {self.size})")
+                waited = True
+                self._cond.wait(remaining)
+
+            wait = time.monotonic() - start
+            self._checkouts += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            if waited:
+                self._waits += 1
+
+        try:
+            pooled = self._validate(pooled)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        pooled.owner = ident
+        self._local.held = pooled
+        self._local.depth = 1
+        return pooled.conn
+
+    def release(self, discard: bool = False):
+        """Return this thread's connection to the pool"""
+        held = getattr(self._local, 'held', None)
+        if held is None:
+            return
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.held = None
+
+        if discard:
+            self._close(held)
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            return
+
+        held.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(held)
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (in-use connections close when returned)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close(pooled)
+
+    # ==========================================
+    # METRICS
+    # ==========================================
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool sizing metrics"""
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+                "checkouts": checkouts,
+                "reentrant_checkouts": self._reentrant_checkouts,
+                "affinity_hits": self._affinity_hits,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "avg_wait_ms": round(self._wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 3),
+                "total_wait_ms": round(self._wait_total * 1000, 3),
+                "connections_created": self._created,
+                "connections_recycled": self._recycled,
+                "health_check_failures": self._health_failures
+            }
+
+    # ==========================================
+    # INTERNALS
+    # ==========================================
+
+    def _take_idle(self, ident: int) -> Optional[_PooledConnection]:
+        """Pop an idle connection, preferring the one this thread used last (lock held)"""
+        if not self._idle:
+            return None
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i].owner == ident:
+                self._affinity_hits += 1
+                return self._idle.pop(i)
+        return self._idle.pop()
+
+    def _validate(self, pooled: Optional[_PooledConnection]) -> _PooledConnection:
+        """Recycle stale connections and health-check idle ones before handing them out"""
+        if pooled is not None:
+            now = time.monotonic()
+            if now - pooled.created_at > self.max_lifetime:
+                self._close(pooled)
+                with self._cond:
+                    self._recycled += 1
+                pooled = None
+            elif now - pooled.last_used > self.ping_interval and not self._is_alive(pooled.conn, ping=True):
+                self._close(pooled)
+                with self._cond:
+                    self._health_failures += 1
+                pooled = None
+
+        if pooled is None:
+            conn = self._factory()
+            if conn is None:
+                raise Error("Could not open database connection")
+            pooled = _PooledConnection(conn)
+            with self._cond:
+                self._created += 1
+        return pooled
+
+    @staticmethod
+    def _is_alive(conn, ping: bool = False) -> bool:
+        try:
+            if ping:
+                conn.ping(reconnect=False)
+                return True
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
@@ -2,13 +2,231 @@
 LLM Client for Agent Reasoning
 Handles all LLM API calls with proper error handling
 """
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from config import Config
+from services.llm_cache import llm_response_cache, response_key
+from services import single_flight as _single_flight_module
+from services.single_flight import SingleFlight
+from services.model_health import model_health
+from services.llm_scheduler import QueueTimeout, estimate_tokens, llm_scheduler
+from services.llm_usage import CallUsage, find_caller, llm_usage
+from services.stream_json import IncrementalJSONParser, parse_partial_json
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+import asyncio
+import copy
 import json
 import re
+import threading
+import time
+
+# Optional: tune the shared connection pool (openai falls back to its own defaults)
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# Frames skipped when attributing a call to the agent method that made it
+_INTERNAL_FILES = (__file__, _single_flight_module.__file__)
+
+
+class StreamInterrupted(Exception):
+    """A streamed reply failed after part of it was yielded; the text so far is incomplete"""
+
+
+class AsyncLLMClient:
+    """
+    Async LLM client running on one background event loop.
+    
+    All completions share a single AsyncOpenAI client (one keep-alive
+    connection pool) and a global semaphore, so many concurrent calls cost
+    coroutines rather than threads and never exceed max_concurrency
+    requests in flight. Sync code submits work with run()/submit().
+    """
+    
+    def __init__(self, max_concurrency: int = 16, max_connections: int = 32, timeout: float = 120):
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[AsyncOpenAI] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='llm-event-loop', daemon=True).start()
+                asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                self._loop = loop
+        return self._loop
+    
+    async def _setup(self):
+        # Created on the loop thread: both are bound to this event loop
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        options = {"api_key": Config.LLM_API_KEY, "base_url": Config.LLM_BASE_URL, "timeout": self.timeout}
+        if HTTPX_AVAILABLE:
+            options["http_client"] = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=self.timeout
+            )
+        self._client = AsyncOpenAI(**options)
+    
+    async def _request(self, model: str, messages: list, temperature: float, max_tokens: int):
+        """(response, upstream latency in ms); time spent queued for a slot is excluded"""
+        # Counters are only touched on the loop thread
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.requests += 1
+        start = time.perf_counter()
+        try:
+            response = await self._client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            return response, (time.perf_counter() - start) * 1000
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+    
+    async def _attempt(self, model: str, messages: list, temperature: float, max_tokens: int,
+                       usage: CallUsage = None, ticket=None) -> Optional[str]:
+        """One request to one model (already allowed by model_health); None on failure"""
+        llm_scheduler.charge(ticket)
+        try:
+            with model_health.attempt(model) as attempt:
+                print(f"Calling LLM model: {model}")
+                response, latency_ms = await self._request(model, messages, temperature, max_tokens)
+                result = response.choices[0].message.content
+                if usage is not None:
+                    usage.add(model, response.usage, result)
+                print(f"LLM response received: {len(result) if result else 0} characters")
+                if result:
+                    attempt.success(latency_ms)
+                    return result
+                attempt.failure('empty response')
+        except Exception as e:
+            self.errors += 1
+            print(f"LLM API Error with model {model}: {e}")
+        return None
+    
+    def hedge_delay(self, model: str) -> float:
+        """Seconds to wait for a model before hedging: its recent latency percentile, floored"""
+        delay_ms = model_health.latency_percentile(model, Config.LLM_HEDGE_PERCENTILE,
+                                                   min_samples=Config.LLM_HEDGE_MIN_SAMPLES)
+        if delay_ms is None:
+            delay_ms = Config.LLM_HEDGE_DEFAULT_DELAY_MS
+        return max(delay_ms, Config.LLM_HEDGE_MIN_DELAY_MS) / 1000
+    
+    async def complete(self, messages: list, models: List[str], temperature: float, max_tokens: int,
+                       hedge: bool = False, validate: Callable[[str], bool] = None,
+                       usage: CallUsage = None, ticket=None) -> Optional[str]:
+        """
+        Try healthy models best-first; returns the first non-empty response text
+        
+        With hedge=True, a model that has not answered within hedge_delay()
+        gets the same request sent to the next healthy model; the first valid
+        response (per validate, default non-empty) wins and the other request
+        is cancelled. Token usage of every response is added to usage, and
+        every request is charged to the rate limiter under ticket.
+        """
+        candidates = iter(model_health.order(models))
+        
+        def next_allowed() -> Optional[str]:
+            for candidate in candidates:
+                if model_health.allow(candidate):
+                    return candidate
+            return None
+        
+        model = next_allowed()
+        while model is not None:
+            if not hedge:
+                result = await self._attempt(model, messages, temperature, max_tokens, usage, ticket)
+                if result:
+                    return result
+                model = next_allowed()
+                continue
+            
+            started = time.perf_counter()
+            primary = asyncio.ensure_future(self._attempt(model, messages, temperature, max_tokens, usage, ticket))
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay(model))
+            backup_model = None if done else next_allowed()
+            if backup_model is None:
+                result = await primary
+                if result:
+                    return result
+                model = next_allowed()
+                continue
+            
+            self.hedges_fired += 1
+            print(f"Hedging {model} after {(time.perf_counter() - started) * 1000:.0f} ms with {backup_model}")
+            backup = asyncio.ensure_future(self._attempt(backup_model, messages, temperature, max_tokens,
+                                                         usage, ticket))
+            pending, unvalidated = {primary, backup}, None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result and (validate is None or validate(result)):
+                        for loser in pending:
+                            loser.cancel()
+                        if task is backup:
+                            self.hedges_won += 1
+                            # The primary's elapsed time is a lower bound on its latency; keep the tail visible
+                            model_health.record_latency(model, (time.perf_counter() - started) * 1000)
+                        return result
+                    unvalidated = unvalidated or result
+            if unvalidated:
+                return unvalidated
+            model = next_allowed()
+        
+        print("All models failed")
+        return None
+    
+    def submit(self, coroutine) -> Future:
+        """Schedule a coroutine on the client's loop without blocking"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+    
+    def run(self, coroutine, timeout: float = None):
+        """Run a coroutine on the client's loop and wait for its result"""
+        return self.submit(coroutine).result(timeout)
+    
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_connections": self.max_connections if HTTPX_AVAILABLE else None,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "peak_in_flight": self.peak_in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "hedge_win_rate": round(self.hedges_won / self.hedges_fired, 4) if self.hedges_fired else 0.0
+        }
 
 
 class LLMClient:
+    JSON_INSTRUCTION = "\n\nIMPORTANT: Respond with valid, complete JSON only. No markdown formatting. Ensure all strings are properly closed and the JSON is complete."
+    CHAT_UNAVAILABLE_MESSAGE = "I'm sorry, I encountered an error processing your request. The AI service is temporarily unavailable. Please try again in a moment."
+    
     def __init__(self):
         self.client = OpenAI(
             api_key=Config.LLM_API_KEY,
@@ -17,6 +235,14 @@ class LLMClient:
         self.model = Config.LLM_MODEL
         self.fallback_models = Config.FALLBACK_MODELS
         self.current_model_index = 0
+        # Blocking calls are served by the shared async client unless disabled
+        self.async_client = AsyncLLMClient(
+            max_concurrency=Config.LLM_MAX_CONCURRENCY,
+            max_connections=Config.LLM_MAX_CONNECTIONS,
+            timeout=Config.LLM_REQUEST_TIMEOUT
+        ) if Config.LLM_ASYNC_ENABLED else None
+        # Identical prompts in flight at the same time share one upstream request
+        self.single_flight = SingleFlight() if Config.LLM_SINGLE_FLIGHT_ENABLED else None
         print(f"LLM Client initialized with model: {self.model}")
         print(f"Using API base URL: {Config.LLM_BASE_URL}")
         print(f"Fallback models available: {self.fallback_models}")
@@ -33,7 +259,11 @@ class LLMClient:
         """Reset the model index for next request"""
         self.current_model_index = 0
     
-    def call(self, prompt: str, system_prompt: str = None, temperature: float = 0.3, max_tokens: int = 4000) -> str:
+    def _cache_key(self, prompt: str, system_prompt: str, temperature: float, max_tokens: int) -> str:
+        return response_key(self.model, system_prompt, prompt, temperature, max_tokens)
+    
+    def call(self, prompt: str, system_prompt: str = None, temperature: float = 0.3, max_tokens: int = 4000,
+             cache: bool = False, cache_ttl: float = None, hedge: bool = None) -> str:
         """
         Make an LLM API call with fallback support
         
@@ -42,10 +272,36 @@ class LLMClient:
             system_prompt: Optional system prompt
             temperature: Creativity setting (0.0 - 1.0)
             max_tokens: Maximum tokens in response
+            cache: Serve/store the response from the response cache (only for
+                prompts fully determined by their inputs)
+            cache_ttl: Seconds the cached response stays valid (default LLM_CACHE_TTL)
+            hedge: Race a slow model against the next healthy one (default LLM_HEDGE_ENABLED)
+        
+        Concurrent calls with identical arguments share one upstream request.
         
         Returns:
             The LLM response text
         """
+        key = self._cache_key(prompt, system_prompt, temperature, max_tokens)
+        if cache:
+            cached = llm_response_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        def fetch():
+            start = time.perf_counter()
+            result = self._complete(prompt, system_prompt, temperature, max_tokens, hedge=hedge)
+            if cache and result:
+                llm_response_cache.put(key, result, (time.perf_counter() - start) * 1000, cache_ttl)
+            return result
+        
+        if self.single_flight is None:
+            return fetch()
+        return self.single_flight.do(('text', key), fetch)[0]
+    
+    def _complete(self, prompt: str, system_prompt: str, temperature: float, max_tokens: int,
+                  hedge: bool = None, validate: Callable[[str], bool] = None) -> str:
+        """Uncached completion: primary model first, then fallbacks"""
         messages = []
         
         if system_prompt:
@@ -53,22 +309,87 @@ class LLMClient:
         
         messages.append({"role": "user", "content": prompt})
         
-        # Try primary model first, then fallbacks
+        return self._complete_messages(messages, temperature, max_tokens, hedge, validate)
+    
+    def _admit(self, messages: list, max_tokens: int):
+        """
+        Wait for rate-limit capacity at the current priority class
+        
+        Returns:
+            A scheduler ticket, or None if the call timed out in the queue
+        """
+        prompt_tokens = sum(estimate_tokens(m.get("content")) for m in messages)
+        try:
+            return llm_scheduler.acquire(tokens=prompt_tokens + max_tokens)
+        except QueueTimeout as e:
+            print(f"LLM call not sent: {e}")
+            return None
+    
+    def _finish(self, ticket, caller: tuple, start: float, messages: list, usage: CallUsage,
+                result: Optional[str], stream: bool = False):
+        """Settle the rate limiter with the actual token count and record the call's usage"""
+        prompt_tokens, completion_tokens, estimated = usage.totals(messages, result)
+        llm_scheduler.settle(ticket, prompt_tokens + completion_tokens)
+        llm_usage.record(
+            caller[0], caller[1], usage.model, prompt_tokens, completion_tokens,
+            latency_ms=(time.perf_counter() - start) * 1000 - ticket.queued_ms,
+            requests=usage.requests, success=bool(result), estimated=estimated,
+            priority=ticket.priority, queued_ms=ticket.queued_ms, stream=stream
+        )
+    
+    def _complete_messages(self, messages: list, temperature: float, max_tokens: int,
+                           hedge: bool = None, validate: Callable[[str], bool] = None) -> Optional[str]:
+        """Rate-limited completion; one admission and one usage record cover fallbacks and hedges"""
+        caller = find_caller(_INTERNAL_FILES)
+        start = time.perf_counter()
+        ticket = self._admit(messages, max_tokens)
+        if ticket is None:
+            return None
+        usage = CallUsage()
+        result = None
+        try:
+            result = self._send_messages(messages, temperature, max_tokens, hedge, validate, usage, ticket)
+            return result
+        finally:
+            self._finish(ticket, caller, start, messages, usage, result)
+    
+    def _send_messages(self, messages: list, temperature: float, max_tokens: int,
+                       hedge: bool = None, validate: Callable[[str], bool] = None,
+                       usage: CallUsage = None, ticket=None) -> Optional[str]:
+        # Primary model and fallbacks, reordered by health (open circuits are skipped)
         models_to_try = [self.model] + self.fallback_models
         
-        for model in models_to_try:
+        if self.async_client is not None:
+            if hedge is None:
+                hedge = Config.LLM_HEDGE_ENABLED
+            return self.async_client.run(self.async_client.complete(
+                messages, models_to_try, temperature, max_tokens, hedge=hedge, validate=validate, usage=usage,
+                ticket=ticket
+            ))
+        
+        # Hedging needs cancellable requests, so the blocking path tries models one at a time
+        
+        for model in model_health.order(models_to_try):
+            if not model_health.allow(model):
+                continue
+            llm_scheduler.charge(ticket)
             try:
-                print(f"Calling LLM model: {model}")
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens
-                )
-                result = response.choices[0].message.content
-                print(f"LLM response received: {len(result) if result else 0} characters")
-                if result and len(result) > 0:
-                    return result
+                with model_health.attempt(model) as attempt:
+                    print(f"Calling LLM model: {model}")
+                    response = self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    )
+                    result = response.choices[0].message.content
+                    if usage is not None:
+                        usage.add(model, response.usage, result)
+                    print(f"LLM response received: {len(result) if result else 0} characters")
+                    if result and len(result) > 0:
+                        attempt.success()
+                        return result
+                    attempt.failure('empty response')
             except Exception as e:
                 print(f"LLM API Error with model {model}: {e}")
                 continue
@@ -76,7 +397,8 @@ class LLMClient:
         print("All models failed")
         return None
     
-    def call_json(self, prompt: str, system_prompt: str = None, temperature: float = 0.3, max_tokens: int = 4000) -> dict:
+    def call_json(self, prompt: str, system_prompt: str = None, temperature: float = 0.3, max_tokens: int = 4000,
+                  cache: bool = False, cache_ttl: float = None, hedge: bool = None) -> dict:
         """
         Make an LLM API call expecting JSON response
         
@@ -85,19 +407,40 @@ class LLMClient:
             system_prompt: Optional system prompt
             temperature: Creativity setting
             max_tokens: Maximum tokens in response
+            cache: Serve/store the response from the response cache; only
+                responses that parse as complete JSON are stored
+            cache_ttl: Seconds the cached response stays valid (default LLM_CACHE_TTL)
+            hedge: Race a slow model against the next healthy one (default
+                LLM_HEDGE_ENABLED); a response that parses as JSON wins
+        
+        Concurrent calls with identical arguments share one upstream request.
         
         Returns:
             Parsed JSON response as dict
         """
         # Add JSON instruction to prompt
-        json_prompt = prompt + "\n\nIMPORTANT: Respond with valid, complete JSON only. No markdown formatting. Ensure all strings are properly closed and the JSON is complete."
+        json_prompt = prompt + self.JSON_INSTRUCTION
         
-        response_text = self.call(json_prompt, system_prompt, temperature, max_tokens)
+        key = self._cache_key(json_prompt, system_prompt, temperature, max_tokens)
+        if cache:
+            cached = llm_response_cache.get(key)
+            if cached is not None:
+                # Parsed per hit, so callers can mutate the result freely
+                return json.loads(cached)
         
-        if not response_text:
-            return None
+        def fetch():
+            return self._fetch_json(json_prompt, system_prompt, temperature, max_tokens,
+                                    key if cache else None, cache_ttl, hedge)
         
-        # Clean up response
+        if self.single_flight is None:
+            return fetch()
+        result, shared = self.single_flight.do(('json', key), fetch)
+        # Every caller of a coalesced request gets its own copy, as agents mutate the result
+        return copy.deepcopy(result) if shared else result
+    
+    @staticmethod
+    def _clean_json_text(response_text: str) -> str:
+        """Strip whitespace and markdown code fences around a JSON response"""
         response_text = response_text.strip()
         if response_text.startswith("```json"):
             response_text = response_text[7:]
@@ -106,85 +449,98 @@ class LLMClient:
         if response_text.endswith("```"):
             response_text = response_text[:-3]
         
-        response_text = response_text.strip()
+        return response_text.strip()
+    
+    @classmethod
+    def _is_complete_json(cls, response_text: str) -> bool:
+        try:
+            json.loads(cls._clean_json_text(response_text))
+            return True
+        except json.JSONDecodeError:
+            return False
+    
+    def _fetch_json(self, json_prompt: str, system_prompt: str, temperature: float, max_tokens: int,
+                    cache_key: Optional[str], cache_ttl: Optional[float], hedge: bool = None) -> dict:
+        """Complete, clean up and parse a JSON prompt; stores cleanly parsed responses"""
+        start = time.perf_counter()
+        response_text = self._complete(json_prompt, system_prompt, temperature, max_tokens,
+                                       hedge=hedge, validate=self._is_complete_json)
+        
+        if not response_text:
+            return None
+        
+        # Clean up response
+        response_text = self._clean_json_text(response_text)
         
         try:
-            return json.loads(response_text)
+            result = json.loads(response_text)
+            if cache_key:
+                llm_response_cache.put(cache_key, response_text, (time.perf_counter() - start) * 1000, cache_ttl)
+            return result
         except json.JSONDecodeError as e:
             print(f"JSON Parse Error: {e}")
             print(f"Raw response: {response_text[:500]}")
             
-            # Try to fix common JSON issues
-            fixed_json = self._try_fix_json(response_text)
-            if fixed_json:
-                return fixed_json
-            
-            # Return partial data if we can extract it
-            return self._extract_partial_json(response_text)
+            # Recover what we can (first complete value, or close truncated output) in one pass
+            return self._recover_json(response_text)
     
-    def _try_fix_json(self, text: str) -> dict:
-        """Try to fix common JSON issues"""
-        try:
-            # Try to find the last complete object/array
-            # Count braces to find where JSON might be complete
-            brace_count = 0
-            bracket_count = 0
-            last_valid_pos = 0
-            in_string = False
-            escape_next = False
-            
-            for i, char in enumerate(text):
-                if escape_next:
-                    escape_next = False
-                    continue
-                if char == '\\':
-                    escape_next = True
-                    continue
-                if char == '"' and not escape_next:
-                    in_string = not in_string
-                    continue
-                if in_string:
-                    continue
-                    
-                if char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        last_valid_pos = i + 1
-                elif char == '[':
-                    bracket_count += 1
-                elif char == ']':
-                    bracket_count -= 1
-            
-            if last_valid_pos > 0:
-                truncated = text[:last_valid_pos]
-                return json.loads(truncated)
-        except:
-            pass
-        
-        return None
+    @classmethod
+    def _recover_json(cls, text: str) -> dict:
+        result = parse_partial_json(text)
+        return result if isinstance(result, dict) and result else cls._partial_response(text)
+    
+    @staticmethod
+    def _partial_response(text: str) -> dict:
+        """Minimal valid response when no JSON object could be recovered"""
+        return {"status": "partial", "message": "Response was truncated", "raw_preview": text[:200]}
     
-    def _extract_partial_json(self, text: str) -> dict:
-        """Extract what we can from partial JSON"""
+    def call_json_stream(self, prompt: str, system_prompt: str = None, temperature: float = 0.3,
+                         max_tokens: int = 4000, subscriptions: dict = None) -> Optional[dict]:
+        """
+        Streaming variant of call_json: parses the response as tokens arrive
+        
+        Args:
+            prompt: The user prompt (should request JSON output)
+            system_prompt: Optional system prompt
+            temperature: Creativity setting
+            max_tokens: Maximum tokens in response
+            subscriptions: {path: callback(path, value)} called as soon as a
+                value is complete, before generation finishes, e.g.
+                {'weekly_plans[]': save_week} (see IncrementalJSONParser.subscribe)
+        
+        Responses are not cached, coalesced or hedged. A response cut off
+        mid-stream is closed by the parser instead of re-parsed.
+        
+        Returns:
+            Parsed JSON response as dict (None if no model answered)
+        """
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt + self.JSON_INSTRUCTION})
+        
+        parser = IncrementalJSONParser()
+        for path, callback in (subscriptions or {}).items():
+            parser.subscribe(path, callback)
+        
+        received = []
         try:
-            # Try to close unclosed braces
-            open_braces = text.count('{') - text.count('}')
-            open_brackets = text.count('[') - text.count(']')
-            
-            fixed = text
-            # Close any unclosed strings
-            if fixed.count('"') % 2 == 1:
-                fixed += '"'
-            
-            # Add closing brackets and braces
-            fixed += ']' * open_brackets
-            fixed += '}' * open_braces
-            
-            return json.loads(fixed)
-        except:
-            # Return a minimal valid response
-            return {"status": "partial", "message": "Response was truncated", "raw_preview": text[:200]}
+            for delta in self._stream_completion(messages, temperature, max_tokens):
+                received.append(delta)
+                if not parser.done:
+                    parser.feed(delta)
+        except StreamInterrupted as e:
+            print(f"JSON stream interrupted, keeping what arrived: {e}")
+        
+        if not received:
+            print("All models failed")
+            return None
+        
+        result = parser.finish()
+        if parser.recovered or parser.skipped:
+            print(f"Recovered streamed JSON ({parser.chars} chars, {parser.skipped} skipped, "
+                  f"{'truncated' if parser.recovered else 'complete'})")
+        return result if isinstance(result, dict) and result else self._partial_response(''.join(received))
     
     def chat(self, messages: list, system_prompt: str = None, temperature: float = 0.7, max_tokens: int = 2000) -> str:
         """
@@ -206,28 +562,105 @@ class LLMClient:
         
         full_messages.extend(messages)
         
-        # Try primary model first, then fallbacks
+        result = self._complete_messages(full_messages, temperature, max_tokens)
+        if result:
+            return result
+        
+        print("All chat models failed")
+        return self.CHAT_UNAVAILABLE_MESSAGE
+    
+    def chat_stream(self, messages: list, system_prompt: str = None, temperature: float = 0.7, max_tokens: int = 2000):
+        """
+        Streaming chat completion: yields text deltas as they arrive
+        
+        A model that fails before sending anything falls through to the next
+        fallback model; once text has been yielded the stream cannot switch
+        models, so a later failure raises StreamInterrupted.
+        
+        Args:
+            messages: List of {"role": "user/assistant", "content": "..."} messages
+            system_prompt: System prompt for context
+            temperature: Creativity setting
+            max_tokens: Maximum tokens in response
+        
+        Yields:
+            Response text fragments
+        """
+        full_messages = []
+        
+        if system_prompt:
+            full_messages.append({"role": "system", "content": system_prompt})
+        
+        full_messages.extend(messages)
+        
+        streamed = False
+        for delta in self._stream_completion(full_messages, temperature, max_tokens):
+            streamed = True
+            yield delta
+        
+        if not streamed:
+            print("All chat models failed")
+            yield self.CHAT_UNAVAILABLE_MESSAGE
+    
+    def _stream_completion(self, messages: list, temperature: float, max_tokens: int):
+        """Rate-limited, usage-recorded stream of text deltas; yields nothing if no model answered"""
+        caller = find_caller(_INTERNAL_FILES)
+        start = time.perf_counter()
+        ticket = self._admit(messages, max_tokens)
+        if ticket is None:
+            return
+        usage = CallUsage()
+        parts = []
+        try:
+            for delta in self._stream_messages(messages, temperature, max_tokens, usage, ticket):
+                parts.append(delta)
+                yield delta
+        finally:
+            self._finish(ticket, caller, start, messages, usage, ''.join(parts), stream=True)
+    
+    def _stream_messages(self, full_messages: list, temperature: float, max_tokens: int, usage: CallUsage,
+                         ticket=None):
         models_to_try = [self.model] + self.fallback_models
         
-        for model in models_to_try:
+        for model in model_health.order(models_to_try):
+            if not model_health.allow(model):
+                continue
+            streamed = False
+            parts = []
+            llm_scheduler.charge(ticket)
             try:
-                print(f"Chat with LLM model: {model}")
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=full_messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens
-                )
-                result = response.choices[0].message.content
-                print(f"Chat response received: {len(result) if result else 0} characters")
-                if result and len(result) > 0:
-                    return result
+                with model_health.attempt(model) as attempt:
+                    print(f"Streaming from LLM model: {model}")
+                    stream = self.client.chat.completions.create(
+                        model=model,
+                        messages=full_messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
+                    reported = None
+                    for chunk in stream:
+                        # Usage arrives on the final chunk, which has no choices
+                        reported = getattr(chunk, 'usage', None) or reported
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            streamed = True
+                            parts.append(delta)
+                            yield delta
+                    usage.add(model, reported, ''.join(parts))
+                    if streamed:
+                        attempt.success()
+                        return
+                    attempt.failure('empty response')
             except Exception as e:
-                print(f"LLM Chat Error with model {model}: {e}")
+                print(f"LLM Stream Error with model {model}: {e}")
+                if streamed:
+                    usage.add(model, None, ''.join(parts))  # cut off before the usage chunk
+                    raise StreamInterrupted(f"{model}: {e}") from e
                 continue
-        
-        print("All chat models failed")
-        return "I'm sorry, I encountered an error processing your request. The AI service is temporarily unavailable. Please try again in a moment."
 
 
 # Global LLM client instance
@@ -10,16 +10,31 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from typing import Dict, Any, List, Optional
 from datetime import datetime
+from config import Config
 from database import db
+from services.state_cache import user_state_cache
+from services.task_graph import TaskGraph
+from services.llm_scheduler import BACKGROUND, llm_priority
+from services.llm_usage import llm_usage
 from agents import (
     reasoning_agent, 
     skill_gap_agent, 
     planner_agent, 
     feedback_agent,
-    get_embedding_generator
+    get_embedding_generator,
+    embedding_model_ready
 )
 
 
+# Events the PHP backend sends after writing user data to MySQL itself
+EXTERNAL_WRITE_EVENTS = {'profile_update', 'skill_added', 'application', 'apply_role'}
+
+
+def is_complete_week(plan) -> bool:
+    """Whether a weekly plan has what db.save_plan needs (a week cut off mid-stream may not)"""
+    return isinstance(plan, dict) and plan.get('week_number') is not None and bool(plan.get('title'))
+
+
 class AgentOrchestrator:
     """
     The Agent Orchestrator is the brain of the system.
@@ -49,34 +64,32 @@ class AgentOrchestrator:
         """
         self.current_user_id = user_id
         
-        # Gather all user data
-        user = db.get_user_profile(user_id)
-        skills = db.get_user_skills(user_id)
-        goals = db.get_user_goals(user_id)
-        primary_goal = db.get_primary_goal(user_id)
-        skill_gaps = db.get_skill_gaps(user_id, primary_goal['id'] if primary_goal else None)
-        plans = db.get_user_plans(user_id, primary_goal['id'] if primary_goal else None)
-        feedback = db.get_user_feedback(user_id, limit=5)
-        applications = db.get_applications(user_id)
-        
-        state = {
-            "user_id": user_id,
-            "profile": user,
-            "skills": skills,
-            "goals": goals,
-            "primary_goal": primary_goal,
-            "skill_gaps": skill_gaps,
-            "plans": plans,
-            "recent_feedback": feedback,
-            "applications": applications,
-            "stats": self._calculate_stats(plans, applications, feedback)
-        }
+        state = user_state_cache.get_or_load(user_id, self._load_user_state)
         
         # Store in session memory
         self.session_memory[user_id] = state
         
         return state
     
+    def _load_user_state(self, user_id: int) -> Dict[str, Any]:
+        """Build user state from the database (cache miss path)"""
+        # Gather all user data in one round trip
+        snapshot = db.get_user_snapshot(user_id, feedback_limit=5)
+        
+        state = {
+            "user_id": user_id,
+            "profile": snapshot.profile,
+            "skills": snapshot.skills,
+            "goals": snapshot.goals,
+            "primary_goal": snapshot.primary_goal,
+            "skill_gaps": snapshot.skill_gaps,
+            "plans": snapshot.plans,
+            "recent_feedback": snapshot.feedback,
+            "applications": snapshot.applications,
+            "stats": self._calculate_stats(snapshot.plans, snapshot.applications, snapshot.feedback)
+        }
+        return state
+    
     def _calculate_stats(self, plans: List, applications: List, feedback: List) -> Dict:
         """Calculate user statistics"""
         total_tasks = 0
@@ -178,25 +191,24 @@ class AgentOrchestrator:
         session_id = db.create_agent_session(user_id, 'full_analysis', {'user_id': user_id})
         
         try:
-            # 1. Observe state
-            state = self.observe_user_state(user_id)
-            
-            # 2. Run reasoning agent
-            profile_data = {
-                **state.get('profile', {}),
-                'skills': state.get('skills', []),
-                'target_role': state.get('primary_goal', {}).get('target_role')
-            }
-            reasoning_result = reasoning_agent.analyze_profile(profile_data)
+            # Reasoning and gap analysis only need the observed state, so they run concurrently
+            graph = TaskGraph()
+            graph.add('observe_state', lambda r: self.observe_user_state(user_id))
+            graph.add('reasoning', lambda r: reasoning_agent.analyze_profile(self._profile_data(r['observe_state'])),
+                      deps=['observe_state'],
+                      fallback=lambda r: reasoning_agent._fallback_analysis(self._profile_data(r['observe_state'])))
+            graph.add('skill_gaps', lambda r: skill_gap_agent.analyze_gaps(*self._gap_inputs(r['observe_state'])),
+                      deps=['observe_state'],
+                      fallback=lambda r: skill_gap_agent._fallback_analysis(*self._gap_inputs(r['observe_state'])))
+            graph.add('next_action', lambda r: self.reason_next_action(r['observe_state']), deps=['observe_state'])
+            steps = graph.run(deadline_seconds=Config.AGENT_DEADLINE_SECONDS)
             
-            # 3. Run skill gap analysis
-            target_role = state.get('primary_goal', {}).get('target_role', 'Software Developer')
-            gap_result = skill_gap_agent.analyze_gaps(state.get('skills', []), target_role)
+            state = steps['observe_state']
+            reasoning_result = steps['reasoning']
+            gap_result = steps['skill_gaps']
+            next_action = steps['next_action']
             
-            # 4. Get next action recommendation
-            next_action = self.reason_next_action(state)
-            
-            # 5. Generate insights
+            # Generate insights
             insights = self._generate_insights(state, reasoning_result, gap_result)
             
             # Compile results
@@ -209,7 +221,8 @@ class AgentOrchestrator:
                 "next_action": next_action,
                 "insights": insights,
                 "stats": state.get('stats', {}),
-                "agent_thoughts": self._generate_thoughts(state, reasoning_result)
+                "step_timings": graph.timings,
+                "agent_thoughts": f"{self._generate_thoughts(state, reasoning_result)} {graph.summary()}"
             }
             
             # Update readiness score
@@ -229,6 +242,20 @@ class AgentOrchestrator:
             db.update_agent_session(session_id, error_result, str(e), 'failed')
             return error_result
     
+    @staticmethod
+    def _profile_data(state: Dict) -> Dict[str, Any]:
+        """Profile input for the reasoning agent"""
+        return {
+            **state.get('profile', {}),
+            'skills': state.get('skills', []),
+            'target_role': state.get('primary_goal', {}).get('target_role')
+        }
+    
+    @staticmethod
+    def _gap_inputs(state: Dict):
+        """(skills, target_role) for the skill gap agent"""
+        return state.get('skills', []), state.get('primary_goal', {}).get('target_role', 'Software Developer')
+    
     def analyze_and_plan(self, user_id: int) -> Dict[str, Any]:
         """
         Analyze skill gaps and create a learning plan
@@ -259,8 +286,9 @@ class AgentOrchestrator:
         if primary_goal.get('id') and skill_gaps:
             db.save_skill_gaps(user_id, primary_goal['id'], skill_gaps)
         
-        # Save plans to database
-        weekly_plans = roadmap_result.get('roadmap', {}).get('weekly_plans', [])
+        # Save plans to database (skipping a week left incomplete by truncated output)
+        weekly_plans = [plan for plan in roadmap_result.get('roadmap', {}).get('weekly_plans', [])
+                        if is_complete_week(plan)]
         for plan in weekly_plans:
             db.save_plan(user_id, primary_goal.get('id'), plan)
         
@@ -497,6 +525,9 @@ class AgentOrchestrator:
         payload = payload or {}
         session_id = db.create_agent_session(user_id, event_type, payload)
         
+        if event_type in EXTERNAL_WRITE_EVENTS:
+            db.invalidate_user_state(user_id)
+        
         try:
             # ====== OBSERVE ======
             state = self.observe_user_state(user_id)
@@ -605,19 +636,30 @@ class AgentOrchestrator:
             if primary_goal.get('id'):
                 db.save_skill_gaps(user_id, primary_goal['id'], skill_gaps)
         
-        # Generate roadmap
-        roadmap_result = planner_agent.create_roadmap(skill_gaps, target_role, timeline)
-        
-        # Save plans to database
-        weekly_plans = roadmap_result.get('roadmap', {}).get('weekly_plans', [])
+        # Generate roadmap, saving each week as soon as it has streamed in. Existing plans
+        # for the goal are cleared only once the first complete week is ready, so a failed
+        # or empty generation leaves the old roadmap in place.
+        saved_weeks = set()
+        cleared = []
+        
+        def save_week(plan: Dict):
+            if not is_complete_week(plan):
+                return
+            if not cleared:
+                if primary_goal.get('id'):
+                    db.clear_plans(user_id, primary_goal['id'])
+                cleared.append(True)
+            db.save_plan(user_id, primary_goal.get('id'), plan)
+            saved_weeks.add(id(plan))
         
-        # Clear existing plans for this goal
-        if primary_goal.get('id'):
-            db.clear_plans(user_id, primary_goal['id'])
+        roadmap_result = planner_agent.create_roadmap(skill_gaps, target_role, timeline, on_week=save_week)
         
-        # Save new plans
+        # Save the rest (fallback plans, or a complete last week recovered from truncated output)
+        weekly_plans = [plan for plan in roadmap_result.get('roadmap', {}).get('weekly_plans', [])
+                        if is_complete_week(plan)]
         for plan in weekly_plans:
-            db.save_plan(user_id, primary_goal.get('id'), plan)
+            if id(plan) not in saved_weeks:
+                save_week(plan)
         
         return {
             "status": "success",
@@ -633,10 +675,11 @@ class AgentOrchestrator:
         feedback_id = feedback_data.get('feedback_id')
         
         # Analyze feedback
-        if feedback_data.get('source') == 'rejection':
-            analysis = feedback_agent.analyze_rejection(feedback_data)
-        else:
-            analysis = feedback_agent.analyze_interview_feedback(feedback_data)
+        with llm_usage.track() as usage:
+            if feedback_data.get('source') == 'rejection':
+                analysis = feedback_agent.analyze_rejection(feedback_data)
+            else:
+                analysis = feedback_agent.analyze_interview_feedback(feedback_data)
         
         # Extract the analysis dict
         analysis_result = analysis.get('analysis', {})
@@ -644,7 +687,7 @@ class AgentOrchestrator:
         # If we have a feedback_id, update that specific record
         if feedback_id:
             # Use the proper update method that serializes correctly
-            db.update_feedback_analysis(feedback_id, analysis_result)
+            db.update_feedback_analysis(feedback_id, analysis_result, user_id)
             
             # Log the AI feedback for debugging
             try:
@@ -653,7 +696,7 @@ class AgentOrchestrator:
                     feedback_id, 
                     f"Analyze {feedback_data.get('source', 'feedback')}", 
                     analysis_result,
-                    0  # token usage
+                    usage.total_tokens
                 )
             except Exception as e:
                 print(f"Failed to save AI feedback log: {e}")
@@ -761,11 +804,12 @@ class AgentOrchestrator:
     def _retrieve_relevant_memories(self, user_id: int, context: str) -> List[Dict]:
         """Retrieve relevant memories for context"""
         try:
-            # Generate embedding for context
-            query_embedding = get_embedding_generator().generate(context)
+            # Keyword match always; add vector similarity once a real embedding model is loaded
+            query_embedding = None
+            if embedding_model_ready():
+                query_embedding = get_embedding_generator().generate(context)
             
-            # Search for similar memories
-            memories = db.search_memories(user_id, query_embedding, limit=5)
+            memories = db.hybrid_search_memories(user_id, context, query_embedding, limit=5)
             return memories
         except Exception as e:
             print(f"Memory retrieval error: {e}")
@@ -784,14 +828,15 @@ class AgentOrchestrator:
             print(f"Memory storage error: {e}")
     
     def _trigger_roadmap_update(self, user_id: int, state: Dict):
-        """Trigger automatic roadmap update after changes"""
+        """Trigger automatic roadmap update after changes (lowest LLM priority)"""
         try:
             primary_goal = state.get('primary_goal', {})
             if primary_goal:
-                self._handle_roadmap_event(state, {
-                    'target_role': primary_goal.get('target_role'),
-                    'timeline': primary_goal.get('timeline', '3 months')
-                })
+                with llm_priority(BACKGROUND):
+                    self._handle_roadmap_event(state, {
+                        'target_role': primary_goal.get('target_role'),
+                        'timeline': primary_goal.get('timeline', '3 months')
+                    })
         except Exception as e:
             print(f"Roadmap update trigger error: {e}")
     
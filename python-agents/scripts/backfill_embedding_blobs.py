@@ -0,0 +1,33 @@
+"""
+Backfill memory_vectors.embedding_blob from the legacy JSON column.
+Run after database/migration_v8_memory_embedding_blobs.sql.
+
+Usage:
+    python scripts/backfill_embedding_blobs.py [--batch-size 500] [--dtype float32|float16]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from database import db
+from services.embedding_codec import DTYPES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--dtype', choices=sorted(DTYPES), default=Config.EMBEDDING_STORAGE_DTYPE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    converted = db.migrate_memory_embeddings(batch_size=args.batch_size, dtype=args.dtype)
+    print(f"Converted {converted} embeddings to {args.dtype} in {time.perf_counter() - start:.1f}s")
+    db.disconnect()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,484 @@
+"""
+IVF-Flat ANN Index
+Approximate nearest-neighbour backend for VectorSearch, persisted per user
+on disk and memory-mapped when opened.
+
+Vectors are clustered with spherical k-means; a search scores the centroids,
+then only the vectors in the `nprobe` closest lists. Newly added vectors go to
+a small exact-searched delta that is merged into the lists once it grows.
+The delta is written to disk in the background by `delta_flusher`.
+"""
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Optional: cross-process lock on the index directory (POSIX only)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+from config import Config
+from services.vector_search import VectorIndexBackend, normalize_rows, register_backend, top_k_indices
+
+INDEX_FORMAT_VERSION = 1
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10,
+                    sample_per_list: int = 256, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on normalized vectors (trained on a sample)"""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample = vectors
+    if n > nlist * sample_per_list:
+        sample = vectors[rng.choice(n, nlist * sample_per_list, replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.bincount(assignment, minlength=nlist) == 0
+        # Re-seed empty lists from random points so every list stays useful
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    """Nearest centroid for each vector"""
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk):
+        assignment[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+    return assignment
+
+
+class IVFFlatBackend(VectorIndexBackend):
+    """
+    Inverted-file index with exact (flat) scoring inside each probed list.
+
+    On-disk layout under <index_dir>/user_<id>/:
+        CURRENT                 name of the active segment directory
+        seg_<n>/                centroids.npy, vectors.npy, ids.npy, offsets.npy, meta.json
+        delta_ids.<pid>.npy, delta_vectors.<pid>.npy, deleted.<pid>.npy
+                                unmerged adds/removes, one set per worker process
+        .lock                   held (flock) while any of the above is written
+    Segments are written to a fresh directory and switched atomically through
+    CURRENT, so a crash never leaves a half-written index behind. Worker
+    processes share the directory: writes take the lock, a new segment is
+    numbered past every existing one, and only older segments are removed
+    (processes still mapping one keep reading the unlinked file). Each process
+    writes only its own delta files, and opening an index loads them all; a
+    new segment clears every delta file. The database stays the source of
+    truth: VectorSearch reconciles an opened index with it, so a delta lost
+    to a crash or a merge in another worker is read back from there.
+    """
+
+    persistent = True
+    approximate = True
+
+    def __init__(self, index_dir: str = None, nprobe: int = None, min_train: int = None,
+                 delta_max: int = None):
+        self.index_dir = index_dir or Config.VECTOR_INDEX_DIR
+        self.nprobe = nprobe or Config.VECTOR_INDEX_NPROBE
+        self.min_train = min_train or Config.VECTOR_INDEX_MIN_TRAIN
+        self.delta_max = delta_max or Config.VECTOR_INDEX_DELTA_MAX
+        self._path: Optional[str] = None
+        self._segment = 0
+        self._trained_size = 0
+        # Guards the delta against the background flush reading it mid-update
+        self._delta_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._centroids: Optional[np.ndarray] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._delta_ids = np.empty(0, dtype=np.int64)
+        self._delta_vectors: Optional[np.ndarray] = None
+        self._deleted = set()
+        self._dim: Optional[int] = None
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def open(self, user_id: int) -> bool:
+        """Memory-map the user's saved index. Returns True if one was found."""
+        self._path = os.path.join(self.index_dir, f"user_{user_id}")
+        if self._vectors is not None:
+            return True
+        try:
+            with open(os.path.join(self._path, 'CURRENT')) as f:
+                segment = f.read().strip()
+            segment_dir = os.path.join(self._path, segment)
+            with open(os.path.join(segment_dir, 'meta.json')) as f:
+                meta = json.load(f)
+            if meta.get('version') != INDEX_FORMAT_VERSION:
+                return False
+            self._centroids = np.load(os.path.join(segment_dir, 'centroids.npy'))
+            self._vectors = np.load(os.path.join(segment_dir, 'vectors.npy'), mmap_mode='r')
+            self._ids = np.load(os.path.join(segment_dir, 'ids.npy'))
+            self._offsets = np.load(os.path.join(segment_dir, 'offsets.npy'))
+            self._segment = int(segment.split('_')[1])
+            self._trained_size = meta['trained_size']
+            self._dim = meta['dimension']
+            self._load_delta()
+            return True
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Vector index at {self._path} unreadable, rebuilding: {e}")
+            self._reset()
+            return False
+
+    @classmethod
+    def saved_users(cls, index_dir: str = None) -> List[int]:
+        """User ids with a saved index, most recently written first"""
+        index_dir = index_dir or Config.VECTOR_INDEX_DIR
+        if not os.path.isdir(index_dir):
+            return []
+        saved = []
+        for name in os.listdir(index_dir):
+            path = os.path.join(index_dir, name)
+            if name.startswith('user_') and os.path.exists(os.path.join(path, 'CURRENT')):
+                try:
+                    saved.append((os.path.getmtime(path), int(name[len('user_'):])))
+                except ValueError:
+                    continue
+        return [user_id for _, user_id in sorted(saved, reverse=True)]
+
+    def _delta_files(self, name: str) -> List[str]:
+        """Paths of every process's `name` delta file"""
+        prefix = f"{name}."
+        return [os.path.join(self._path, f) for f in os.listdir(self._path)
+                if f.startswith(prefix) and f.endswith('.npy')]
+
+    def _load_delta(self):
+        all_ids, all_vectors = [], []
+        for ids_path in self._delta_files('delta_ids'):
+            try:
+                delta_ids = np.load(ids_path)
+                delta_vectors = np.load(ids_path.replace('delta_ids.', 'delta_vectors.', 1))
+            except (OSError, ValueError):
+                continue  # another process is rewriting or clearing its delta
+            if len(delta_ids) and len(delta_ids) == len(delta_vectors) and delta_vectors.shape[1] == self._dim:
+                all_ids.append(delta_ids)
+                all_vectors.append(delta_vectors)
+        if all_ids:
+            delta_ids, first = np.unique(np.concatenate(all_ids), return_index=True)
+            delta_vectors = np.concatenate(all_vectors)[first]
+            # Files from other processes may hold ids merged into the segment since
+            fresh = ~np.isin(delta_ids, self._ids)
+            self._delta_ids = delta_ids[fresh]
+            self._delta_vectors = delta_vectors[fresh] if fresh.any() else None
+        deleted = set()
+        for deleted_path in self._delta_files('deleted'):
+            try:
+                deleted.update(np.load(deleted_path).tolist())
+            except (OSError, ValueError):
+                continue
+        self._deleted = deleted & set(self._ids.tolist())
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock on the user's index directory across worker processes (not re-entrant)"""
+        os.makedirs(self._path, exist_ok=True)
+        with open(os.path.join(self._path, '.lock'), 'a') as lock_file:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield  # closing the file releases the lock
+
+    def _segment_numbers(self) -> List[int]:
+        numbers = []
+        for name in os.listdir(self._path):
+            if name.startswith('seg_'):
+                try:
+                    numbers.append(int(name[len('seg_'):]))
+                except ValueError:
+                    continue
+        return numbers
+
+    def _save_array(self, name: str, array: np.ndarray):
+        tmp_path = os.path.join(self._path, f".{name}.tmp.npy")
+        np.save(tmp_path, array)
+        os.replace(tmp_path, os.path.join(self._path, f"{name}.npy"))
+
+    def _persist_delta(self):
+        """Queue this process's delta for the background flush (or write it now if that is off)"""
+        if self._path is None:
+            return
+        if delta_flusher.interval > 0:
+            delta_flusher.schedule(self)
+        else:
+            self.save_delta()
+
+    def save_delta(self):
+        """Write this process's unmerged adds and removes to its own delta files"""
+        if self._path is None:
+            return
+        with self._locked():
+            with self._delta_lock:
+                delta_ids, delta_vectors, deleted = self._delta_ids, self._delta_vectors, sorted(self._deleted)
+            if not len(delta_ids) and not deleted:
+                self._remove_delta(os.getpid())
+                return
+            pid = os.getpid()
+            self._save_array(f'delta_ids.{pid}', delta_ids)
+            self._save_array(f'delta_vectors.{pid}', delta_vectors if delta_vectors is not None
+                             else np.empty((0, self._dim or 0), dtype=np.float32))
+            self._save_array(f'deleted.{pid}', np.array(deleted, dtype=np.int64))
+
+    def _remove_delta(self, pid: int = None):
+        """Delete one process's delta files (every process's if pid is None); caller holds the lock"""
+        for name in ('delta_ids', 'delta_vectors', 'deleted'):
+            paths = self._delta_files(name) if pid is None else [os.path.join(self._path, f"{name}.{pid}.npy")]
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _save_segment(self):
+        if self._path is None:
+            return
+        with self._locked():
+            self._write_segment()
+
+    def _write_segment(self):
+        # Past every segment on disk, including ones other workers wrote since we opened ours
+        self._segment = max(self._segment_numbers() + [self._segment]) + 1
+        segment = f"seg_{self._segment}"
+        segment_dir = os.path.join(self._path, segment)
+        os.makedirs(segment_dir, exist_ok=True)
+        np.save(os.path.join(segment_dir, 'centroids.npy'), self._centroids)
+        np.save(os.path.join(segment_dir, 'vectors.npy'), self._vectors)
+        np.save(os.path.join(segment_dir, 'ids.npy'), self._ids)
+        np.save(os.path.join(segment_dir, 'offsets.npy'), self._offsets)
+        with open(os.path.join(segment_dir, 'meta.json'), 'w') as f:
+            json.dump({
+                'version': INDEX_FORMAT_VERSION,
+                'dimension': self._dim,
+                'nlist': len(self._centroids),
+                'size': len(self._ids),
+                'trained_size': self._trained_size
+            }, f)
+
+        tmp_current = os.path.join(self._path, '.CURRENT.tmp')
+        with open(tmp_current, 'w') as f:
+            f.write(segment)
+        os.replace(tmp_current, os.path.join(self._path, 'CURRENT'))
+        self._remove_delta()
+
+        # Switch to the new file before removing old segments (still mapped otherwise)
+        self._vectors = np.load(os.path.join(segment_dir, 'vectors.npy'), mmap_mode='r')
+        self._remove_segments(below=self._segment)
+
+    def _remove_segments(self, below: int = None):
+        """Delete segment directories numbered below `below` (all if None); caller holds the lock"""
+        for number in self._segment_numbers():
+            if below is None or number < below:
+                shutil.rmtree(os.path.join(self._path, f"seg_{number}"), ignore_errors=True)
+
+    def _save_empty(self):
+        """Persist an index with no vectors: CURRENT must not keep pointing at the old segment"""
+        if self._path is None:
+            return
+        with self._locked():
+            try:
+                os.remove(os.path.join(self._path, 'CURRENT'))
+            except FileNotFoundError:
+                pass
+            self._remove_delta()
+            self._remove_segments()
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def _nlist_for(self, n: int) -> int:
+        if n < self.min_train:
+            return 1
+        return int(min(4096, max(1, np.sqrt(n))))
+
+    def _write_lists(self, ids: np.ndarray, vectors: np.ndarray, centroids: np.ndarray):
+        assignment = assign_lists(vectors, centroids)
+        order = np.argsort(assignment, kind='stable')
+        counts = np.bincount(assignment, minlength=len(centroids))
+        self._centroids = centroids
+        self._vectors = np.ascontiguousarray(vectors[order])
+        self._ids = ids[order]
+        self._offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def build(self, ids: np.ndarray, vectors: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        self._reset()
+        if not len(ids):
+            self._save_empty()
+            return
+        vectors = normalize_rows(vectors)
+        self._dim = vectors.shape[1]
+        nlist = self._nlist_for(len(ids))
+        centroids = train_centroids(vectors, nlist) if nlist > 1 else normalize_rows(vectors.mean(axis=0))
+        self._trained_size = len(ids)
+        self._write_lists(ids, vectors, centroids)
+        self._save_segment()
+
+    def _merge_delta(self):
+        """Fold the delta (and tombstones) into the lists; retrain once the index has grown 4x"""
+        live = ~np.isin(self._ids, np.fromiter(self._deleted, dtype=np.int64, count=len(self._deleted)))
+        ids = np.concatenate([self._ids[live], self._delta_ids])
+        vectors = np.concatenate([np.asarray(self._vectors)[live], self._delta_vectors]) \
+            if self._delta_vectors is not None else np.asarray(self._vectors)[live]
+        with self._delta_lock:
+            self._delta_ids = np.empty(0, dtype=np.int64)
+            self._delta_vectors = None
+            self._deleted = set()
+
+        if not len(ids):
+            self._centroids, self._vectors = None, None
+            self._ids, self._offsets = ids, np.zeros(1, dtype=np.int64)
+            self._save_empty()
+            return
+        centroids = self._centroids
+        nlist = self._nlist_for(len(ids))
+        if nlist > len(centroids) and (len(centroids) == 1 or len(ids) >= 4 * self._trained_size):
+            centroids = train_centroids(vectors, nlist)
+            self._trained_size = len(ids)
+        self._write_lists(ids, vectors, centroids)
+        self._save_segment()
+
+    # ------------------------------------------------------------------
+    # VectorIndexBackend
+    # ------------------------------------------------------------------
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = normalize_rows(vectors)
+        if self._vectors is None:
+            self.build(np.concatenate([self._delta_ids, ids]),
+                       np.concatenate([self._delta_vectors, vectors]) if self._delta_vectors is not None else vectors)
+            return
+        with self._delta_lock:
+            self._delta_ids = np.concatenate([self._delta_ids, ids])
+            self._delta_vectors = vectors if self._delta_vectors is None \
+                else np.concatenate([self._delta_vectors, vectors])
+        if len(self._delta_ids) > max(self.delta_max, len(self._ids) // 20):
+            self._merge_delta()
+        else:
+            self._persist_delta()
+
+    def remove(self, ids: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        in_delta = np.isin(self._delta_ids, ids)
+        with self._delta_lock:
+            if in_delta.any():
+                self._delta_ids = self._delta_ids[~in_delta]
+                self._delta_vectors = self._delta_vectors[~in_delta]
+            self._deleted = self._deleted | set(ids[np.isin(ids, self._ids)].tolist())
+        if len(self._deleted) > max(self.delta_max, len(self._ids) // 10):
+            self._merge_delta()
+        else:
+            self._persist_delta()
+
+    def ids(self) -> np.ndarray:
+        main = self._ids
+        if self._deleted:
+            main = main[~np.isin(main, np.fromiter(self._deleted, dtype=np.int64, count=len(self._deleted)))]
+        return np.concatenate([main, self._delta_ids])
+
+    def _probe(self, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Candidate (ids, scores) from the nprobe nearest lists"""
+        if self._vectors is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        lists = top_k_indices(self._centroids @ query, self.nprobe)
+        ranges = [(self._offsets[i], self._offsets[i + 1]) for i in lists if self._offsets[i + 1] > self._offsets[i]]
+        if not ranges:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids = np.concatenate([self._ids[start:end] for start, end in ranges])
+        scores = np.concatenate([self._vectors[start:end] @ query for start, end in ranges])
+        return ids, scores
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        query = normalize_rows(query)[0]
+        ids, scores = self._probe(query)
+        if self._deleted:
+            live = ~np.isin(ids, np.fromiter(self._deleted, dtype=np.int64, count=len(self._deleted)))
+            ids, scores = ids[live], scores[live]
+        if len(self._delta_ids):
+            ids = np.concatenate([ids, self._delta_ids])
+            scores = np.concatenate([scores, self._delta_vectors @ query])
+        order = top_k_indices(scores, k)
+        return ids[order], scores[order]
+
+    def memory_bytes(self) -> int:
+        # List vectors are memory-mapped; count the arrays held on the heap
+        resident = self._ids.nbytes + self._offsets.nbytes
+        if self._centroids is not None:
+            resident += self._centroids.nbytes
+        if self._delta_vectors is not None:
+            resident += self._delta_vectors.nbytes + self._delta_ids.nbytes
+        return resident
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return self._dim
+
+    def __len__(self) -> int:
+        return len(self._ids) - len(self._deleted) + len(self._delta_ids)
+
+
+class DeltaFlusher:
+    """Writes queued IVF deltas from one background thread, off the request path"""
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._queued: Dict[str, IVFFlatBackend] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.flushed = 0
+        self.errors = 0
+
+    def schedule(self, backend: IVFFlatBackend):
+        with self._lock:
+            # Keyed by directory: a reopened index replaces one evicted before its flush
+            self._queued[backend._path] = backend
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='vector-delta-flush', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self) -> int:
+        """Write every queued delta now; returns the number written"""
+        with self._lock:
+            queued, self._queued = list(self._queued.values()), {}
+        written = 0
+        for backend in queued:
+            try:
+                backend.save_delta()
+                written += 1
+            except Exception as e:
+                # Not retried: the database still has the rows and the next open reconciles them
+                self.errors += 1
+                print(f"Vector index delta flush error for {backend._path}: {e}")
+        self.flushed += written
+        return written
+
+
+# One flusher per process for every IVF index
+delta_flusher = DeltaFlusher(Config.VECTOR_INDEX_FLUSH_INTERVAL)
+
+register_backend('ivf', IVFFlatBackend)
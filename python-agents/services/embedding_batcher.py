@@ -0,0 +1,115 @@
+"""
+Embedding Micro-Batcher
+Collects concurrent single-text embedding requests and encodes them in one
+model call. Each caller waits on a Future for its own vector.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+from services.metrics import Histogram
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+class EmbeddingBatcher:
+    """
+    Background worker that batches encode requests.
+
+    A batch is flushed when it reaches max_batch_size items or when the
+    oldest request has waited max_wait_ms, whichever comes first. Every
+    queued request is resolved, with an exception if the batch failed or
+    returned no vector for it, and encode() gives up after timeout seconds.
+    """
+
+    def __init__(self, encode_batch: Callable[[List[str]], List[List[float]]],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0, timeout: float = 30.0):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram()
+        self.encode_ms = Histogram()
+        self.latency_ms = Histogram()
+        self.errors = 0
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+                self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue one text; the Future resolves to its embedding"""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def encode(self, text: str, timeout: float = None) -> List[float]:
+        """
+        Embed one text through the batcher (blocking)
+
+        Raises:
+            concurrent.futures.TimeoutError after timeout (default self.timeout) seconds
+        """
+        return self.submit(text).result(timeout=self.timeout if timeout is None else timeout)
+
+    def _collect(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            for _, _, queued_at in batch:
+                self.queue_wait_ms.observe((start - queued_at) * 1000)
+            try:
+                vectors = list(self.encode_batch([text for text, _, _ in batch]))
+            except Exception as e:
+                self.errors += 1
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            done = time.perf_counter()
+            self.batch_sizes.observe(len(batch))
+            self.encode_ms.observe((done - start) * 1000)
+            for (_, future, queued_at), vector in zip(batch, vectors):
+                self.latency_ms.observe((done - queued_at) * 1000)
+                future.set_result(vector)
+            if len(vectors) < len(batch):
+                # A short result must not leave callers waiting on futures nobody will resolve
+                self.errors += 1
+                error = RuntimeError(f"Embedding batch returned {len(vectors)} vectors for {len(batch)} texts")
+                for _, future, _ in batch[len(vectors):]:
+                    future.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self._queue.qsize(),
+            "errors": self.errors,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            "encode_ms": self.encode_ms.snapshot(),
+            "latency_ms": self.latency_ms.snapshot()
+        }
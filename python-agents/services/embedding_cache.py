@@ -0,0 +1,216 @@
+"""
+Embedding Cache
+Caches embeddings by (model name, normalized text hash) so repeated texts
+are not re-encoded. Two tiers: an in-memory LRU and an optional on-disk
+memory-mapped ring of vectors that survives restarts.
+
+The model name is part of every key and each model gets its own disk
+directory, so changing Config.EMBEDDING_MODEL never serves stale vectors.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from config import Config
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so formatting-only differences share an entry"""
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    return hashlib.sha1(f"{model_name}\0{normalize_text(text)}".encode('utf-8')).digest()
+
+
+class DiskEmbeddingTier:
+    """
+    Fixed-capacity ring of vectors in memory-mapped files.
+
+    Layout in <cache_dir>/<model>-<dim>/:
+        meta.json   model, dimension, capacity
+        keys.u8     capacity x 20 sha1 digests
+        vectors.f32 capacity x dimension float32
+        cursor.u64  next slot to overwrite
+    Slots are overwritten oldest-first. A read checks the slot's stored key,
+    so a slot that was reused is a miss rather than a wrong vector.
+    Intended for one writer process per directory.
+    """
+
+    KEY_SIZE = 20
+
+    def __init__(self, cache_dir: str, model_name: str, dimension: int, capacity: int):
+        slug = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+        self.path = os.path.join(cache_dir, f"{slug}-{dimension}")
+        self.dimension = dimension
+        self.capacity = capacity
+        os.makedirs(self.path, exist_ok=True)
+
+        meta = {'model': model_name, 'dimension': dimension, 'capacity': capacity}
+        meta_path = os.path.join(self.path, 'meta.json')
+        fresh = True
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                fresh = json.load(f) != meta
+        mode = 'w+' if fresh else 'r+'
+        self._keys = np.memmap(os.path.join(self.path, 'keys.u8'), dtype=np.uint8,
+                               mode=mode, shape=(capacity, self.KEY_SIZE))
+        self._vectors = np.memmap(os.path.join(self.path, 'vectors.f32'), dtype=np.float32,
+                                  mode=mode, shape=(capacity, dimension))
+        self._cursor = np.memmap(os.path.join(self.path, 'cursor.u64'), dtype=np.uint64,
+                                 mode=mode, shape=(1,))
+        if fresh:
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f)
+
+        self._slots: Dict[bytes, int] = {}
+        for slot in np.flatnonzero(self._keys.any(axis=1)):
+            self._slots[self._keys[slot].tobytes()] = int(slot)
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None or self._keys[slot].tobytes() != key:
+                return None
+            return np.array(self._vectors[slot])
+
+    def put(self, key: bytes, vector: np.ndarray):
+        with self._lock:
+            if key in self._slots:
+                return
+            slot = int(self._cursor[0] % self.capacity)
+            old_key = self._keys[slot].tobytes()
+            if any(old_key):
+                self._slots.pop(old_key, None)
+            # Vector first, key last: a torn write is a miss, not a wrong vector
+            self._vectors[slot] = vector
+            self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+            self._cursor[0] = self._cursor[0] + 1
+            self._slots[key] = slot
+
+    def flush(self):
+        for array in (self._vectors, self._keys, self._cursor):
+            array.flush()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache with hit/miss counters"""
+
+    def __init__(self, max_entries: int = 10000, cache_dir: str = '', disk_entries: int = 200000,
+                 enabled: bool = True):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.disk_entries = disk_entries
+        self.enabled = enabled
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._disk: Dict[tuple, DiskEmbeddingTier] = {}
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _disk_tier(self, model_name: str, dimension: int) -> Optional[DiskEmbeddingTier]:
+        if not self.cache_dir:
+            return None
+        tier_key = (model_name, dimension)
+        tier = self._disk.get(tier_key)
+        if tier is not None:
+            return tier
+        # Two threads must not map the same files as separate tiers (one's writes would be lost)
+        with self._lock:
+            tier = self._disk.get(tier_key)
+            if tier is None and self.cache_dir:
+                try:
+                    tier = DiskEmbeddingTier(self.cache_dir, model_name, dimension, self.disk_entries)
+                except (OSError, ValueError) as e:
+                    print(f"Embedding disk cache unavailable: {e}")
+                    self.cache_dir = ''
+                    return None
+                self._disk[tier_key] = tier
+        return tier
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, model_name: str, text: str, dimension: int = None) -> Optional[np.ndarray]:
+        """Cached embedding for a text, or None"""
+        if not self.enabled:
+            return None
+        key = cache_key(model_name, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+
+        tier = self._disk.get((model_name, dimension)) if dimension else None
+        if tier is None and dimension:
+            tier = self._disk_tier(model_name, dimension)
+        vector = tier.get(key) if tier is not None else None
+        if vector is not None:
+            self.disk_hits += 1
+            self._remember(key, vector)
+            return vector
+
+        self.misses += 1
+        return None
+
+    def put(self, model_name: str, text: str, embedding):
+        if not self.enabled:
+            return
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        key = cache_key(model_name, text)
+        self._remember(key, vector)
+        tier = self._disk_tier(model_name, len(vector))
+        if tier is not None:
+            tier.put(key, vector)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    def flush(self):
+        for tier in list(self._disk.values()):
+            tier.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self._memory),
+            "disk_entries": sum(len(t) for t in self._disk.values()),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+
+# Global embedding cache
+embedding_cache = EmbeddingCache(
+    max_entries=Config.EMBEDDING_CACHE_MAX_ENTRIES,
+    cache_dir=Config.EMBEDDING_CACHE_DIR,
+    disk_entries=Config.EMBEDDING_CACHE_DISK_ENTRIES,
+    enabled=Config.EMBEDDING_CACHE_ENABLED
+)
@@ -0,0 +1,74 @@
+"""
+Embedding Codec
+Packs embeddings into little-endian float32/float16 bytes for the
+memory_vectors.embedding_blob column and decodes them without copying.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DTYPES = {
+    'float32': np.dtype('<f4'),
+    'float16': np.dtype('<f2'),
+}
+
+
+def encode_embedding(embedding, dtype: str = 'float32') -> bytes:
+    """Pack a vector as little-endian bytes"""
+    return np.asarray(embedding, dtype=DTYPES[dtype]).tobytes()
+
+
+def decode_embedding(blob: bytes, dtype: str = 'float32') -> np.ndarray:
+    """Zero-copy view of a packed vector (read-only)"""
+    return np.frombuffer(blob, dtype=DTYPES[dtype or 'float32'])
+
+
+def row_embedding(row: Dict[str, Any]) -> Optional[np.ndarray]:
+    """
+    Decode a memory_vectors row's embedding.
+    Prefers the binary column and falls back to legacy JSON (dual-read).
+    """
+    blob = row.get('embedding_blob')
+    if blob:
+        return decode_embedding(bytes(blob), row.get('embedding_dtype'))
+    embedding = row.get('embedding')
+    if embedding is None:
+        return None
+    if isinstance(embedding, (str, bytes, bytearray)):
+        embedding = json.loads(embedding)
+    return np.asarray(embedding, dtype=np.float32)
+
+
+def strip_embedding_columns(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Remove raw embedding columns from a row in place"""
+    for column in ('embedding', 'embedding_blob', 'embedding_dtype', 'embedding_dim'):
+        row.pop(column, None)
+    return row
+
+
+def rows_to_matrix(rows: List[Dict[str, Any]]) -> Tuple[np.ndarray, List[int]]:
+    """
+    Decode a user's embeddings into one contiguous float32 matrix.
+
+    Rows whose dimension differs from the most common one (e.g. written by
+    another model) are skipped. Returns (matrix, indices of kept rows).
+    """
+    vectors = [row_embedding(row) for row in rows]
+    dims = [len(v) if v is not None else 0 for v in vectors]
+    if not any(dims):
+        return np.empty((0, 0), dtype=np.float32), []
+    dim = max((d for d in dims if d), key=dims.count)
+    keep = [i for i, d in enumerate(dims) if d == dim]
+
+    # Fast path: every kept row is a blob of one dtype -> single frombuffer over the joined bytes
+    dtypes = {rows[i].get('embedding_dtype') for i in keep}
+    if len(dtypes) == 1 and all(rows[i].get('embedding_blob') for i in keep):
+        joined = b''.join(bytes(rows[i]['embedding_blob']) for i in keep)
+        matrix = np.frombuffer(joined, dtype=DTYPES[dtypes.pop() or 'float32']).reshape(len(keep), dim)
+        return matrix.astype(np.float32, copy=False), keep
+
+    matrix = np.empty((len(keep), dim), dtype=np.float32)
+    for out, i in enumerate(keep):
+        matrix[out] = vectors[i]
+    return matrix, keep
@@ -0,0 +1,335 @@
+"""
+Hybrid Memory Search
+Incremental BM25 inverted index over memory_vectors.content, fused with
+vector search results by reciprocal-rank fusion (RRF).
+
+The lexical path needs no embedding model, so it answers immediately
+even while the model is still loading (or when only the hash fallback
+embedder is available).
+"""
+import heapq
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+from services.vector_search import IndexVersion, memory_search
+
+_TOKEN = re.compile(r'[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]')
+STOPWORDS = frozenset(
+    "a about an and are as at be but by can could did do does for from had has have he her his how i if "
+    "in into is it its me my not of on or our she should so than that the their them then there these "
+    "they this those to was we were what when where which who why will with would you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens (keeps c++, c#, node.js), stopwords removed"""
+    return [t for t in _TOKEN.findall((text or '').lower()) if t not in STOPWORDS]
+
+
+def to_timestamp(value) -> Optional[float]:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a user's memories with incremental add/remove.
+
+    Postings map term -> {doc_id: term frequency}; a query only touches the
+    postings of its own terms.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_terms: Dict[int, Dict[str, int]] = {}
+        self._doc_len: Dict[int, int] = {}
+        self._total_len = 0
+        self.rows: Dict[int, Dict[str, Any]] = {}
+        self._meta: Dict[int, Tuple[Optional[str], Optional[float]]] = {}
+
+    def add(self, row: Dict[str, Any]):
+        doc_id = row['id']
+        if doc_id in self._doc_terms:
+            return
+        counts: Dict[str, int] = {}
+        for term in tokenize(row.get('content')):
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._doc_terms[doc_id] = counts
+        length = sum(counts.values())
+        self._doc_len[doc_id] = length
+        self._total_len += length
+        self.rows[doc_id] = row
+        self._meta[doc_id] = (row.get('type'), to_timestamp(row.get('created_at')))
+
+    def remove(self, doc_id: int):
+        counts = self._doc_terms.pop(doc_id, None)
+        if counts is None:
+            return
+        for term in counts:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(doc_id, 0)
+        self.rows.pop(doc_id, None)
+        self._meta.pop(doc_id, None)
+
+    def matches_filter(self, doc_id: int, types: Optional[set], since: Optional[float]) -> bool:
+        memory_type, created = self._meta.get(doc_id, (None, None))
+        if types and memory_type not in types:
+            return False
+        if since is not None and (created is None or created < since):
+            return False
+        return True
+
+    def search(self, query: str, k: int, types: Optional[set] = None,
+               since: Optional[float] = None) -> List[Tuple[int, float]]:
+        """Top-k (doc_id, bm25 score) pairs, best first"""
+        n = len(self._doc_terms)
+        if not n:
+            return []
+        k1, doc_len = self.k1, self._doc_len
+        base = k1 * (1 - self.b)
+        per_len = k1 * self.b / (self._total_len / n or 1.0)
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            weight = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5)) * (k1 + 1)
+            get = scores.get
+            for doc_id, tf in postings.items():
+                scores[doc_id] = get(doc_id, 0.0) + weight * tf / (tf + base + per_len * doc_len[doc_id])
+        if types or since is not None:
+            scores = {d: s for d, s in scores.items() if self.matches_filter(d, types, since)}
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+
+class _LexicalUser:
+    __slots__ = ('index', 'lock', 'loaded', 'version')
+
+    def __init__(self):
+        self.index = BM25Index()
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.version = IndexVersion()
+
+
+class LexicalSearch:
+    """
+    Per-user BM25 indexes, loaded lazily and bounded by an LRU.
+
+    The loader is called as loader(user_id, include_embeddings=False) and
+    returns (rows, None), or None if the database could not be read. With
+    a version loader, loaded indexes are reconciled with writes made by
+    other processes as in VectorSearch.
+    """
+
+    def __init__(self, max_users: int = 256, refresh_interval: float = 5.0):
+        self.max_users = max_users
+        self.refresh_interval = refresh_interval
+        self._loader: Optional[Callable[..., Optional[Tuple[List[Dict], Any]]]] = None
+        self._version_loader: Optional[Callable[[int], Optional[Tuple]]] = None
+        self._users: "OrderedDict[int, _LexicalUser]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    def set_loader(self, loader: Callable[..., Optional[Tuple[List[Dict], Any]]]):
+        self._loader = loader
+
+    def set_version_loader(self, version_loader: Callable[[int], Optional[Tuple]]):
+        self._version_loader = version_loader
+
+    def _get_user(self, user_id: int) -> _LexicalUser:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+            else:
+                entry = _LexicalUser()
+                self._users[user_id] = entry
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+
+        with entry.lock:
+            if not entry.loaded and self._loader is not None:
+                entry.version.read(self._version_loader, user_id)
+                entry.loaded = self._sync(user_id, entry)
+            elif entry.loaded and entry.version.changed(self._version_loader, user_id, self.refresh_interval):
+                self.refreshes += 1
+                entry.loaded = self._sync(user_id, entry)
+        return entry
+
+    def _sync(self, user_id: int, entry: _LexicalUser) -> bool:
+        """Make the index match the database: drop deleted memories, add new ones"""
+        loaded = self._loader(user_id, include_embeddings=False)
+        if loaded is None:
+            return False
+        rows = loaded[0]
+        db_ids = {row['id'] for row in rows}
+        for doc_id in [d for d in entry.index.rows if d not in db_ids]:
+            entry.index.remove(doc_id)
+        for row in rows:
+            entry.index.add(row)  # already indexed rows are skipped
+        return True
+
+    def search(self, user_id: int, query: str, k: int = 5, types: Optional[set] = None,
+               since: Optional[float] = None) -> List[Dict[str, Any]]:
+        entry = self._get_user(user_id)
+        with entry.lock:
+            return [
+                {**entry.index.rows[doc_id], 'bm25_score': round(score, 4)}
+                for doc_id, score in entry.index.search(query, k, types, since)
+            ]
+
+    def add(self, user_id: int, row: Dict[str, Any]):
+        """Index a newly saved memory if the user's index is loaded"""
+        with self._lock:
+            entry = self._users.get(user_id)
+        if entry is None:
+            return
+        with entry.lock:
+            if entry.loaded and row['id'] not in entry.index.rows:
+                entry.index.add(row)
+                entry.version.added(row['id'])
+
+    def remove(self, user_id: int, memory_ids: Iterable[int]):
+        with self._lock:
+            entry = self._users.get(user_id)
+        if entry is None:
+            return
+        with entry.lock:
+            removed = 0
+            for memory_id in memory_ids:
+                removed += 1 if memory_id in entry.index.rows else 0
+                entry.index.remove(memory_id)
+            entry.version.removed(removed)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = list(self._users.values())
+        return {
+            "loaded_users": len(entries),
+            "indexed_documents": sum(len(e.index) for e in entries),
+            "refreshes": self.refreshes,
+            "terms": sum(len(e.index._postings) for e in entries)
+        }
+
+
+class HybridRetriever:
+    """Fuses BM25 and vector rankings with reciprocal-rank fusion"""
+
+    def __init__(self, lexical: LexicalSearch, vector_search, rrf_k: int = 60, candidates: int = 4):
+        self.lexical = lexical
+        self.vector_search = vector_search
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+        self.lexical_only = 0
+        self.hybrid = 0
+
+    def search(self, user_id: int, query: str, query_embedding: Optional[List[float]] = None,
+               k: int = 5, types: Optional[Iterable[str]] = None,
+               max_age_days: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Rank a user's memories for a text query
+
+        Args:
+            query: Query text for the BM25 path
+            query_embedding: Query vector; omit to answer from the lexical index alone
+            types: Only return memories of these types
+            max_age_days: Only return memories created within this many days
+
+        Returns:
+            Up to k memory rows, best first, with rrf_score and the per-path
+            bm25_score / similarity_score where available
+        """
+        types = set(types) if types else None
+        since = time.time() - max_age_days * 86400 if max_age_days else None
+        depth = k * self.candidates
+
+        rankings = [self.lexical.search(user_id, query, depth, types, since)]
+        if query_embedding:
+            self.hybrid += 1
+            vector_hits = self.vector_search.search(user_id, query_embedding, depth)
+            rankings.append([row for row in vector_hits if self._keep(row, types, since)])
+        else:
+            self.lexical_only += 1
+
+        fused: Dict[int, Dict[str, Any]] = {}
+        for ranking in rankings:
+            for rank, row in enumerate(ranking):
+                entry = fused.setdefault(row['id'], {**row, 'rrf_score': 0.0})
+                entry.update({key: row[key] for key in ('bm25_score', 'similarity_score') if key in row})
+                entry['rrf_score'] += 1.0 / (self.rrf_k + rank + 1)
+
+        ranked = sorted(fused.values(), key=lambda row: (-row['rrf_score'], -row['id']))[:k]
+        for row in ranked:
+            row['rrf_score'] = round(row['rrf_score'], 6)
+        return ranked
+
+    def search_vector(self, user_id: int, query_embedding: List[float], k: int = 5,
+                      types: Optional[Iterable[str]] = None,
+                      max_age_days: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Similarity-only ranking with the same filters as search()"""
+        types = set(types) if types else None
+        since = time.time() - max_age_days * 86400 if max_age_days else None
+        depth = k * self.candidates
+        while True:
+            hits = self.vector_search.search(user_id, query_embedding, depth)
+            kept = [row for row in hits if self._keep(row, types, since)]
+            # Widen the candidate pool until the filter leaves k rows or the user has no more memories
+            if len(kept) >= k or len(hits) < depth:
+                return kept[:k]
+            depth *= 4
+
+    @staticmethod
+    def _keep(row: Dict[str, Any], types: Optional[set], since: Optional[float]) -> bool:
+        if types and row.get('type') not in types:
+            return False
+        if since is not None:
+            created = to_timestamp(row.get('created_at'))
+            if created is None or created < since:
+                return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rrf_k": self.rrf_k,
+            "lexical_only_queries": self.lexical_only,
+            "hybrid_queries": self.hybrid,
+            "lexical": self.lexical.stats()
+        }
+
+
+# Global lexical index and hybrid retriever over memory_vectors
+memory_lexical = LexicalSearch(max_users=Config.VECTOR_SEARCH_MAX_USERS,
+                               refresh_interval=Config.VECTOR_SEARCH_REFRESH_INTERVAL)
+memory_retriever = HybridRetriever(memory_lexical, memory_search, rrf_k=Config.HYBRID_RRF_K)
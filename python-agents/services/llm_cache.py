@@ -0,0 +1,184 @@
+"""
+LLM Response Cache
+Caches LLM responses for prompts that are fully determined by their inputs
+(role requirements, readiness scores, gap analyses). Keys are a hash of
+(model, system prompt, prompt, temperature, max_tokens).
+
+Two tiers: an in-memory LRU and an optional SQLite file that survives
+restarts and can be shared by worker processes on one host. Entries carry
+their own TTL so callers can choose how long an answer stays valid.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from config import Config
+
+
+def response_key(model: str, system_prompt: Optional[str], prompt: str,
+                 temperature: float, max_tokens: int) -> str:
+    payload = json.dumps([model, system_prompt or '', prompt, float(temperature), int(max_tokens)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SQLiteResponseTier:
+    """Persistent tier: one row per response with an absolute expiry time"""
+
+    PRUNE_EVERY = 500  # puts between sweeps of expired rows
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL, latency_ms REAL,"
+            " created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.prune()
+
+    def get(self, key: str) -> Optional[Tuple[str, float, float]]:
+        """(response, latency_ms, expires_at) for a live entry, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, latency_ms, expires_at FROM llm_responses WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return row
+
+    def put(self, key: str, response: str, latency_ms: float, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, response, latency_ms, created_at, expires_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, response, latency_ms, time.time(), expires_at)
+            )
+            self._puts += 1
+            sweep = self._puts % self.PRUNE_EVERY == 0
+        if sweep:
+            self.prune()
+
+    def prune(self) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM llm_responses WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+
+
+class LLMResponseCache:
+    """Two-tier response cache with hit/miss counters and latency saved"""
+
+    def __init__(self, max_entries: int = 2000, default_ttl: float = 86400, path: str = '',
+                 enabled: bool = True):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[SQLiteResponseTier] = None
+        if path:
+            try:
+                self._disk = SQLiteResponseTier(path)
+            except sqlite3.Error as e:
+                print(f"LLM response disk cache unavailable: {e}")
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.saved_ms = 0.0
+
+    def _remember(self, key: str, entry: Tuple[str, float, float]):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached response text for a key, or None"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[2] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    self.saved_ms += entry[1]
+                    return entry[0]
+                del self._memory[key]
+
+        entry = None
+        if self._disk is not None:
+            try:
+                entry = self._disk.get(key)
+            except sqlite3.Error as e:
+                print(f"LLM response cache read error: {e}")
+        if entry is not None:
+            self.disk_hits += 1
+            self.saved_ms += entry[1] or 0.0
+            self._remember(key, entry)
+            return entry[0]
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, response: str, latency_ms: float = 0.0, ttl: float = None):
+        if not self.enabled or not response:
+            return
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        entry = (response, round(latency_ms, 1), expires_at)
+        self._remember(key, entry)
+        self.stores += 1
+        if self._disk is not None:
+            try:
+                self._disk.put(key, *entry)
+            except sqlite3.Error as e:
+                print(f"LLM response cache write error: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "default_ttl_seconds": self.default_ttl,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._disk) if self._disk is not None else 0,
+            "disk_path": self._disk.path if self._disk is not None else None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "llm_time_saved_ms": round(self.saved_ms, 1)
+        }
+
+
+# Global LLM response cache
+llm_response_cache = LLMResponseCache(
+    max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+    default_ttl=Config.LLM_CACHE_TTL,
+    path=Config.LLM_CACHE_PATH,
+    enabled=Config.LLM_CACHE_ENABLED
+)
@@ -0,0 +1,239 @@
+"""
+LLM Request Scheduler
+Client-side token-bucket limits (requests and tokens per minute) in front
+of the LLM provider, with priority classes so interactive chat is served
+before dashboard work and dashboard work before background regeneration.
+
+Callers are admitted in priority order (FIFO within a class). Lower
+classes also leave a reserve in each bucket, so a burst of background or
+dashboard calls cannot drain the last of the quota that chat needs.
+Token costs are reserved up front from an estimate and settled with the
+actual size afterwards; a bucket may go into debt, which delays later
+requests instead of overshooting the provider limit. Fallback and hedge
+requests made under one admission are charged as they are sent.
+
+Buckets are per process: with several server workers the provider sees
+up to workers x the configured rates.
+"""
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+
+from config import Config
+from services.metrics import Histogram
+
+INTERACTIVE, DASHBOARD, BACKGROUND = 'interactive', 'dashboard', 'background'
+PRIORITY_CLASSES = {INTERACTIVE: 0, DASHBOARD: 1, BACKGROUND: 2}
+# Fraction of each bucket a class must leave untouched
+CLASS_RESERVE = {INTERACTIVE: 0.0, DASHBOARD: 0.1, BACKGROUND: 0.3}
+
+QUEUE_WAIT_BUCKETS_MS = [1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000]
+
+_current_priority: contextvars.ContextVar = contextvars.ContextVar('llm_priority', default=DASHBOARD)
+
+
+@contextmanager
+def llm_priority(priority: str):
+    """Run LLM calls made inside the block (in this context) at the given priority class"""
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown LLM priority class: {priority}")
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> str:
+    return _current_priority.get()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text or '') // 4 + 1
+
+
+class QueueTimeout(Exception):
+    """A request waited longer than the queue timeout for rate-limit capacity"""
+
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute up to capacity; level may go negative (debt)"""
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, cost: float, floor: float) -> float:
+        """Seconds until cost can be taken while keeping floor in the bucket (after refill)"""
+        missing = cost + floor - self.level
+        return max(0.0, missing / self.rate) if self.rate > 0 else float('inf')
+
+
+class Ticket:
+    __slots__ = ('priority', 'tokens', 'estimate', 'queued_ms', 'attempts')
+
+    def __init__(self, priority: str, tokens: int, queued_ms: float):
+        self.priority = priority
+        self.tokens = tokens  # reserved so far, over all upstream requests
+        self.estimate = tokens  # per request
+        self.queued_ms = queued_ms
+        self.attempts = 0
+
+
+class LLMScheduler:
+    """Admits LLM requests under request/token-per-minute limits in priority order"""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, queue_timeout: float = 60):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (class rank, sequence)
+        self._sequence = itertools.count()
+        self._stats = {
+            name: {"admitted": 0, "timeouts": 0, "queued": 0, "extra_requests": 0,
+                   "wait_ms": Histogram(QUEUE_WAIT_BUCKETS_MS)}
+            for name in PRIORITY_CLASSES
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    def _wait_time(self, priority: str, tokens: int) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        reserve = CLASS_RESERVE[priority]
+        for bucket, cost in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is not None:
+                bucket.refill(now)
+                floor = reserve * bucket.capacity
+                # A request larger than the class may ever take waits for a full share, not forever
+                wait = max(wait, bucket.wait_time(min(cost, bucket.capacity - floor), floor))
+        return wait
+
+    def acquire(self, priority: str = None, tokens: int = 0, timeout: float = None) -> Ticket:
+        """
+        Block until the request may be sent
+
+        Args:
+            priority: Priority class (default: the current llm_priority context)
+            tokens: Estimated prompt + completion tokens to reserve
+            timeout: Max seconds to wait (default queue_timeout)
+
+        Raises:
+            QueueTimeout if capacity did not free up in time
+        """
+        priority = priority or current_priority()
+        if priority not in PRIORITY_CLASSES:
+            priority = DASHBOARD
+        stats = self._stats[priority]
+        if not self.enabled:
+            stats["admitted"] += 1
+            return Ticket(priority, tokens, 0.0)
+
+        start = time.monotonic()
+        deadline = start + (self.queue_timeout if timeout is None else timeout)
+        entry = (PRIORITY_CLASSES[priority], next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            stats["queued"] += 1
+            try:
+                while True:
+                    wait = self._wait_time(priority, tokens) if self._waiters[0] == entry else None
+                    if wait == 0:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        stats["timeouts"] += 1
+                        raise QueueTimeout(f"LLM rate limit: {priority} request waited more than "
+                                           f"{deadline - start:.1f}s")
+                    # Not at the head: wait to be notified; at the head: wait for the refill
+                    self._cond.wait(remaining if wait is None else min(wait, remaining))
+                if self.requests is not None:
+                    self.requests.level -= 1
+                if self.tokens is not None:
+                    self.tokens.level -= tokens
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                stats["queued"] -= 1
+                self._cond.notify_all()
+
+        queued_ms = (time.monotonic() - start) * 1000
+        stats["admitted"] += 1
+        stats["wait_ms"].observe(queued_ms)
+        return Ticket(priority, tokens, queued_ms)
+
+    def charge(self, ticket: Ticket):
+        """
+        Count one upstream request made under ticket's admission
+
+        The first is already paid for by acquire(); fallbacks and hedges
+        are debited without waiting (the call is already under way), so
+        the buckets go into debt and later admissions wait instead.
+        """
+        if ticket is None:
+            return
+        ticket.attempts += 1
+        if ticket.attempts == 1:
+            return
+        with self._cond:
+            self._stats[ticket.priority]["extra_requests"] += 1
+            ticket.tokens += ticket.estimate
+            if self.requests is not None:
+                self.requests.level -= 1
+            if self.tokens is not None:
+                self.tokens.level -= ticket.estimate
+
+    def settle(self, ticket: Ticket, actual_tokens: int):
+        """Correct the token bucket once the real request size is known"""
+        if self.tokens is None or ticket is None:
+            return
+        with self._cond:
+            self.tokens.level += ticket.tokens - actual_tokens
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            buckets = {}
+            now = time.monotonic()
+            for name, bucket in (("requests_per_minute", self.requests), ("tokens_per_minute", self.tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    buckets[name] = {"limit": bucket.capacity, "available": round(bucket.level, 1)}
+        return {
+            "enabled": self.enabled,
+            "queue_timeout_seconds": self.queue_timeout,
+            "buckets": buckets,
+            "classes": {
+                name: {
+                    "admitted": s["admitted"],
+                    "queued": s["queued"],
+                    "timeouts": s["timeouts"],
+                    "extra_requests": s["extra_requests"],
+                    "reserve": CLASS_RESERVE[name],
+                    "queue_wait_ms": s["wait_ms"].snapshot()
+                }
+                for name, s in self._stats.items()
+            }
+        }
+
+
+# Global scheduler in front of the LLM provider
+llm_scheduler = LLMScheduler(
+    requests_per_minute=Config.LLM_RATE_LIMIT_RPM,
+    tokens_per_minute=Config.LLM_RATE_LIMIT_TPM,
+    queue_timeout=Config.LLM_QUEUE_TIMEOUT
+)
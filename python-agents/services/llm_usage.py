@@ -0,0 +1,288 @@
+"""
+LLM Usage Telemetry
+One record per logical LLM call: prompt/completion tokens, latency, model,
+and the agent method that made it. Records go into an in-memory ring
+buffer (aggregated by /api/metrics/llm-usage) and are flushed in batches
+by a background thread to a JSONL file or the llm_usage table.
+
+Token counts come from the provider's usage field; when a provider omits
+it those responses are estimated from the text (~4 characters per token)
+and the record is marked estimated. Fallback and hedge requests made for the same
+call are summed into its record.
+"""
+import atexit
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import Config
+from services.llm_scheduler import estimate_tokens
+
+SINKS = ('jsonl', 'db', 'none')
+
+_trackers: contextvars.ContextVar = contextvars.ContextVar('llm_usage_trackers', default=())
+
+
+class CallUsage:
+    """Token usage accumulated over the upstream requests of one logical call"""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.requests = 0
+        self.unreported = 0  # responses without a usage field
+        self.unreported_completion_tokens = 0  # estimated from those responses' text
+        self.model: Optional[str] = None
+
+    def add(self, model: str, usage, text: Optional[str] = None):
+        """Count one response; usage is the provider's usage object (may be None), text its content"""
+        self.requests += 1
+        self.model = model
+        if usage is None or getattr(usage, 'prompt_tokens', None) is None:
+            self.unreported += 1
+            self.unreported_completion_tokens += estimate_tokens(text) if text else 0
+            return
+        self.prompt_tokens += usage.prompt_tokens or 0
+        self.completion_tokens += usage.completion_tokens or 0
+
+    def totals(self, messages: list, result: Optional[str]) -> Tuple[int, int, bool]:
+        """
+        (prompt tokens, completion tokens, estimated): reported counts plus
+        estimates for the responses without usage; estimated if there were any
+        """
+        prompt_estimate = sum(estimate_tokens(m.get("content")) for m in messages)
+        if not self.requests:
+            # No response arrived (e.g. a stream cut off before its usage chunk)
+            return prompt_estimate, estimate_tokens(result) if result else 0, True
+        return (self.prompt_tokens + self.unreported * prompt_estimate,
+                self.completion_tokens + self.unreported_completion_tokens,
+                self.unreported > 0)
+
+
+class UsageTracker:
+    """Totals of the usage records made inside an LLMUsageRecorder.track() block"""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, record: Dict[str, Any]):
+        self.calls += 1
+        self.prompt_tokens += record['prompt_tokens']
+        self.completion_tokens += record['completion_tokens']
+
+
+def find_caller(internal_files: Tuple[str, ...]) -> Tuple[str, str]:
+    """(agent, method) of the innermost frame outside the given files, e.g. ('SkillGapAgent', 'analyze_gaps')"""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename in internal_files:
+        frame = frame.f_back
+    if frame is None:
+        return 'unknown', 'unknown'
+    owner = frame.f_locals.get('self')
+    agent = type(owner).__name__ if owner is not None else frame.f_globals.get('__name__', 'unknown')
+    return agent, frame.f_code.co_name
+
+
+class LLMUsageRecorder:
+    """Ring buffer of usage records with batched flushing to a sink"""
+
+    def __init__(self, sink: str = 'jsonl', path: str = 'llm_usage.jsonl', buffer_size: int = 5000,
+                 flush_size: int = 100, flush_interval: float = 30.0, enabled: bool = True):
+        if sink not in SINKS:
+            raise ValueError(f"Unknown LLM usage sink: {sink} (expected one of {', '.join(SINKS)})")
+        self.enabled = enabled
+        self.sink = sink
+        self.path = path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.recorded = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.flush_errors = 0
+        self.last_flush_error: Optional[str] = None
+
+    @contextmanager
+    def track(self):
+        """Collect the totals of LLM calls made in this context, e.g. for token_usage columns"""
+        tracker = UsageTracker()
+        token = _trackers.set(_trackers.get() + (tracker,))
+        try:
+            yield tracker
+        finally:
+            _trackers.reset(token)
+
+    def record(self, agent: str, method: str, model: Optional[str], prompt_tokens: int, completion_tokens: int,
+               latency_ms: float, requests: int = 1, success: bool = True, estimated: bool = False,
+               priority: str = None, queued_ms: float = 0.0, stream: bool = False) -> Dict[str, Any]:
+        entry = {
+            'created_at': datetime.now().isoformat(timespec='milliseconds'),
+            'agent': agent,
+            'method': method,
+            'model': model,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'latency_ms': round(latency_ms, 1),
+            'queued_ms': round(queued_ms, 1),
+            'requests': requests,
+            'success': success,
+            'estimated': estimated,
+            'stream': stream,
+            'priority': priority
+        }
+        for tracker in _trackers.get():
+            tracker.add(entry)
+        if not self.enabled:
+            return entry
+
+        with self._lock:
+            self._buffer.append(entry)
+            self.recorded += 1
+            if self.sink != 'none':
+                self._pending.append(entry)
+                # A failing sink must not grow memory without bound: keep at most one buffer's worth
+                overflow = len(self._pending) - self._buffer.maxlen
+                if overflow > 0:
+                    del self._pending[:overflow]
+                    self.dropped += overflow
+                if len(self._pending) >= self.flush_size:
+                    self._wake.set()
+        self._ensure_flusher()
+        return entry
+
+    def _ensure_flusher(self):
+        if self.sink == 'none' or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='llm-usage-flush', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write pending records to the sink; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                if self.sink == 'jsonl':
+                    self._write_jsonl(batch)
+                elif self.sink == 'db':
+                    self._write_db(batch)
+            except Exception as e:
+                self.flush_errors += 1
+                self.last_flush_error = str(e)[:200]
+                print(f"LLM usage flush error ({len(batch)} records kept for retry): {e}")
+                with self._lock:
+                    self._pending[:0] = batch
+                return 0
+            self.flushed += len(batch)
+            return len(batch)
+
+    def _write_jsonl(self, batch: List[Dict[str, Any]]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(entry) + '\n' for entry in batch))
+
+    @staticmethod
+    def _write_db(batch: List[Dict[str, Any]]):
+        from database import db  # lazy: scripts using the LLM client need no database
+        db.save_llm_usage(batch)
+
+    def summary(self, group_by: str = 'method', since_seconds: float = None) -> Dict[str, Any]:
+        """
+        Aggregate the ring buffer
+
+        Args:
+            group_by: 'method' (agent.method), 'agent', 'model' or 'priority'
+            since_seconds: Only records from the last N seconds
+
+        Returns:
+            Totals plus per-group calls, tokens and latency, most tokens first
+        """
+        with self._lock:
+            records = list(self._buffer)
+        if since_seconds:
+            cutoff = datetime.fromtimestamp(time.time() - since_seconds).isoformat(timespec='milliseconds')
+            records = [r for r in records if r['created_at'] >= cutoff]
+
+        groups: Dict[str, Dict[str, Any]] = {}
+        for r in records:
+            key = f"{r['agent']}.{r['method']}" if group_by == 'method' else str(r.get(group_by))
+            g = groups.setdefault(key, {'calls': 0, 'failures': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                                        'total_tokens': 0, 'estimated': 0, '_latencies': []})
+            g['calls'] += 1
+            g['failures'] += 0 if r['success'] else 1
+            g['estimated'] += 1 if r['estimated'] else 0
+            for field in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+                g[field] += r[field]
+            g['_latencies'].append(r['latency_ms'])
+
+        for g in groups.values():
+            latencies = sorted(g.pop('_latencies'))
+            g['avg_tokens'] = round(g['total_tokens'] / g['calls'], 1)
+            g['avg_latency_ms'] = round(sum(latencies) / len(latencies), 1)
+            g['p95_latency_ms'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+        return {
+            'group_by': group_by,
+            'records': len(records),
+            'prompt_tokens': sum(r['prompt_tokens'] for r in records),
+            'completion_tokens': sum(r['completion_tokens'] for r in records),
+            'total_tokens': sum(r['total_tokens'] for r in records),
+            'groups': dict(sorted(groups.items(), key=lambda item: item[1]['total_tokens'], reverse=True))
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'sink': self.sink,
+            'path': self.path if self.sink == 'jsonl' else None,
+            'buffered': len(self._buffer),
+            'pending': len(self._pending),
+            'recorded': self.recorded,
+            'flushed': self.flushed,
+            'dropped': self.dropped,
+            'flush_errors': self.flush_errors,
+            'last_flush_error': self.last_flush_error
+        }
+
+
+# Global usage recorder fed by LLMClient
+llm_usage = LLMUsageRecorder(
+    sink=Config.LLM_USAGE_SINK,
+    path=Config.LLM_USAGE_PATH,
+    buffer_size=Config.LLM_USAGE_BUFFER_SIZE,
+    flush_size=Config.LLM_USAGE_FLUSH_SIZE,
+    flush_interval=Config.LLM_USAGE_FLUSH_INTERVAL,
+    enabled=Config.LLM_USAGE_ENABLED
+)
@@ -0,0 +1,266 @@
+"""
+Memory Compaction
+Background job that keeps memory_vectors from growing without bound:
+
+1. Dedupe - near-identical memories of the same type (cosine similarity
+   above a threshold, e.g. repeated "Agent feedback: Completed") keep only
+   the newest copy.
+2. Roll-up - old interactions/agent results are replaced by one summary
+   memory per type and month (embedding = centroid of the sources).
+3. Retention - per-type caps per user drop the oldest memories.
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import Config
+from database import db
+from services.hybrid_search import to_timestamp, tokenize
+from services.vector_search import normalize_rows
+
+
+def parse_retention(spec: str) -> Dict[str, int]:
+    """'interaction:500,agent_result:200' -> {'interaction': 500, 'agent_result': 200}"""
+    limits = {}
+    for item in (spec or '').split(','):
+        if ':' in item:
+            memory_type, limit = item.split(':', 1)
+            limits[memory_type.strip()] = int(limit)
+    return limits
+
+
+def is_summary(row: Dict[str, Any]) -> bool:
+    metadata = row.get('metadata')
+    return isinstance(metadata, dict) and bool(metadata.get('summary'))
+
+
+class MemoryCompactor:
+    """Runs compaction passes over users' memories and keeps their reports"""
+
+    def __init__(self, db, similarity_threshold: float = 0.97, rollup_after_days: float = 30,
+                 rollup_types: List[str] = None, retention: Dict[str, int] = None,
+                 min_memories: int = 50, dedupe_window: int = 2000):
+        self.db = db
+        self.similarity_threshold = similarity_threshold
+        self.rollup_after_days = rollup_after_days
+        self.rollup_types = set(rollup_types or ['interaction', 'agent_result'])
+        self.retention = retention or {}
+        self.min_memories = min_memories
+        self.dedupe_window = dedupe_window
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.totals = Counter()
+        self._run_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Passes
+    # ------------------------------------------------------------------
+
+    def _find_duplicates(self, rows: List[Dict], matrix: np.ndarray) -> List[int]:
+        """Ids of older near-duplicates, compared within each memory type"""
+        if not len(rows):
+            return []
+        vectors = normalize_rows(matrix)
+        by_type = defaultdict(list)
+        for i, row in enumerate(rows):
+            if not is_summary(row):
+                by_type[row.get('type')].append(i)
+
+        duplicates = []
+        for positions in by_type.values():
+            # Newest first, so the most recent copy of a repeated memory survives
+            positions.sort(key=lambda i: rows[i]['id'], reverse=True)
+            kept = np.empty((len(positions), vectors.shape[1]), dtype=np.float32)
+            n_kept = 0
+            for i in positions:
+                window = kept[max(0, n_kept - self.dedupe_window):n_kept]
+                if n_kept and float((window @ vectors[i]).max()) >= self.similarity_threshold:
+                    duplicates.append(rows[i]['id'])
+                else:
+                    kept[n_kept] = vectors[i]
+                    n_kept += 1
+        return duplicates
+
+    def _plan_rollups(self, rows: List[Dict], positions: Dict[int, int], matrix: np.ndarray,
+                      removed: set) -> List[Dict[str, Any]]:
+        """Group old memories of roll-up types by (type, month) into summaries"""
+        cutoff = time.time() - self.rollup_after_days * 86400
+        groups = defaultdict(list)
+        for row in rows:
+            if row['id'] in removed or is_summary(row) or row.get('type') not in self.rollup_types:
+                continue
+            created = to_timestamp(row.get('created_at'))
+            if created is not None and created < cutoff:
+                period = datetime.fromtimestamp(created).strftime('%Y-%m')
+                groups[(row.get('type'), period)].append(row)
+
+        rollups = []
+        for (memory_type, period), members in sorted(groups.items()):
+            if len(members) < 2:
+                continue
+            member_vectors = normalize_rows(matrix[[positions[m['id']] for m in members]])
+            centroid = normalize_rows(member_vectors.mean(axis=0))[0]
+            rollups.append({
+                'type': memory_type,
+                'period': period,
+                'source_ids': [m['id'] for m in members],
+                'content': self._summarize(memory_type, period, members),
+                'embedding': centroid.tolist()
+            })
+        return rollups
+
+    @staticmethod
+    def _summarize(memory_type: str, period: str, members: List[Dict]) -> str:
+        """Extractive summary: dominant keywords plus a few distinct snippets"""
+        terms = Counter()
+        for member in members:
+            terms.update(set(tokenize(member.get('content'))))
+        keywords = ', '.join(term for term, _ in terms.most_common(12))
+
+        snippets, seen = [], set()
+        for member in sorted(members, key=lambda m: m['id'], reverse=True):
+            snippet = ' '.join((member.get('content') or '').split())[:160]
+            if snippet and snippet.lower() not in seen:
+                seen.add(snippet.lower())
+                snippets.append(snippet)
+            if len(snippets) == 5:
+                break
+        label = memory_type.replace('_', ' ')
+        return (f"Summary of {len(members)} {label} memories from {period}. "
+                f"Topics: {keywords}. Examples: " + ' | '.join(snippets))
+
+    def _over_retention(self, rows: List[Dict], removed: set, new_summaries: Counter) -> List[int]:
+        """Oldest memories beyond each type's per-user limit (new summaries count as newest)"""
+        by_type = defaultdict(list)
+        for row in rows:
+            if row['id'] not in removed:
+                by_type[row.get('type')].append(row['id'])
+        excess = []
+        for memory_type, limit in self.retention.items():
+            ids = sorted(by_type.get(memory_type, []), reverse=True)
+            excess.extend(ids[max(0, limit - new_summaries[memory_type]):])
+        return excess
+
+    # ------------------------------------------------------------------
+    # Running
+    # ------------------------------------------------------------------
+
+    def compact_user(self, user_id: int, dry_run: bool = False) -> Dict[str, Any]:
+        """Compact one user's memories; returns what was (or would be) reclaimed"""
+        report = {'user_id': user_id, 'scanned': 0, 'duplicates': 0, 'rolled_up': 0,
+                  'summaries': 0, 'retention': 0, 'rows_reclaimed': 0}
+        loaded = self.db._load_memory_index(user_id)
+        if loaded is None:
+            report['error'] = 'database unavailable'
+            return report
+        rows, matrix = loaded
+        report['scanned'] = len(rows)
+        if not rows:
+            return report
+        positions = {row['id']: i for i, row in enumerate(rows)}
+
+        removed = set(self._find_duplicates(rows, matrix))
+        report['duplicates'] = len(removed)
+
+        rollups = self._plan_rollups(rows, positions, matrix, removed)
+        for rollup in rollups:
+            removed.update(rollup['source_ids'])
+            report['rolled_up'] += len(rollup['source_ids'])
+        report['summaries'] = len(rollups)
+
+        retention = self._over_retention(rows, removed, Counter(rollup['type'] for rollup in rollups))
+        removed.update(retention)
+        report['retention'] = len(retention)
+        report['rows_reclaimed'] = len(removed) - len(rollups)
+
+        if dry_run or not removed:
+            return report
+
+        # Write summaries before deleting their sources so nothing is lost on failure
+        for rollup in rollups:
+            saved = self.db.save_memory(user_id, rollup['content'], rollup['embedding'], rollup['type'], {
+                'summary': True,
+                'period': rollup['period'],
+                'source_count': len(rollup['source_ids']),
+                'first_source_id': min(rollup['source_ids']),
+                'last_source_id': max(rollup['source_ids'])
+            })
+            if not saved:
+                removed.difference_update(rollup['source_ids'])
+                report['summaries'] -= 1
+                report['rolled_up'] -= len(rollup['source_ids'])
+        deleted = self.db.delete_memories(user_id, sorted(removed))
+        report['deleted'] = deleted
+        report['rows_reclaimed'] = deleted - report['summaries']
+        return report
+
+    def run(self, user_ids: List[int] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """Compact the given users (default: every user above min_memories)"""
+        with self._run_lock:
+            start = time.perf_counter()
+            if user_ids is None:
+                user_ids = self.db.get_memory_heavy_users(self.min_memories)
+            reports = [self.compact_user(user_id, dry_run) for user_id in user_ids]
+            summary = {
+                'dry_run': dry_run,
+                'users': len(reports),
+                'finished_at': datetime.now().isoformat(),
+                'duration_ms': round((time.perf_counter() - start) * 1000, 1)
+            }
+            for key in ('scanned', 'duplicates', 'rolled_up', 'summaries', 'retention', 'rows_reclaimed'):
+                summary[key] = sum(r.get(key, 0) for r in reports)
+            summary['per_user'] = [r for r in reports if r.get('rows_reclaimed') or r.get('error')]
+            if not dry_run:
+                self.totals.update({k: summary[k] for k in ('users', 'duplicates', 'rolled_up',
+                                                            'summaries', 'retention', 'rows_reclaimed')})
+                self.totals['runs'] += 1
+            self.last_report = summary
+            print(f"Memory compaction: {summary['rows_reclaimed']} rows reclaimed across "
+                  f"{summary['users']} users in {summary['duration_ms']} ms")
+            return summary
+
+    def start(self, interval_seconds: float):
+        """Run compaction every interval in a daemon thread"""
+        if interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.run()
+                except Exception as e:
+                    print(f"Memory compaction error: {e}")
+
+        self._thread = threading.Thread(target=loop, name='memory-compaction', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "scheduled": self._thread is not None and self._thread.is_alive(),
+            "similarity_threshold": self.similarity_threshold,
+            "rollup_after_days": self.rollup_after_days,
+            "rollup_types": sorted(self.rollup_types),
+            "retention": self.retention,
+            "totals": dict(self.totals),
+            "last_report": self.last_report
+        }
+
+
+# Global memory compactor (scheduled by app.py when MEMORY_COMPACTION_INTERVAL > 0)
+memory_compactor = MemoryCompactor(
+    db,
+    similarity_threshold=Config.MEMORY_DEDUPE_THRESHOLD,
+    rollup_after_days=Config.MEMORY_ROLLUP_AFTER_DAYS,
+    rollup_types=[t.strip() for t in Config.MEMORY_ROLLUP_TYPES.split(',') if t.strip()],
+    retention=parse_retention(Config.MEMORY_RETENTION),
+    min_memories=Config.MEMORY_COMPACTION_MIN_ROWS
+)
@@ -0,0 +1,262 @@
+"""
+LLM Model Health
+Per-model circuit breakers and latency/error EWMAs, used to decide which
+models to try for a request and in what order.
+
+Breaker states:
+    closed     requests flow; consecutive failures open the breaker
+    open       the model is skipped until the cooldown has passed
+    half_open  one probe request is let through; success closes the
+               breaker, failure re-opens it
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class ModelBreaker:
+    """Health record and circuit breaker for one model"""
+
+    def __init__(self, model: str, failure_threshold: int, cooldown: float, alpha: float,
+                 window: int = 200):
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.latency_ewma_ms: Optional[float] = None
+        self.recent_ms: deque = deque(maxlen=window)  # recent latencies, for percentile-based hedging
+        self.error_ewma = 0.0
+        self.last_failure_at: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    def error_rate(self) -> float:
+        """
+        Error EWMA, halved every cooldown period since the last failure so a
+        demoted model is retried even when it no longer gets traffic
+        """
+        if self.last_failure_at is None:
+            return self.error_ewma
+        return self.error_ewma * 0.5 ** ((time.monotonic() - self.last_failure_at) / self.cooldown)
+
+    def sort_key(self):
+        """
+        Lower is better: models with a recent error rate of 25% or more
+        (with the default alpha, any failure in the last request or two)
+        go after clean ones, then expected latency inflated by the error
+        rate. Unmeasured models count as fast so they get measured.
+        """
+        error_rate = self.error_rate()
+        return error_rate >= 0.25, (self.latency_ewma_ms or 0.0) * (1 + 4 * error_rate)
+
+    def retry_in(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+
+class _Attempt:
+    """One request to a model; see ModelHealth.attempt()"""
+
+    def __init__(self, health: 'ModelHealth', model: str):
+        self.health = health
+        self.model = model
+        self.start = time.perf_counter()
+        self.recorded = False
+
+    def success(self, latency_ms: float = None):
+        if latency_ms is None:
+            latency_ms = (time.perf_counter() - self.start) * 1000
+        self.health.record_success(self.model, latency_ms)
+        self.recorded = True
+
+    def failure(self, error: str = None):
+        self.health.record_failure(self.model, error)
+        self.recorded = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.recorded:
+            if exc_type is not None and issubclass(exc_type, Exception):
+                self.failure(str(exc))
+            else:
+                # Cancelled or abandoned by the caller: not the model's fault
+                self.health.release(self.model)
+        return False
+
+
+class ModelHealth:
+    """
+    Registry of model breakers.
+
+    order() filters and sorts candidates; callers then check allow() and
+    wrap the request in attempt(), which records the outcome:
+
+        for model in model_health.order(models):
+            if not model_health.allow(model):
+                continue
+            with model_health.attempt(model) as attempt:
+                ...
+                attempt.success()
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0, alpha: float = 0.3,
+                 latency_window: int = 200):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.latency_window = latency_window
+        self._breakers: Dict[str, ModelBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, model: str) -> ModelBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = ModelBreaker(model, self.failure_threshold, self.cooldown,
+                                                           self.alpha, self.latency_window)
+        return breaker
+
+    def order(self, models: List[str]) -> List[str]:
+        """
+        Candidate models for a request, best first
+
+        Duplicates are dropped and open breakers skipped. A model whose
+        cooldown has passed goes first so its probe request happens; the
+        rest are sorted by ModelBreaker.sort_key, with configured order
+        breaking ties (so the primary model leads until data says otherwise).
+        """
+        unique = list(dict.fromkeys(m for m in models if m))
+        with self._lock:
+            probes, closed = [], []
+            for index, model in enumerate(unique):
+                breaker = self._breaker(model)
+                if breaker.state == CLOSED:
+                    closed.append((breaker.sort_key(), index, model))
+                elif breaker.retry_in() == 0 and not breaker.probe_in_flight:
+                    probes.append(model)
+        return probes + [model for _, _, model in sorted(closed)]
+
+    def allow(self, model: str) -> bool:
+        """Whether a request may be sent to the model now (claims the probe slot when half-open)"""
+        with self._lock:
+            breaker = self._breaker(model)
+            if breaker.state == CLOSED:
+                return True
+            if breaker.state == OPEN and breaker.retry_in() == 0:
+                breaker.state = HALF_OPEN
+            if breaker.state == HALF_OPEN and not breaker.probe_in_flight:
+                breaker.probe_in_flight = True
+                return True
+            breaker.rejected += 1
+            return False
+
+    def attempt(self, model: str) -> _Attempt:
+        """Context manager for one request; an exception inside counts as a failure"""
+        return _Attempt(self, model)
+
+    def release(self, model: str):
+        """Free a half-open probe slot without recording an outcome"""
+        with self._lock:
+            self._breaker(model).probe_in_flight = False
+
+    def record_success(self, model: str, latency_ms: float):
+        with self._lock:
+            breaker = self._breaker(model)
+            breaker.successes += 1
+            breaker.consecutive_failures = 0
+            breaker.error_ewma = breaker.error_rate() * (1 - self.alpha)
+            breaker.last_failure_at = None
+            if breaker.latency_ewma_ms is None:
+                breaker.latency_ewma_ms = latency_ms
+            else:
+                breaker.latency_ewma_ms += self.alpha * (latency_ms - breaker.latency_ewma_ms)
+            breaker.recent_ms.append(latency_ms)
+            if breaker.state != CLOSED:
+                print(f"Circuit for {model} closed after successful probe")
+            breaker.state = CLOSED
+            breaker.probe_in_flight = False
+            breaker.opened_at = None
+
+    def record_failure(self, model: str, error: str = None):
+        with self._lock:
+            breaker = self._breaker(model)
+            breaker.failures += 1
+            breaker.consecutive_failures += 1
+            breaker.error_ewma = breaker.error_rate()
+            breaker.error_ewma += self.alpha * (1 - breaker.error_ewma)
+            breaker.last_failure_at = time.monotonic()
+            breaker.last_error = (error or 'empty response')[:200]
+            if breaker.state == HALF_OPEN or breaker.consecutive_failures >= self.failure_threshold:
+                if breaker.state != OPEN:
+                    print(f"Circuit for {model} opened for {self.cooldown:g}s: {breaker.last_error}")
+                breaker.state = OPEN
+                breaker.opened_at = time.monotonic()
+            breaker.probe_in_flight = False
+
+    def record_latency(self, model: str, latency_ms: float):
+        """
+        Add a latency sample without an outcome, e.g. the elapsed time of a
+        request cancelled because a hedge won. Such samples are lower bounds;
+        dropping them would hide the slow tail from latency_percentile().
+        """
+        with self._lock:
+            self._breaker(model).recent_ms.append(latency_ms)
+
+    def latency_percentile(self, model: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """q-th percentile (0-100) of the model's recent latencies, or None with too few samples"""
+        with self._lock:
+            samples = sorted(self._breaker(model).recent_ms)
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+    def reset(self, model: str = None):
+        with self._lock:
+            if model is None:
+                self._breakers.clear()
+            else:
+                self._breakers.pop(model, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {
+            "failure_threshold": self.failure_threshold,
+            "cooldown_seconds": self.cooldown,
+            "models": {
+                b.model: {
+                    "state": b.state,
+                    "retry_in_seconds": round(b.retry_in(), 1),
+                    "consecutive_failures": b.consecutive_failures,
+                    "successes": b.successes,
+                    "failures": b.failures,
+                    "rejected": b.rejected,
+                    "latency_ewma_ms": round(b.latency_ewma_ms, 1) if b.latency_ewma_ms is not None else None,
+                    "latency_samples": len(b.recent_ms),
+                    "error_rate_ewma": round(b.error_rate(), 4),
+                    "last_error": b.last_error
+                }
+                for b in breakers
+            }
+        }
+
+
+# Global model health registry shared by the sync and async LLM paths
+model_health = ModelHealth(
+    failure_threshold=Config.LLM_BREAKER_FAILURES,
+    cooldown=Config.LLM_BREAKER_COOLDOWN,
+    alpha=Config.LLM_HEALTH_EWMA_ALPHA
+)
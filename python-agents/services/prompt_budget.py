@@ -0,0 +1,272 @@
+"""
+Prompt Budgeting
+Keeps the variable context of agent prompts (resumes, job descriptions,
+profiles, histories) within a per-method token budget.
+
+Sections are rendered compactly first: JSON without indentation or empty
+fields, lists joined one item per line. If the total is still over budget,
+the lowest-priority sections are trimmed first - long strings are cut
+down, then trailing list items (older entries, extra skills) are dropped,
+then strings are shortened further - down to each section's min_tokens.
+Token counts are local estimates (~4 characters per token), so budgets
+are approximate.
+"""
+import json
+import threading
+from typing import Any, Dict
+
+from config import Config
+from services.llm_scheduler import estimate_tokens
+
+TRUNCATION_MARKER = ' ...[truncated]'
+MAX_TRIM_STEPS = 500
+LONG_STRING_TOKENS = 150  # strings are cut to this before list items are dropped
+
+
+def parse_budgets(spec: str) -> Dict[str, int]:
+    """'ResumeAgent.tailor_to_job_description:3000,...' -> {'ResumeAgent.tailor_to_job_description': 3000}"""
+    budgets = {}
+    for item in (spec or '').split(','):
+        if ':' in item:
+            method, limit = item.rsplit(':', 1)
+            budgets[method.strip()] = int(limit)
+    return budgets
+
+
+def drop_empty(value: Any) -> Any:
+    """Recursively remove None, empty strings, lists and dicts"""
+    if isinstance(value, dict):
+        cleaned = {k: drop_empty(v) for k, v in value.items()}
+        return {k: v for k, v in cleaned.items() if v not in (None, '', [], {})}
+    if isinstance(value, (list, tuple)):
+        cleaned = [drop_empty(v) for v in value]
+        return [v for v in cleaned if v not in (None, '', [], {})]
+    return value
+
+
+def compact_json(value: Any) -> str:
+    """JSON without indentation, extra whitespace or empty fields"""
+    return json.dumps(drop_empty(value), separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Keep the head of text within max_tokens, cut at a line or word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    chars = max(0, max_tokens * 4 - 1)  # the longest text estimate_tokens counts as max_tokens
+    if chars <= len(TRUNCATION_MARKER) * 2:
+        return text[:chars]  # too short to be worth a marker
+    limit = chars - len(TRUNCATION_MARKER)
+    head = text[:limit]
+    cut = max(head.rfind('\n'), head.rfind(' '))
+    if cut > limit * 0.8:
+        head = head[:cut]
+    return head.rstrip() + TRUNCATION_MARKER
+
+
+class Section:
+    """
+    One variable part of a prompt
+
+    Args:
+        value: Text, a list of lines (see joiner) or any JSON-serializable value
+        priority: Higher is more important; the lowest priority is trimmed first
+        min_tokens: Never trim the section below this size
+        joiner: Render a list as items joined by this string instead of as JSON
+        keep: JSON keys whose list items are never dropped (their text may still be shortened)
+    """
+
+    def __init__(self, value: Any, priority: int = 0, min_tokens: int = 0, joiner: str = None,
+                 keep: tuple = ()):
+        self.priority = priority
+        self.min_tokens = min_tokens
+        self.joiner = joiner
+        self.keep = tuple(keep)
+        if isinstance(value, str):
+            self.data = value
+            original = value
+        elif joiner is not None:
+            self.data = [str(item) for item in value or [] if item not in (None, '')]
+            original = joiner.join(self.data)
+        else:
+            self.data = drop_empty(value)
+            original = json.dumps(value, indent=2, default=str)  # how agents inlined JSON before budgeting
+        self.original_tokens = estimate_tokens(original)
+
+    def render(self) -> str:
+        if isinstance(self.data, str):
+            return self.data
+        if self.joiner is not None:
+            return self.joiner.join(self.data)
+        return compact_json(self.data)
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.render())
+
+    def shrink(self, target_tokens: int) -> bool:
+        """One trimming step towards target_tokens; returns whether anything was removed"""
+        target_tokens = max(target_tokens, self.min_tokens)
+        if isinstance(self.data, str):
+            before = self.data
+            self.data = truncate_text(self.data, target_tokens)
+            return self.data != before
+        if self.joiner is not None:
+            if len(self.data) > 1:
+                self.data.pop()
+                return True
+            if not self.data:
+                return False
+            before = self.data[0]
+            self.data = [truncate_text(before, target_tokens)]
+            return self.data[0] != before
+        return _shrink_json(self.data, target_tokens, self.keep)
+
+
+def _largest_list(value: Any, keep: tuple = (), best=None):
+    """(size, list) of the droppable nested list with more than one item and the largest serialized size"""
+    if isinstance(value, dict):
+        for key, child in value.items():
+            if key in keep and isinstance(child, list):
+                # The list's own items stay; lists nested inside them may still be trimmed
+                for item in child:
+                    best = _largest_list(item, keep, best)
+            else:
+                best = _largest_list(child, keep, best)
+    elif isinstance(value, list):
+        if len(value) > 1:
+            size = len(json.dumps(value, default=str))
+            if best is None or size > best[0]:
+                best = (size, value)
+        for child in value:
+            best = _largest_list(child, keep, best)
+    return best
+
+
+def _longest_string(value: Any, best=None):
+    """(container, key, length) of the longest string in a nested structure"""
+    items = value.items() if isinstance(value, dict) else enumerate(value) if isinstance(value, list) else ()
+    for key, child in items:
+        if isinstance(child, str):
+            if best is None or len(child) > best[2]:
+                best = (value, key, len(child))
+        else:
+            best = _longest_string(child, best)
+    return best
+
+
+def _shorten_longest(data: Any, target_tokens: int, floor_tokens: int) -> bool:
+    """Cut the longest string by the excess over target_tokens, but not below floor_tokens"""
+    longest = _longest_string(data)
+    if longest is None:
+        return False
+    container, key, length = longest
+    excess = estimate_tokens(compact_json(data)) - target_tokens
+    shortened = truncate_text(container[key], max(floor_tokens, (length // 4) - excess))
+    if shortened == container[key]:
+        return False
+    container[key] = shortened
+    return True
+
+
+def _shrink_json(data: Any, target_tokens: int, keep: tuple = ()) -> bool:
+    """
+    One trimming step. Long strings (e.g. a summary) are cut down to
+    LONG_STRING_TOKENS before whole entries are dropped, since an entry
+    (a job, a project) is information the model cannot recover; then the
+    last item of the largest droppable list goes; then strings get shorter.
+    """
+    if _shorten_longest(data, target_tokens, LONG_STRING_TOKENS):
+        return True
+    largest = _largest_list(data, keep)
+    if largest is not None:
+        largest[1].pop()
+        return True
+    return _shorten_longest(data, target_tokens, 16)
+
+
+class PromptBudget:
+    """Fits prompt sections to per-method token budgets and records the compression"""
+
+    def __init__(self, default_budget: int = 6000, budgets: Dict[str, int] = None, enabled: bool = True):
+        self.default_budget = default_budget
+        self.budgets = budgets or {}
+        self.enabled = enabled
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def budget_for(self, method: str) -> int:
+        return self.budgets.get(method, self.default_budget)
+
+    def fit(self, method: str, sections: Dict[str, Section], budget: int = None) -> Dict[str, str]:
+        """
+        Render sections within the method's budget
+
+        Args:
+            method: Budget key, e.g. 'ResumeAgent.tailor_to_job_description'
+            sections: {name: Section}
+            budget: Token budget for all sections (default: configured for method)
+
+        Returns:
+            {name: rendered text} to interpolate into the prompt
+        """
+        budget = budget or self.budget_for(method)
+        original = sum(s.original_tokens for s in sections.values())
+        compact = sum(s.tokens() for s in sections.values())
+
+        trimmed = []
+        if self.enabled:
+            total = compact
+            steps = 0
+            for name, section in sorted(sections.items(), key=lambda item: item[1].priority):
+                while total > budget and section.tokens() > section.min_tokens and steps < MAX_TRIM_STEPS:
+                    steps += 1
+                    changed = section.shrink(section.tokens() - (total - budget))
+                    if changed and name not in trimmed:
+                        trimmed.append(name)
+                    total = sum(s.tokens() for s in sections.values())
+                    if not changed:
+                        break
+
+        rendered = {name: section.render() for name, section in sections.items()}
+        final = sum(estimate_tokens(text) for text in rendered.values())
+        self._record(method, original, final, budget, trimmed)
+        return rendered
+
+    def _record(self, method: str, original: int, final: int, budget: int, trimmed: list):
+        with self._lock:
+            stats = self._stats.setdefault(method, {'calls': 0, 'trimmed_calls': 0, 'over_budget_calls': 0,
+                                                    'original_tokens': 0, 'final_tokens': 0})
+            stats['calls'] += 1
+            stats['trimmed_calls'] += 1 if trimmed else 0
+            stats['over_budget_calls'] += 1 if final > budget else 0
+            stats['original_tokens'] += original
+            stats['final_tokens'] += final
+        if trimmed or final > budget:
+            print(f"Prompt budget {method}: ~{original} -> ~{final} tokens (budget {budget}), "
+                  f"trimmed {', '.join(trimmed) or 'nothing'}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            methods = {
+                method: {
+                    **s,
+                    'budget': self.budget_for(method),
+                    'saved_tokens': s['original_tokens'] - s['final_tokens'],
+                    'compression_ratio': round(s['final_tokens'] / s['original_tokens'], 4)
+                    if s['original_tokens'] else 1.0
+                }
+                for method, s in self._stats.items()
+            }
+        return {
+            'enabled': self.enabled,
+            'default_budget': self.default_budget,
+            'methods': methods
+        }
+
+
+# Global prompt budget shared by the agents
+prompt_budget = PromptBudget(
+    default_budget=Config.PROMPT_BUDGET_DEFAULT_TOKENS,
+    budgets=parse_budgets(Config.PROMPT_BUDGETS),
+    enabled=Config.PROMPT_BUDGET_ENABLED
+)
@@ -0,0 +1,228 @@
+"""
+User State Cache
+Caches observed user state per user with TTL + LRU bounds.
+Database write methods invalidate the affected user's entry.
+"""
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from config import Config
+
+# Optional shared backend
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+class CacheBackend:
+    """Storage interface for cached user state"""
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def size(self) -> int:
+        return -1
+
+
+class InMemoryLRUBackend(CacheBackend):
+    """Process-local LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Callers may mutate the state they get back
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Any, ttl: float):
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend(CacheBackend):
+    """Shared cache for multiple worker processes (state must be JSON-serializable)"""
+
+    def __init__(self, url: str, prefix: str = 'career_agent:state:'):
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._client.get(self._prefix + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, value: Any, ttl: float):
+        self._client.set(self._prefix + key, json.dumps(value, default=str), px=int(ttl * 1000))
+
+    def delete(self, key: str):
+        self._client.delete(self._prefix + key)
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + '*'):
+            self._client.delete(key)
+
+
+class UserStateCache:
+    """
+    Read-through cache of user state keyed by user_id (normalized with
+    str(), so 42 and '42' share an entry and a generation).
+
+    A per-user generation counter guards against a slow read repopulating
+    the cache with state that was invalidated while it was being loaded.
+    Counters exist only while a load for the user is in flight, so they do
+    not accumulate one entry per user ever seen.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float = 30.0, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self._generations: Dict[str, int] = {}
+        self._loading: Dict[str, int] = {}  # loads in flight per key
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(user_id) -> str:
+        return str(user_id)
+
+    def get_or_load(self, user_id: int, loader: Callable[[int], Dict]) -> Dict:
+        """Return cached state for a user, loading it on a miss"""
+        if not self.enabled:
+            return loader(user_id)
+
+        key = self._key(user_id)
+        try:
+            cached = self.backend.get(key)
+        except Exception as e:
+            print(f"State cache read error: {e}")
+            cached = None
+
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        with self._lock:
+            self._loading[key] = self._loading.get(key, 0) + 1
+            generation = self._generations.setdefault(key, 0)
+        try:
+            state = loader(user_id)
+            if state is not None and self._generation(key) == generation:
+                try:
+                    self.backend.set(key, state, self.ttl)
+                    # An invalidation between the check and the set would leave stale state for the TTL
+                    if self._generation(key) != generation:
+                        self.backend.delete(key)
+                except Exception as e:
+                    print(f"State cache write error: {e}")
+            return state
+        finally:
+            with self._lock:
+                self._loading[key] -= 1
+                if not self._loading[key]:
+                    del self._loading[key]
+                    del self._generations[key]
+
+    def _generation(self, key: str) -> int:
+        with self._lock:
+            return self._generations[key]
+
+    def invalidate(self, user_id: int):
+        """Drop a user's cached state after a write"""
+        if user_id is None:
+            return
+        key = self._key(user_id)
+        with self._lock:
+            if key in self._generations:
+                self._generations[key] += 1
+        self.invalidations += 1
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            print(f"State cache invalidation error: {e}")
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            for key in self._generations:
+                self._generations[key] += 1
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "ttl_seconds": self.ttl,
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": getattr(self.backend, 'evictions', 0)
+        }
+
+
+def _create_backend() -> CacheBackend:
+    if Config.STATE_CACHE_BACKEND == 'redis':
+        if REDIS_AVAILABLE:
+            try:
+                return RedisBackend(Config.REDIS_URL)
+            except Exception as e:
+                print(f"Redis state cache unavailable, using in-memory cache: {e}")
+        else:
+            print("Warning: redis not installed. Using in-memory state cache.")
+    return InMemoryLRUBackend(max_entries=Config.STATE_CACHE_MAX_USERS)
+
+
+# Global user state cache
+user_state_cache = UserStateCache(
+    _create_backend(),
+    ttl=Config.STATE_CACHE_TTL,
+    enabled=Config.STATE_CACHE_ENABLED
+)
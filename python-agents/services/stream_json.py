@@ -0,0 +1,291 @@
+"""
+Incremental JSON Parser
+Parses a JSON document from text chunks as they arrive (e.g. LLM stream
+deltas), keeping its state between chunks, and notifies subscribers when
+values at given paths are complete:
+
+    parser = IncrementalJSONParser()
+    parser.subscribe('weekly_plans[]', lambda path, plan: save(plan))
+    for delta in stream:
+        parser.feed(delta)
+    roadmap = parser.finish()
+
+Model output is handled leniently in the same pass: text before the
+first '{' or '[' (prose, code fences) and after the top-level value is
+ignored, trailing commas and stray characters are skipped, and finish()
+closes whatever is still open when the stream stops early - an unfinished
+string or number is kept, a key without a value is dropped.
+"""
+import json
+from typing import Any, Callable, List, Optional, Tuple
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_LITERALS = {'true': True, 'false': False, 'null': None}
+_NUMBER_CHARS = set('0123456789+-.eE')
+
+
+class _Frame:
+    """An open object or array"""
+    __slots__ = ('value', 'key', 'expect_key')
+
+    def __init__(self, value):
+        self.value = value
+        self.key: Optional[str] = None  # object key waiting for its value
+        self.expect_key = isinstance(value, dict)
+
+
+class IncrementalJSONParser:
+    """Chunk-fed JSON parser with path subscriptions and single-pass recovery"""
+
+    def __init__(self):
+        self._stack: List[_Frame] = []
+        self._subscriptions: List[Tuple[Tuple, Callable[[str, Any], None]]] = []
+        self._mode = 'value'  # value | string | escape | unicode | number | literal | done
+        self._buffer: List[str] = []
+        self._unicode = ''
+        self._string_is_key = False
+        self._started = False
+        self.result: Any = None
+        self.chars = 0
+        self.skipped = 0  # characters ignored as malformed
+        self.recovered = False  # finish() had to close unfinished values
+
+    def subscribe(self, path: str, callback: Callable[[str, Any], None]) -> 'IncrementalJSONParser':
+        """
+        Call callback(path, value) each time a value at path is complete;
+        values closed by finish() are in the result but not announced
+
+        Paths are dotted keys from the top-level object; '[]' matches any
+        array index and '*' any key: 'weekly_plans[]' (each weekly plan),
+        'capstone_project', '*' (every top-level field).
+        """
+        pattern = []
+        for part in path.split('.'):
+            indexes = 0
+            while part.endswith('[]'):
+                part, indexes = part[:-2], indexes + 1
+            if part:
+                pattern.append(part)
+            pattern.extend([int] * indexes)
+        self._subscriptions.append((tuple(pattern), callback))
+        return self
+
+    @property
+    def done(self) -> bool:
+        return self._mode == 'done'
+
+    def feed(self, chunk: str):
+        """Consume the next chunk of text"""
+        for char in chunk:
+            self.chars += 1
+            mode = self._mode
+            if mode == 'string':
+                if char == '"':
+                    self._end_string()
+                elif char == '\\':
+                    self._mode = 'escape'
+                else:
+                    self._buffer.append(char)
+            elif mode == 'escape':
+                if char == 'u':
+                    self._mode, self._unicode = 'unicode', ''
+                else:
+                    self._buffer.append(_ESCAPES.get(char, char))
+                    self._mode = 'string'
+            elif mode == 'unicode':
+                self._unicode += char
+                if len(self._unicode) == 4:
+                    self._append_unicode(self._unicode)
+                    self._mode = 'string'
+            elif mode == 'done':
+                return
+            else:
+                if mode in ('number', 'literal'):
+                    if (char in _NUMBER_CHARS) if mode == 'number' else char.isalpha():
+                        self._buffer.append(char)
+                        continue
+                    self._end_scalar()
+                self._structural(char)
+
+    def finish(self) -> Any:
+        """
+        End of input: close unfinished values and return the document
+
+        Returns:
+            The parsed value (None if no JSON value was started)
+        """
+        if self._mode == 'done' or not self._started:
+            return self.result
+        self.recovered = True
+        self._subscriptions = []
+        if self._mode in ('string', 'escape', 'unicode'):
+            if self._mode == 'unicode':
+                self._append_unicode(self._unicode)
+            if self._string_is_key:
+                self._buffer = []
+            else:
+                self._end_string()
+        elif self._mode in ('number', 'literal'):
+            self._end_scalar()
+        while self._stack:
+            self._close()
+        self._mode = 'done'
+        return self.result
+
+    # ------------------------------------------------------------------
+
+    def _structural(self, char: str):
+        if char in ' \t\r\n':
+            return
+        frame = self._stack[-1] if self._stack else None
+        if frame is None and not self._started and char not in '{[':
+            return  # preamble before the document, e.g. prose or a code fence
+        if char == '"':
+            self._mode = 'string'
+            self._string_is_key = frame is not None and frame.expect_key
+            self._buffer = []
+        elif char in '{[':
+            if frame is not None and frame.expect_key:
+                self.skipped += 1
+                return
+            self._started = True
+            self._stack.append(_Frame({} if char == '{' else []))
+        elif char in '}]':
+            if frame is not None:
+                self._close()
+            else:
+                self.skipped += 1
+        elif char == ',':
+            if frame is not None and isinstance(frame.value, dict):
+                frame.expect_key = True
+                frame.key = None
+        elif char == ':':
+            if frame is not None and isinstance(frame.value, dict) and frame.key is not None:
+                frame.expect_key = False
+            else:
+                self.skipped += 1
+        elif frame is not None and not frame.expect_key and (char in _NUMBER_CHARS or char.isalpha()):
+            self._mode = 'number' if char in _NUMBER_CHARS else 'literal'
+            self._buffer = [char]
+        else:
+            self.skipped += 1
+
+    def _end_string(self):
+        text = ''.join(self._buffer)
+        self._buffer = []
+        self._mode = 'value'
+        if self._string_is_key:
+            frame = self._stack[-1]
+            frame.key = text
+            frame.expect_key = False
+        else:
+            self._add_value(text)
+
+    def _end_scalar(self):
+        text = ''.join(self._buffer)
+        self._buffer = []
+        is_number = self._mode == 'number'
+        self._mode = 'value'
+        if is_number:
+            try:
+                value = json.loads(text)
+            except ValueError:
+                try:
+                    value = float(text.rstrip('+-.eE'))
+                except ValueError:
+                    self.skipped += len(text)
+                    return
+        elif text in _LITERALS:
+            value = _LITERALS[text]
+        else:
+            # A prefix of a literal cut off by the end of the stream, or junk
+            matches = [v for k, v in _LITERALS.items() if k.startswith(text)]
+            if len(matches) != 1:
+                self.skipped += len(text)
+                return
+            value = matches[0]
+        self._add_value(value)
+
+    def _add_value(self, value: Any):
+        frame = self._stack[-1]
+        if isinstance(frame.value, list):
+            frame.value.append(value)
+        elif frame.key is not None:
+            frame.value[frame.key] = value
+            frame.key = None
+        else:
+            self.skipped += 1
+            return
+        self._notify(value)
+
+    def _close(self):
+        frame = self._stack.pop()
+        if not self._stack:
+            self.result = frame.value
+            self._mode = 'done'
+            self._notify_path((), frame.value)
+            return
+        parent = self._stack[-1]
+        if isinstance(parent.value, list):
+            parent.value.append(frame.value)
+        elif parent.key is not None:
+            parent.value[parent.key] = frame.value
+            parent.key = None
+        else:
+            return  # object value without a key
+        self._notify(frame.value)
+
+    def _current_path(self) -> Tuple:
+        """Path of the value just added to the innermost open container"""
+        path = []
+        innermost = len(self._stack) - 1
+        for index, frame in enumerate(self._stack):
+            if index < innermost:
+                # Enclosing containers: the child being built is not stored yet
+                path.append(len(frame.value) if isinstance(frame.value, list) else frame.key)
+            elif isinstance(frame.value, list):
+                path.append(len(frame.value) - 1)
+            else:
+                path.append(next(reversed(frame.value)))  # key was cleared once its value was stored
+        return tuple(path)
+
+    def _notify(self, value: Any):
+        if self._subscriptions:
+            self._notify_path(self._current_path(), value)
+
+    def _notify_path(self, path: Tuple, value: Any):
+        for pattern, callback in self._subscriptions:
+            if len(pattern) != len(path):
+                continue
+            if all(p == '*' or (p is int and isinstance(k, int)) or p == k for p, k in zip(pattern, path)):
+                try:
+                    callback(format_path(path), value)
+                except Exception as e:
+                    print(f"Stream JSON subscriber error at {format_path(path)}: {e}")
+
+    def _append_unicode(self, digits: str):
+        try:
+            code = int(digits, 16)
+        except ValueError:
+            return
+        previous = self._buffer[-1] if self._buffer else ''
+        if 0xDC00 <= code <= 0xDFFF and '\ud800' <= previous <= '\udbff':
+            # Second half of a surrogate pair (characters outside the BMP, e.g. emoji)
+            self._buffer[-1] = chr(0x10000 + ((ord(previous) - 0xD800) << 10) + (code - 0xDC00))
+        else:
+            self._buffer.append(chr(code))
+
+
+def format_path(path: Tuple) -> str:
+    """('weekly_plans', 2, 'title') -> 'weekly_plans[2].title'"""
+    text = ''
+    for part in path:
+        text += f"[{part}]" if isinstance(part, int) else (f".{part}" if text else part)
+    return text
+
+
+def parse_partial_json(text: str) -> Any:
+    """Parse possibly fenced, truncated or slightly malformed JSON text in one pass"""
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return parser.finish()
@@ -0,0 +1,132 @@
+"""
+Task Graph
+Runs agent steps concurrently on a shared thread pool while respecting
+declared dependencies and a per-request deadline.
+
+Each step is fn(results) -> value, where results holds the values of the
+steps finished so far. A step that fails or misses the deadline resolves
+to its fallback(results) if one was declared; otherwise the error is
+raised from run(). Threads cannot be cancelled, so a step that missed the
+deadline keeps running in the background and its late result is dropped.
+
+Steps run in a copy of the caller's context, so context variables such as
+the LLM priority class carry over to the worker threads.
+"""
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from config import Config
+
+
+class TaskGraphTimeout(TimeoutError):
+    """A step without a fallback did not finish before the deadline"""
+
+
+class _Step:
+    __slots__ = ('name', 'fn', 'deps', 'fallback')
+
+    def __init__(self, name: str, fn: Callable, deps: Iterable[str], fallback: Optional[Callable]):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.fallback = fallback
+
+
+class TaskGraph:
+    """
+    A one-shot graph of named steps.
+
+    After run(), timings maps each step to its status ('ok', 'error',
+    'timeout' or 'skipped'), start offset and duration in milliseconds.
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor = None):
+        self.executor = executor or agent_executor
+        self._steps: Dict[str, _Step] = {}
+        self.timings: Dict[str, Dict[str, Any]] = {}
+        self.total_ms = 0.0
+
+    def add(self, name: str, fn: Callable[[Dict[str, Any]], Any], deps: Iterable[str] = (),
+            fallback: Callable[[Dict[str, Any]], Any] = None) -> 'TaskGraph':
+        for dep in deps:
+            if dep not in self._steps:
+                raise ValueError(f"Step '{name}' depends on unknown step '{dep}'")
+        self._steps[name] = _Step(name, fn, deps, fallback)
+        return self
+
+    def _resolve_fallback(self, step: _Step, results: Dict[str, Any], status: str, error: Exception):
+        if step.fallback is None:
+            raise error
+        print(f"Task graph step '{step.name}' {status}: {error}; using fallback")
+        results[step.name] = step.fallback(results)
+
+    def run(self, deadline_seconds: float = None) -> Dict[str, Any]:
+        """Run every step; returns {step name: value}"""
+        start = time.perf_counter()
+        deadline = start + deadline_seconds if deadline_seconds else None
+        results: Dict[str, Any] = {}
+        done, submitted = set(), set()
+        running = {}  # future -> (step, started_at)
+
+        def elapsed_ms(since: float) -> float:
+            return round((time.perf_counter() - since) * 1000, 1)
+
+        try:
+            while len(done) < len(self._steps):
+                for step in self._steps.values():
+                    if step.name not in submitted and all(dep in done for dep in step.deps):
+                        submitted.add(step.name)
+                        started = time.perf_counter()
+                        context = contextvars.copy_context()
+                        future = self.executor.submit(context.run, step.fn, dict(results))
+                        running[future] = (step, started)
+                        self.timings[step.name] = {'status': 'running',
+                                                   'start_ms': round((started - start) * 1000, 1)}
+
+                timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                finished, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                if not finished:
+                    break
+                for future in finished:
+                    step, started = running.pop(future)
+                    self.timings[step.name]['ms'] = elapsed_ms(started)
+                    try:
+                        results[step.name] = future.result()
+                        self.timings[step.name]['status'] = 'ok'
+                    except Exception as e:
+                        self.timings[step.name]['status'] = 'error'
+                        self._resolve_fallback(step, results, 'failed', e)
+                    done.add(step.name)
+
+            # Deadline passed: resolve what is left in declaration (dependency) order
+            for step in self._steps.values():
+                if step.name in done:
+                    continue
+                was_running = step.name in submitted
+                timing = self.timings.setdefault(step.name, {})
+                timing['status'] = 'timeout' if was_running else 'skipped'
+                if was_running:
+                    timing['ms'] = round((time.perf_counter() - start) * 1000 - timing['start_ms'], 1)
+                self._resolve_fallback(step, results, timing['status'],
+                                       TaskGraphTimeout(f"step '{step.name}' missed the "
+                                                        f"{deadline_seconds}s deadline"))
+                done.add(step.name)
+        finally:
+            self.total_ms = elapsed_ms(start)
+        return results
+
+    def summary(self) -> str:
+        """One-line timing summary, e.g. for agent_thoughts"""
+        parts: List[str] = []
+        for name, timing in self.timings.items():
+            part = f"{name} {timing.get('ms', 0):.0f}ms"
+            if timing.get('status') != 'ok':
+                part += f" ({timing.get('status')})"
+            parts.append(part)
+        return f"Step timings: {', '.join(parts)}; total {self.total_ms:.0f}ms."
+
+
+# Shared pool for agent fan-out; steps are I/O bound (LLM and database calls)
+agent_executor = ThreadPoolExecutor(max_workers=Config.AGENT_FANOUT_WORKERS, thread_name_prefix='agent-step')
@@ -0,0 +1,436 @@
+"""
+Vector Search
+Per-user similarity search over memory_vectors embeddings.
+Each user's embeddings are loaded once into a backend index and kept
+up to date as new memories are saved. Writes made by other worker
+processes are picked up by periodically comparing the index with the
+database's version of the user's memories (row count, max id).
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row (zero rows stay zero)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without a full sort"""
+    n = scores.shape[-1]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, kind='stable')
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class VectorIndexBackend:
+    """
+    Interface for a per-user vector index.
+    Vectors are identified by their memory_vectors row id.
+
+    Persistent backends keep their index on disk: open() loads a saved
+    index, which VectorSearch then reconciles against the database instead
+    of rebuilding it from every embedding. Approximate backends get their
+    top candidates re-scored with float vectors by VectorSearch.
+    """
+
+    persistent = False
+    approximate = False
+
+    @classmethod
+    def saved_users(cls) -> List[int]:
+        """User ids with a saved index, most recently used first"""
+        return []
+
+    def open(self, user_id: int) -> bool:
+        """Load the user's saved index; True if one was found"""
+        return False
+
+    def ids(self) -> np.ndarray:
+        """Ids of every indexed vector"""
+        raise NotImplementedError
+
+    def build(self, ids: np.ndarray, vectors: np.ndarray):
+        raise NotImplementedError
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        raise NotImplementedError
+
+    def remove(self, ids: np.ndarray):
+        raise NotImplementedError
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, cosine scores) of the k nearest vectors, best first"""
+        raise NotImplementedError
+
+    def memory_bytes(self) -> int:
+        """Resident size of the index arrays"""
+        return 0
+
+    @property
+    def dimension(self) -> Optional[int]:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class BruteForceBackend(VectorIndexBackend):
+    """Exact search: one matmul over a pre-normalized float32 matrix"""
+
+    def __init__(self):
+        self._ids = np.empty(0, dtype=np.int64)
+        self._vectors: Optional[np.ndarray] = None
+        self._count = 0
+
+    def build(self, ids: np.ndarray, vectors: np.ndarray):
+        self._ids = np.asarray(ids, dtype=np.int64).copy()
+        self._vectors = normalize_rows(vectors) if len(ids) else None
+        self._count = len(self._ids)
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = normalize_rows(vectors)
+        if self._vectors is None:
+            self.build(ids, vectors)
+            return
+        # Grow capacity geometrically so repeated single adds stay amortized O(1)
+        needed = self._count + len(ids)
+        if needed > len(self._ids):
+            capacity = max(needed, 2 * len(self._ids))
+            grown_ids = np.empty(capacity, dtype=np.int64)
+            grown_ids[:self._count] = self._ids[:self._count]
+            grown_vectors = np.empty((capacity, self._vectors.shape[1]), dtype=np.float32)
+            grown_vectors[:self._count] = self._vectors[:self._count]
+            self._ids, self._vectors = grown_ids, grown_vectors
+        self._ids[self._count:needed] = ids
+        self._vectors[self._count:needed] = vectors
+        self._count = needed
+
+    def remove(self, ids: np.ndarray):
+        if not self._count:
+            return
+        keep = ~np.isin(self._ids[:self._count], np.asarray(ids, dtype=np.int64))
+        self._ids = self._ids[:self._count][keep]
+        self._vectors = self._vectors[:self._count][keep]
+        self._count = len(self._ids)
+
+    def ids(self) -> np.ndarray:
+        return self._ids[:self._count]
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not self._count:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self._vectors[:self._count] @ normalize_rows(query)[0]
+        order = top_k_indices(scores, k)
+        return self._ids[order], scores[order]
+
+    def memory_bytes(self) -> int:
+        if self._vectors is None:
+            return 0
+        return self._vectors.nbytes + self._ids.nbytes
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return self._vectors.shape[1] if self._vectors is not None else None
+
+    def __len__(self) -> int:
+        return self._count
+
+
+# Registry of available index backends (name -> factory)
+BACKENDS: Dict[str, Callable[[], VectorIndexBackend]] = {
+    'bruteforce': BruteForceBackend,
+}
+
+
+def register_backend(name: str, factory: Callable[[], VectorIndexBackend]):
+    """Register an index backend selectable through Config.VECTOR_SEARCH_BACKEND"""
+    BACKENDS[name] = factory
+
+
+class IndexVersion:
+    """
+    The database version (row count, max id) of a user's memories that an
+    in-memory index matches, so writes by other worker processes are noticed
+    """
+    __slots__ = ('value', 'checked_at')
+
+    def __init__(self):
+        self.value: Optional[Tuple] = None
+        self.checked_at = 0.0
+
+    def read(self, version_loader: Optional[Callable[[int], Optional[Tuple]]], user_id: int):
+        """Record the current version; call before loading so a racing write only causes an extra refresh"""
+        if version_loader is None:
+            return
+        self.checked_at = time.monotonic()
+        version = version_loader(user_id)
+        self.value = tuple(version) if version is not None else None
+
+    def changed(self, version_loader: Optional[Callable[[int], Optional[Tuple]]], user_id: int,
+                refresh_interval: float) -> bool:
+        """Whether the database changed since the index last matched it (checked at most every refresh_interval)"""
+        if version_loader is None or time.monotonic() - self.checked_at < refresh_interval:
+            return False
+        self.checked_at = time.monotonic()
+        version = version_loader(user_id)
+        if version is None or tuple(version) == self.value:
+            return False
+        self.value = tuple(version)
+        return True
+
+    def added(self, memory_id: int):
+        """Our own insert: keep matching the database so it does not look like a foreign write"""
+        if self.value is not None:
+            count, max_id = self.value
+            self.value = (count + 1, max(max_id or 0, memory_id))
+
+    def removed(self, count: int):
+        if self.value is not None:
+            self.value = (self.value[0] - count, self.value[1])  # a removed max id shows up as a change
+
+
+class _UserIndex:
+    __slots__ = ('backend', 'rows', 'lock', 'loaded', 'version')
+
+    def __init__(self, backend: VectorIndexBackend):
+        self.backend = backend
+        self.rows: Dict[int, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.version = IndexVersion()
+
+
+class VectorSearch:
+    """
+    Manages one index per user, loaded lazily and bounded by an LRU.
+
+    The loader is called as loader(user_id, include_embeddings=True,
+    memory_ids=None) and returns (rows, matrix), where rows are
+    memory_vectors records without their embedding columns and matrix
+    holds one embedding per row (same dimension; None when embeddings
+    are not requested), or None if the database could not be read.
+
+    The version loader is called as version_loader(user_id) and returns
+    (row count, max id) of the user's memories, or None on error. A loaded
+    index is checked against it at most every refresh_interval seconds and
+    reconciled with the database when another process changed it.
+    """
+
+    RECONCILE_CHUNK = 1000  # ids per query when fetching memories missing from a saved index
+
+    def __init__(self, backend_name: str = 'bruteforce', max_users: int = 256, rerank_factor: int = 0,
+                 refresh_interval: float = 5.0):
+        self.backend_name = backend_name
+        self.max_users = max_users
+        self.rerank_factor = rerank_factor
+        self.refresh_interval = refresh_interval
+        self._loader: Optional[Callable[..., Optional[Tuple[List[Dict], Optional[np.ndarray]]]]] = None
+        self._version_loader: Optional[Callable[[int], Optional[Tuple]]] = None
+        self._users: "OrderedDict[int, _UserIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    def set_loader(self, loader: Callable[..., Optional[Tuple[List[Dict], Optional[np.ndarray]]]]):
+        self._loader = loader
+
+    def set_version_loader(self, version_loader: Callable[[int], Optional[Tuple]]):
+        self._version_loader = version_loader
+
+    def _backend_factory(self) -> Callable[[], VectorIndexBackend]:
+        factory = BACKENDS.get(self.backend_name)
+        if factory is None:
+            print(f"Unknown vector search backend '{self.backend_name}', using bruteforce")
+            factory = BruteForceBackend
+        return factory
+
+    def _new_backend(self) -> VectorIndexBackend:
+        return self._backend_factory()()
+
+    def preload(self) -> int:
+        """Open saved indexes so they are memory-mapped before the first search"""
+        factory = self._backend_factory()
+        opened = 0
+        for user_id in factory.saved_users()[:self.max_users]:
+            backend = factory()
+            if not backend.open(user_id):
+                continue
+            with self._lock:
+                if user_id not in self._users:
+                    self._users[user_id] = _UserIndex(backend)
+                    opened += 1
+        return opened
+
+    def _get_index(self, user_id: int) -> _UserIndex:
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None:
+                self._users.move_to_end(user_id)
+            else:
+                index = _UserIndex(self._new_backend())
+                self._users[user_id] = index
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+
+        # Load outside the registry lock; concurrent searches for this user wait here
+        with index.lock:
+            if not index.loaded and self._loader is not None:
+                index.version.read(self._version_loader, user_id)
+                index.loaded = self._load(user_id, index)
+            elif index.loaded and index.version.changed(self._version_loader, user_id, self.refresh_interval):
+                self.refreshes += 1
+                index.loaded = self._reconcile(user_id, index)
+        return index
+
+    def _load(self, user_id: int, index: _UserIndex) -> bool:
+        if index.backend.persistent and index.backend.open(user_id):
+            return self._reconcile(user_id, index)
+        return self._build(user_id, index)
+
+    def _reconcile(self, user_id: int, index: _UserIndex) -> bool:
+        """Bring a saved index up to date with the database, reading only new embeddings"""
+        loaded = self._loader(user_id, include_embeddings=False)
+        if loaded is None:
+            return False
+        rows, _ = loaded
+        db_ids = {row['id'] for row in rows}
+        indexed = set(index.backend.ids().tolist())
+        missing = db_ids - indexed
+        if len(missing) > len(db_ids) // 2:
+            return self._build(user_id, index)
+
+        stale = indexed - db_ids
+        if stale:
+            index.backend.remove(np.array(sorted(stale), dtype=np.int64))
+        missing = sorted(missing)
+        for start in range(0, len(missing), self.RECONCILE_CHUNK):
+            loaded = self._loader(user_id, memory_ids=missing[start:start + self.RECONCILE_CHUNK])
+            if loaded is None:
+                return False
+            new_rows, vectors = loaded
+            if new_rows and vectors.shape[1] == index.backend.dimension:
+                index.backend.add(np.array([row['id'] for row in new_rows], dtype=np.int64), vectors)
+        index.rows = {row['id']: row for row in rows}
+        return True
+
+    def _build(self, user_id: int, index: _UserIndex) -> bool:
+        loaded = self._loader(user_id)
+        if loaded is None:
+            # Database error; retry on the next search
+            return False
+        rows, vectors = loaded
+        if not rows:
+            return True
+        ids = np.array([row['id'] for row in rows], dtype=np.int64)
+        index.backend.build(ids, vectors)
+        index.rows = {row['id']: row for row in rows}
+        return True
+
+    def search(self, user_id: int, query_embedding: List[float], k: int = 5) -> List[Dict[str, Any]]:
+        """Return the k most similar memories for a user with their similarity scores"""
+        index = self._get_index(user_id)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        rerank = self.rerank_factor > 1 and index.backend.approximate and self._loader is not None
+        with index.lock:
+            if not len(index.backend) or index.backend.dimension != query.shape[-1]:
+                return []
+            ids, scores = index.backend.search(query, k * self.rerank_factor if rerank else k)
+            rows = {int(mem_id): index.rows[int(mem_id)] for mem_id in ids if int(mem_id) in index.rows}
+
+        if rerank and len(ids) > 0:
+            ids, scores = self._rerank(user_id, query, ids, scores, k)
+        return [
+            {**rows[int(mem_id)], 'similarity_score': float(score)}
+            for mem_id, score in zip(ids, scores)
+            if int(mem_id) in rows
+        ]
+
+    def _rerank(self, user_id: int, query: np.ndarray, ids: np.ndarray, scores: np.ndarray,
+                k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-score approximate candidates with their stored float embeddings"""
+        loaded = self._loader(user_id, memory_ids=[int(i) for i in ids])
+        if loaded is None or loaded[1] is None or loaded[1].shape[-1] != query.shape[-1]:
+            # Database unavailable: keep the approximate ranking
+            return ids[:k], scores[:k]
+        rows, vectors = loaded
+        exact_ids = np.array([row['id'] for row in rows], dtype=np.int64)
+        exact_scores = normalize_rows(vectors) @ normalize_rows(query)[0]
+        order = top_k_indices(exact_scores, k)
+        return exact_ids[order], exact_scores[order]
+
+    def add(self, user_id: int, row: Dict[str, Any], embedding: List[float]):
+        """Add a newly saved memory to the user's index if it is loaded"""
+        with self._lock:
+            index = self._users.get(user_id)
+        if index is None or not embedding:
+            return
+        with index.lock:
+            if not index.loaded or row['id'] in index.rows:
+                # Not loaded yet (the next search reads it from the database) or already indexed
+                return
+            if index.backend.dimension not in (None, len(embedding)):
+                return
+            index.backend.add(np.array([row['id']], dtype=np.int64),
+                              np.asarray([embedding], dtype=np.float32))
+            index.rows[row['id']] = row
+            index.version.added(row['id'])
+
+    def remove(self, user_id: int, memory_ids: List[int]):
+        """Remove deleted memories from the user's index if it is loaded"""
+        with self._lock:
+            index = self._users.get(user_id)
+        if index is None:
+            return
+        with index.lock:
+            index.backend.remove(np.asarray(memory_ids, dtype=np.int64))
+            index.version.removed(sum(1 for mem_id in memory_ids if index.rows.pop(mem_id, None) is not None))
+
+    def invalidate(self, user_id: int):
+        """Drop a user's index; it is rebuilt on the next search"""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        """Drop every loaded index"""
+        with self._lock:
+            self._users.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            indexes = list(self._users.values())
+        return {
+            "backend": self.backend_name,
+            "loaded_users": len(indexes),
+            "indexed_vectors": sum(len(i.backend) for i in indexes),
+            "index_bytes": sum(i.backend.memory_bytes() for i in indexes),
+            "rerank_factor": self.rerank_factor,
+            "refresh_interval": self.refresh_interval,
+            "refreshes": self.refreshes
+        }
+
+
+# Register the persistent 'ivf' and quantized 'int8' backends
+from services import ann_index, quantization  # noqa: E402,F401
+
+# Global memory vector search
+memory_search = VectorSearch(
+    backend_name=Config.VECTOR_SEARCH_BACKEND,
+    max_users=Config.VECTOR_SEARCH_MAX_USERS,
+    rerank_factor=Config.VECTOR_SEARCH_RERANK_FACTOR,
+    refresh_interval=Config.VECTOR_SEARCH_REFRESH_INTERVAL
+)
@@ -0,0 +1,109 @@
+"""
+Service Warm-up
+Loads heavy resources in a background thread at startup so the first user
+request does not pay for them, and tracks readiness for /health.
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+WARMUP_TEXTS = [
+    "Warm-up: senior backend engineer with Python and distributed systems experience.",
+    "Warm-up: rejected after the system design interview.",
+]
+
+
+class ServiceWarmup:
+    """
+    Runs the startup steps once and records per-step timings.
+
+    state is 'idle' until start(), 'warming' while the thread runs, then
+    'ready', or 'degraded' if a step failed (the service still works, the
+    failed resource just loads lazily or falls back).
+    """
+
+    def __init__(self):
+        self.state = 'idle'
+        self.preload_model = False
+        self.timings_ms: Dict[str, float] = {}
+        self.details: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self, preload_model: bool = False):
+        """Start warming up in a daemon thread (no-op if already started)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.preload_model = preload_model
+            self.state = 'warming'
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name='service-warmup', daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until warm-up finishes; True if it did within the timeout"""
+        if self._thread is None:
+            return True
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _step(self, name: str, fn):
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            self.timings_ms[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            from services.vector_search import memory_search
+            self.details['vector_indexes_opened'] = self._step('vector_indexes', memory_search.preload)
+
+            if self.preload_model:
+                # Importing the agent module pulls in sentence-transformers/torch
+                generator = self._step('import', self._import_generator)
+                model = self._step('model_load', lambda: generator.model)
+                self.details['embedding_model'] = generator.model_name
+                self.details['model_loaded'] = model is not None
+                # First encode calls initialize kernels and tokenizer caches
+                self._step('warm_encode', lambda: generator._encode(WARMUP_TEXTS))
+                if model is None:
+                    self.error = "embedding model unavailable, using fallback embeddings"
+            self.state = 'degraded' if self.error else 'ready'
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'degraded'
+            print(f"Warm-up failed: {e}")
+        finally:
+            self.timings_ms['total'] = round((time.perf_counter() - start) * 1000, 1)
+            self.finished_at = time.time()
+            print(f"Warm-up {self.state} in {self.timings_ms['total']} ms: {self.timings_ms}")
+
+    @staticmethod
+    def _import_generator():
+        from agents import get_embedding_generator
+        return get_embedding_generator()
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ('ready', 'degraded')
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "preload_model": self.preload_model,
+            "timings_ms": dict(self.timings_ms),
+            "details": dict(self.details),
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+# Global service warm-up
+service_warmup = ServiceWarmup()
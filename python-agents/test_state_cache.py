@@ -0,0 +1,59 @@
+"""Tests for the cached user state read by the orchestrator"""
+from database import UserSnapshot, db
+from orchestrator import orchestrator
+from services.state_cache import InMemoryLRUBackend, UserStateCache, user_state_cache
+
+
+def snapshot(user_id: int, **fields) -> UserSnapshot:
+    plans = [{"tasks": [{"completed": True}, {"completed": False}]}]
+    return UserSnapshot(user_id=user_id, profile={"full_name": "Test User"}, plans=plans, **fields)
+
+
+def test_observe_user_state_returns_loaded_state():
+    original = db.get_user_snapshot
+    db.get_user_snapshot = lambda user_id, feedback_limit=5: snapshot(user_id)
+    user_state_cache.clear()
+    try:
+        state = orchestrator.observe_user_state(7)
+        assert state is not None
+        assert state["profile"] == {"full_name": "Test User"}
+        assert state["stats"]["completion_rate"] == 50
+        # Served from the cache the second time
+        db.get_user_snapshot = lambda user_id, feedback_limit=5: None
+        assert orchestrator.observe_user_state(7) == state
+    finally:
+        db.get_user_snapshot = original
+        user_state_cache.clear()
+
+
+def test_invalidation_during_load_is_not_cached():
+    cache = UserStateCache(InMemoryLRUBackend(max_entries=10))
+
+    def loader(user_id):
+        cache.invalidate(str(user_id))  # a write lands while the old state is being read
+        return {"version": "old"}
+
+    assert cache.get_or_load(42, loader) == {"version": "old"}
+    assert cache.get_or_load(42, lambda user_id: {"version": "new"}) == {"version": "new"}
+
+
+def test_invalidation_between_check_and_set_is_not_cached():
+    backend = InMemoryLRUBackend(max_entries=10)
+    cache = UserStateCache(backend)
+    original_set = backend.set
+
+    def racing_set(key, value, ttl):
+        original_set(key, value, ttl)
+        cache.invalidate(42)  # lands right after the generation check
+
+    backend.set = racing_set
+    cache.get_or_load(42, lambda user_id: {"version": "old"})
+    assert backend.get('42') is None
+    assert not cache._generations  # nothing kept once no load is in flight
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"{name}: ok")
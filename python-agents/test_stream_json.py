@@ -0,0 +1,61 @@
+"""Tests for the incremental JSON parser used by streamed roadmap generation"""
+import json
+
+from services.stream_json import IncrementalJSONParser, parse_partial_json
+
+ROADMAP = {
+    "roadmap_title": "Backend Developer Roadmap",
+    "weekly_plans": [
+        {"week_number": i, "title": f"Week {i}", "tasks": [{"id": 1, "title": "Study", "estimated_hours": 5}]}
+        for i in range(1, 4)
+    ],
+    "tips": ["Practice daily"]
+}
+
+
+def stream(text: str, chunk_size: int = 7):
+    """Feed text in small chunks, collecting announced weekly plans"""
+    parser = IncrementalJSONParser()
+    announced = []
+    parser.subscribe('weekly_plans[]', lambda path, plan: announced.append((path, plan)))
+    for i in range(0, len(text), chunk_size):
+        parser.feed(text[i:i + chunk_size])
+    return parser, parser.finish(), announced
+
+
+def test_complete_roadmap_announces_every_week():
+    text = "```json\n" + json.dumps(ROADMAP, indent=2) + "\n```"
+    parser, result, announced = stream(text)
+    assert result == ROADMAP
+    assert not parser.recovered
+    assert [path for path, _ in announced] == ['weekly_plans[0]', 'weekly_plans[1]', 'weekly_plans[2]']
+
+
+def test_truncated_roadmap_keeps_complete_weeks_only_announced():
+    text = json.dumps(ROADMAP)
+    # Cut inside the third week, before its title
+    cut = text.index('"week_number": 3') + len('"week_number": 3')
+    parser, result, announced = stream(text[:cut])
+    assert parser.recovered
+    assert [plan['week_number'] for _, plan in announced] == [1, 2]
+    # The half-written week is in the result but has no title, so it must not be saved
+    assert result['weekly_plans'][-1] == {"week_number": 3}
+
+
+def test_truncation_at_every_position_never_raises():
+    text = json.dumps(ROADMAP)
+    for cut in range(len(text)):
+        result = parse_partial_json(text[:cut])
+        assert result is None or isinstance(result, dict)
+
+
+def test_malformed_output_recovered():
+    assert parse_partial_json('{"a": [1, 2,], "b": "unterminated') == {"a": [1, 2], "b": "unterminated"}
+    assert parse_partial_json('no json here') is None
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"{name}: ok")